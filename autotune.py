@@ -0,0 +1,182 @@
+"""llama 스레드/배치 설정 자동 조정 (이 PC 기준 측정값을 프로필로 저장)
+
+    python autotune.py --model hyperclovax-seed-text-instruct-1.5b-q4_k_m.gguf
+    python autotune.py --model model.gguf --threads 2,4,6,8 --batches 128,256,512
+
+n_batch 마다 모델을 한 번 올리고, 스레드 수를 바꿔 가며
+- 프롬프트 평가 (n_threads_batch, n_batch): PROMPT_TOKENS 를 한 번에 eval 한 tok/s
+- 생성 (n_threads): 토큰 하나씩 GEN_TOKENS 번 eval 한 tok/s
+를 잰다. 생성은 메모리 대역폭, 프롬프트 평가는 연산량에 묶여서 보통 최적 스레드 수가 다르다.
+결과는 (모델 파일 이름+크기, CPU) 를 키로 PROFILE_PATH 에 저장하고,
+make_llm / llm_server 가 모델을 올릴 때 읽어서 기본값으로 쓴다 (직접 넘긴 인자가 우선).
+"""
+import argparse
+import json
+import os
+import platform
+import threading
+import time
+
+PROFILE_ENV = "FILETALK_PROFILE"
+PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".filetalk", "llama_profile.json")
+PROMPT_TOKENS = 512
+GEN_TOKENS = 64
+TUNED_KEYS = ("n_threads", "n_threads_batch", "n_batch")
+
+_lock = threading.Lock()
+
+
+def profile_path() -> str:
+    return os.environ.get(PROFILE_ENV) or PROFILE_PATH
+
+
+def cpu_key() -> str:
+    name = ""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    name = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    name = name or platform.processor() or platform.machine()
+    return f"{name} x{os.cpu_count()}"
+
+
+def model_key(model_path: str) -> str:
+    """해시 대신 이름+크기 (시작할 때 GGUF 전체를 읽지 않도록)"""
+    return f"{os.path.basename(model_path)}:{os.path.getsize(model_path)}"
+
+
+def _read_all(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_profile(model_path: str) -> dict:
+    """이 모델 + 이 CPU 로 측정한 llama 인자 (없으면 {})"""
+    if not model_path or not os.path.exists(model_path):
+        return {}
+    entry = _read_all(profile_path()).get(f"{model_key(model_path)}|{cpu_key()}")
+    if not entry:
+        return {}
+    return {k: entry[k] for k in TUNED_KEYS if k in entry}
+
+
+def save_profile(model_path: str, profile: dict):
+    path = profile_path()
+    with _lock:
+        data = _read_all(path)
+        data[f"{model_key(model_path)}|{cpu_key()}"] = profile
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+def tuned_kwargs(model_path: str, **kwargs) -> dict:
+    """프로필 값을 기본으로 깔고 직접 넘긴 인자로 덮어씀"""
+    return {**load_profile(model_path), **kwargs}
+
+
+# =========================
+# 측정
+# =========================
+def default_threads() -> list:
+    n = os.cpu_count() or 4
+    return sorted({max(1, n // 4), max(1, n // 2), max(1, n * 3 // 4), max(1, n - 1), n})
+
+
+def _set_threads(llm, n_threads: int, n_threads_batch: int) -> bool:
+    """컨텍스트를 다시 만들지 않고 스레드 수만 바꿈 (지원 안 하는 버전이면 False)"""
+    import llama_cpp
+
+    ctx = getattr(getattr(llm, "_ctx", None), "ctx", None)
+    if ctx is None or not hasattr(llama_cpp, "llama_set_n_threads"):
+        return False
+    llama_cpp.llama_set_n_threads(ctx, n_threads, n_threads_batch)
+    return True
+
+
+def _measure(llm, prompt: list, gen_tokens: int) -> tuple:
+    """(프롬프트 평가 tok/s, 생성 tok/s)
+
+    생성은 decode 시간만 보면 되므로 greedy 로 고른다. logits_all 없이 올린 모델이라
+    scores 는 비어 있어서 컨텍스트의 마지막 logits 를 읽는다.
+    """
+    import numpy as np
+    from llm_backend import last_logits
+
+    llm.reset()
+    t0 = time.perf_counter()
+    llm.eval(prompt)
+    prompt_tps = len(prompt) / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for _ in range(gen_tokens):
+        tok = int(np.argmax(last_logits(llm)))
+        llm.eval([tok])
+    gen_tps = gen_tokens / (time.perf_counter() - t0)
+    return prompt_tps, gen_tps
+
+
+def calibrate(model_path: str, threads=None, batches=(128, 256, 512), n_ctx: int = 2048,
+              prompt_tokens: int = PROMPT_TOKENS, gen_tokens: int = GEN_TOKENS, log=print) -> dict:
+    from llama_cpp import Llama
+
+    threads = list(threads or default_threads())
+    prompt_tokens = min(prompt_tokens, n_ctx - gen_tokens - 1)
+    runs = []
+    for n_batch in batches:
+        llm = None
+        for t in threads:
+            if llm is None or not _set_threads(llm, t, t):
+                llm = Llama(model_path=model_path, n_ctx=n_ctx, n_batch=n_batch, n_threads=t,
+                            n_threads_batch=t, use_mmap=True, verbose=False)
+            # 같은 토큰 반복은 캐시 효과가 없어서 실제 문장과 속도가 비슷하다
+            seed = llm.tokenize("파일 정리 요청을 해석합니다. ".encode("utf-8"), add_bos=False)
+            prompt = [llm.token_bos()] + (seed * (prompt_tokens // len(seed) + 1))[:prompt_tokens - 1]
+            _measure(llm, prompt[:32], 4)  # 첫 호출 준비 비용 제외
+            p_tps, g_tps = _measure(llm, prompt, gen_tokens)
+            runs.append({"n_batch": n_batch, "threads": t, "prompt_tps": p_tps, "gen_tps": g_tps})
+            log(f"n_batch {n_batch:4d} / 스레드 {t:2d}: 프롬프트 {p_tps:8.1f} tok/s, 생성 {g_tps:6.1f} tok/s")
+        del llm
+
+    best_prompt = max(runs, key=lambda r: r["prompt_tps"])
+    best_gen = max(runs, key=lambda r: r["gen_tps"])
+    return {
+        "n_threads": best_gen["threads"],
+        "n_threads_batch": best_prompt["threads"],
+        "n_batch": best_prompt["n_batch"],
+        "prompt_tps": round(best_prompt["prompt_tps"], 1),
+        "gen_tps": round(best_gen["gen_tps"], 1),
+        "measured_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="llama 스레드/배치 자동 조정")
+    ap.add_argument("--model", required=True)
+    ap.add_argument("--threads", default=None, help="시험할 스레드 수 (쉼표, 기본: 코어 수 기준 몇 개)")
+    ap.add_argument("--batches", default="128,256,512")
+    ap.add_argument("--n-ctx", type=int, default=2048)
+    args = ap.parse_args()
+
+    threads = [int(x) for x in args.threads.split(",")] if args.threads else None
+    batches = [int(x) for x in args.batches.split(",")]
+    model_path = os.path.abspath(args.model)
+    print(f"CPU: {cpu_key()}")
+    profile = calibrate(model_path, threads, batches, args.n_ctx)
+    save_profile(model_path, profile)
+    print(f"저장: {profile_path()}")
+    print(f"n_threads={profile['n_threads']} n_threads_batch={profile['n_threads_batch']} n_batch={profile['n_batch']} "
+          f"(프롬프트 {profile['prompt_tps']} tok/s, 생성 {profile['gen_tps']} tok/s)")
+
+
+if __name__ == "__main__":
+    main()
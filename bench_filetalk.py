@@ -0,0 +1,466 @@
+"""Filetalk 벤치마크
+
+    python bench_filetalk.py --files 10000 --out bench_fake.json
+    python bench_filetalk.py --model hyperclovax-seed-text-instruct-1.5b-q4_k_m.gguf --files 10000 --out bench_real.json
+    python bench_filetalk.py --model hyperclovax-seed-text-instruct-1.5b-q4_k_m.gguf --spec lookup --skip tools,chat
+
+--model 을 안 주면 FakeLlama (정해진 답 + 지연 시뮬레이션) 로 돌려서 모델 없이도 파서/실행기/검색의
+회귀를 볼 수 있다. 작업 폴더에 가짜 파일 트리(이름/확장자/크기/중복 섞임)를 만들고
+poc_test2 의 llm_parse / parse_command / normalize_cmd / run_cmd 와 naver_gui 의 대화 루프를 돌려서
+항목별 p50/p99 지연시간과 처리량, (실제 모델이면) tok/s 와 프롬프트 평가 시간을 JSON 으로 낸다.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+import types
+
+WORDS = [
+    "report", "meeting_notes", "budget", "invoice", "photo", "draft", "plan", "summary", "log",
+    "회의록", "보고서", "예산", "계약서", "사진", "일정", "정리", "메모",
+]
+EXTS = [".txt", ".md", ".log", ".csv", ".pdf", ".jpg", ".png", ".xlsx", ".docx", ".hwp"]
+TEXT_EXTS = {".txt", ".md", ".log", ".csv"}
+FILES_PER_DIR = 200
+DUP_EVERY = 50  # 이 간격마다 앞 파일과 같은 내용 (중복 찾기용)
+
+# 파싱 벤치에 쓰는 발화 → FakeLlama 가 돌려줄 plan
+CANNED_PLANS = {
+    "회의록 파일 어디 있어": [{"tool": "search_files", "arguments": {"keywords": ["회의록"], "ext": [], "top_k": 20, "content": False, "semantic": False}}],
+    "예산 관련 내용 들어간 문서 찾아줘": [{"tool": "search_files", "arguments": {"keywords": ["예산"], "ext": [], "top_k": 20, "content": True, "semantic": False}}],
+    "bench 폴더 만들고 메모.txt 만들어줘": [
+        {"tool": "create_folder", "arguments": {"name": "bench"}},
+        {"tool": "create_file", "arguments": {"path": "메모.txt", "content": ""}},
+    ],
+    "log 파일 중복 있는지 봐줘": [{"tool": "find_duplicates", "arguments": {"ext": [".log"], "min_size": 1}}],
+    "report_1.txt 요약하고 archive 로 옮겨줘": [
+        {"tool": "summarize_file", "arguments": {"path": "report_1.txt"}},
+        {"tool": "move_file", "arguments": {"src": "report_1.txt", "dst": "archive"}},
+    ],
+}
+CHAT_TURNS = ["안녕하세요", "파일 정리하는 좋은 방법 알려줘", "폴더 이름은 어떻게 짓는 게 좋아?", "고마워"]
+
+_UTTER_RE = re.compile(r"사용자:\s*(.*?)\s*답변:\s*$", re.S)
+
+
+# =========================
+# 가짜 모델
+# =========================
+class FakeLlama:
+    """llama_cpp.Llama 에서 스크립트들이 쓰는 부분만 흉내 (결정적 출력 + 지연)
+
+    지연 = latency_ms + 프롬프트 토큰 수 × prompt_us (첫 토큰 전) + 생성 토큰 수 × tok_ms
+    """
+
+    def __init__(self, latency_ms: float = 20.0, tok_ms: float = 5.0, prompt_us: float = 50.0,
+                 reply_tokens: int = 32, n_ctx: int = 4096):
+        self.latency_ms = latency_ms
+        self.tok_ms = tok_ms
+        self.prompt_us = prompt_us
+        self.reply_tokens = reply_tokens
+        self._n_ctx = n_ctx
+        self.calls = 0
+
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> list:
+        ids = [ord(c) % 32000 for c in text.decode("utf-8", errors="ignore")]
+        return ([1] if add_bos else []) + ids
+
+    def embed(self, texts, truncate: bool = True, normalize: bool = False) -> list:
+        out = []
+        for t in texts:
+            v = [0.0] * 64
+            for w in re.findall(r"\w+", t.lower()):
+                v[sum(w.encode("utf-8")) % 64] += 1.0
+            out.append(v)
+        return out
+
+    def _answer(self, prompt: str) -> str:
+        m = _UTTER_RE.search(prompt[-400:])
+        if m and ("[" in prompt and "tool" in prompt):
+            plan = CANNED_PLANS.get(m.group(1).strip())
+            if plan is None:
+                plan = [{"tool": "create_file", "arguments": {"path": "new.txt", "content": ""}}]
+            return json.dumps(plan, ensure_ascii=False)
+        return " ".join(["네"] + ["파일을"] * (self.reply_tokens - 1))
+
+    def _pieces(self, text: str, max_tokens: int) -> list:
+        # JSON 은 대략 4글자를 한 토큰으로, 일반 답변은 단어 하나를 한 토큰으로
+        if text.startswith("["):
+            pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+        else:
+            pieces = [w + " " for w in text.split(" ")]
+        return pieces[:max_tokens]
+
+    def __call__(self, prompt, max_tokens: int = 256, stream: bool = False, **kwargs):
+        self.calls += 1
+        if isinstance(prompt, list):
+            text = "".join(chr(t) for t in prompt if t > 1)
+            n_prompt = len(prompt)
+        else:
+            text = prompt
+            n_prompt = len(prompt)
+        pieces = self._pieces(self._answer(text), max_tokens or 256)
+        time.sleep((self.latency_ms + n_prompt * self.prompt_us / 1000.0) / 1000.0)
+
+        def gen():
+            for p in pieces:
+                time.sleep(self.tok_ms / 1000.0)
+                yield {"choices": [{"text": p, "finish_reason": None}]}
+
+        if stream:
+            return gen()
+        out = "".join(c["choices"][0]["text"] for c in gen())
+        return {"choices": [{"text": out, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": n_prompt, "completion_tokens": len(pieces)}}
+
+
+# =========================
+# 가짜 파일 트리
+# =========================
+def make_tree(root: str, n_files: int, seed: int = 0) -> dict:
+    """root 아래에 n_files 개 (같은 n/seed 로 이미 만들어져 있으면 재사용)"""
+    marker = os.path.join(root, ".bench_tree.json")
+    spec = {"files": n_files, "seed": seed}
+    if os.path.exists(marker):
+        with open(marker, "r", encoding="utf-8") as f:
+            if json.load(f) == spec:
+                return {"created": 0, "reused": True}
+    rnd = random.Random(seed)
+    t0 = time.perf_counter()
+    prev = b""
+    for i in range(n_files):
+        d = os.path.join(root, f"d{i // (FILES_PER_DIR * FILES_PER_DIR):03}", f"s{(i // FILES_PER_DIR) % FILES_PER_DIR:03}")
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(d, exist_ok=True)
+        ext = rnd.choice(EXTS)
+        name = f"{rnd.choice(WORDS)}_{i}{ext}"
+        if i % DUP_EVERY == 0 and prev:
+            data = prev
+        elif ext in TEXT_EXTS:
+            data = (" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 60))) + "\n").encode("utf-8")
+        else:
+            data = rnd.randbytes(rnd.randint(16, 2048)) if hasattr(rnd, "randbytes") else os.urandom(rnd.randint(16, 2048))
+        with open(os.path.join(d, name), "wb") as f:
+            f.write(data)
+        prev = data
+    # 요약/이동 벤치용 고정 파일
+    with open(os.path.join(root, "report_1.txt"), "w", encoding="utf-8") as f:
+        for i in range(400):
+            f.write(f"{i}번째 줄: {' '.join(rnd.choice(WORDS) for _ in range(12))}\n")
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    return {"created": n_files, "reused": False, "seconds": time.perf_counter() - t0}
+
+
+# =========================
+# 측정
+# =========================
+def summarize(samples: list) -> dict:
+    if not samples:
+        return {"n": 0}
+    s = sorted(samples)
+    total = sum(s)
+    return {
+        "n": len(s),
+        "p50_ms": s[len(s) // 2] * 1000,
+        "p99_ms": s[min(len(s) - 1, int(len(s) * 0.99))] * 1000,
+        "mean_ms": total / len(s) * 1000,
+        "ops_per_sec": len(s) / total if total > 0 else None,
+    }
+
+
+def timed(fn, repeat: int) -> list:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def bench_parse(poc, repeat: int) -> dict:
+    utterances = list(CANNED_PLANS)
+    samples = []
+    for _ in range(repeat):
+        for u in utterances:
+            t0 = time.perf_counter()
+            with poc.llm_lock:
+                poc.llm_parse(u)
+            samples.append(time.perf_counter() - t0)
+    res = {"llm_parse": summarize(samples)}
+
+    # parse_command: 캐시/규칙 경로 (LLM 안 탐)
+    for u in utterances:
+        poc.parse_command(u)
+    rule_utts = ["down 폴더 만들어줘", "txt 파일 찾아줘", "중복 파일 찾아줘", "a.log를 archive로 옮겨줘"]
+    res["parse_command_cached"] = summarize([s for _ in range(repeat) for u in utterances
+                                             for s in timed(lambda: poc.parse_command(u), 1)])
+    res["parse_command_rule"] = summarize([s for _ in range(repeat) for u in rule_utts
+                                           for s in timed(lambda: poc.parse_command(u), 1)])
+    return res
+
+
+def bench_normalize(poc, repeat: int) -> dict:
+    raws = [c for plan in CANNED_PLANS.values() for c in plan]
+    samples = []
+    for _ in range(repeat * 20):
+        for c in raws:
+            c = copy.deepcopy(c)
+            t0 = time.perf_counter()
+            poc.normalize_cmd(c)
+            samples.append(time.perf_counter() - t0)
+    return {"normalize_cmd": summarize(samples)}
+
+
+def bench_tools(poc, repeat: int) -> dict:
+    def cmd(tool, **args):
+        return poc.normalize_cmd({"tool": tool, "arguments": args})
+
+    from file_index import FileIndex
+    from live_search import LiveSearch, make_matcher
+
+    res = {}
+    # 처음 색인: 앱 색인은 지난 실행 DB 가 남아 있을 수 있으니 빈 DB 에 새로 만든다
+    # (디렉토리는 make_tree 가 방금 써서 OS 캐시에 있을 수 있음)
+    cold_db = os.path.join(poc.CACHE_DIR, "bench_cold_index.sqlite3")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(cold_db + suffix):
+            os.remove(cold_db + suffix)
+    cold = FileIndex(poc.ROOT_DIR, cold_db, min_refresh_interval=0)
+    t0 = time.perf_counter()
+    cold.refresh()
+    res["file_index_refresh_cold"] = {"seconds": time.perf_counter() - t0, "files": cold.count()}
+    cold.close()
+    poc.file_index.refresh()  # 앱 색인을 최신으로 (여기서부터는 바뀐 것만 본다)
+    res["file_index_refresh_warm"] = summarize(timed(poc.file_index.refresh, repeat))
+    # 색인 전 직접 훑기: top_k 에서 바로 멈추는 경우 / 맞는 게 없어서 끝까지 도는 경우.
+    # 디렉토리를 읽어서 OS 캐시를 데우므로 처음 색인 측정보다 뒤에 둔다
+    live = LiveSearch(poc.ROOT_DIR, poc.LIVE_SEARCH_WORKERS)
+    res["live_search.top_k"] = summarize(timed(lambda: live.search(make_matcher(["회의록"]), 20), repeat))
+    res["live_search.full"] = summarize(timed(lambda: live.search(make_matcher(["없는_이름"]), 100), repeat))
+    if poc.content_index is not None:
+        t0 = time.perf_counter()
+        st = poc.content_index.update()
+        res["content_index_update"] = dict(st, seconds=time.perf_counter() - t0)
+
+    cases = {
+        "search_files.name": cmd("search_files", keywords=["회의록"], top_k=100),
+        "search_files.ext": cmd("search_files", ext=["log"], top_k=100),
+        "search_files.content": cmd("search_files", keywords=["예산"], top_k=100, content=True),
+        "find_duplicates": cmd("find_duplicates", ext=["log"]),
+    }
+    if poc.semantic_index is not None and poc.semantic_index.embed is not None:
+        t0 = time.perf_counter()
+        st = poc.semantic_index.update()
+        res["semantic_index_update"] = dict(st, seconds=time.perf_counter() - t0)
+        cases["search_files.semantic"] = cmd("search_files", keywords=["회의 기록"], top_k=10, semantic=True)
+    for name, c in cases.items():
+        res[name] = summarize(timed(lambda: poc.run_cmd(copy.deepcopy(c)), repeat))
+    if poc.fuzzy_names is not None:
+        # 모델이 낸 조금 틀린 이름 → 실제 파일 (report_1.txt)
+        t0 = time.perf_counter()
+        poc.fuzzy_names.ensure_loaded()
+        res["fuzzy_names_load"] = {"seconds": time.perf_counter() - t0, "names": len(poc.fuzzy_names)}
+        res["fuzzy_names.resolve"] = summarize(timed(
+            lambda: poc.fuzzy_names.resolve(os.path.join(poc.ROOT_DIR, "report_1_v2.txt")), repeat))
+
+    # 요약은 첫 번째(청크 요약 생성)와 그 다음(청크 캐시 적중)을 따로
+    c = cmd("summarize_file", path="report_1.txt")
+    with poc.summary_cache.lock:
+        poc.summary_cache.conn.execute("DELETE FROM summaries")
+        poc.summary_cache.conn.commit()
+    res["summarize_file_cold"] = summarize(timed(lambda: poc.run_cmd(copy.deepcopy(c)), 1))
+    res["summarize_file_cached"] = summarize(timed(lambda: poc.run_cmd(copy.deepcopy(c)), repeat))
+
+    # 쓰기 도구: 만들고 → 옮기고 → 지움 (트리는 그대로 유지)
+    create, move = [], []
+    for i in range(repeat):
+        name = f"bench_tmp_{i}.txt"
+        create += timed(lambda: poc.run_cmd(cmd("create_file", path=name, content="x" * 100)), 1)
+        move += timed(lambda: poc.run_cmd(cmd("move_file", src=name, dst="bench_moved")), 1)
+        os.remove(os.path.join(poc.ROOT_DIR, "bench_moved", name))
+    res["create_file"] = summarize(create)
+    res["create_folder"] = summarize(timed(lambda: poc.run_cmd(cmd("create_folder", name="bench_dir")), repeat))
+    res["move_file"] = summarize(move)
+
+    plan = poc.normalize_plan(CANNED_PLANS["bench 폴더 만들고 메모.txt 만들어줘"]
+                              + CANNED_PLANS["회의록 파일 어디 있어"])
+    res["plan_executor"] = summarize(timed(lambda: poc.plan_executor.run(copy.deepcopy(plan)), repeat))
+    return res
+
+
+def bench_chat(llm, repeat: int) -> dict:
+    """naver_gui 의 프롬프트 구성 + 스트리밍 생성 (첫 토큰 시간 ≈ 프롬프트 평가 시간)"""
+    import naver_gui
+    from chat_context import ChatContext
+
+    def count_tokens(text):
+        return len(llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+    ttft, tps, turn = [], [], []
+    total_tokens = 0
+    for _ in range(repeat):
+        context = ChatContext(naver_gui.SYSTEM_PROMPT, count_tokens, naver_gui.N_CTX - naver_gui.MAX_NEW_TOKENS,
+                              naver_gui.RECENT_TOKENS)
+        chat = types.SimpleNamespace(conversation_history=[], context=context)
+        for user in CHAT_TURNS:
+            chat.conversation_history.append({"role": "user", "content": user})
+            prompt = naver_gui.SimpleLLMChat.build_prompt(chat)
+            tokens = llm.tokenize(prompt.encode("utf-8"))
+            t0 = time.perf_counter()
+            first, n, pieces = None, 0, []
+            for chunk in llm(tokens, max_tokens=64, temperature=0.7, top_p=0.9, repeat_penalty=1.1,
+                             stop=["사용자:", "\n사용자:"], stream=True):
+                if first is None:
+                    first = time.perf_counter() - t0
+                n += 1
+                pieces.append(chunk["choices"][0]["text"])
+            elapsed = time.perf_counter() - t0
+            chat.conversation_history.append({"role": "assistant", "content": "".join(pieces).strip()})
+            turn.append(elapsed)
+            if first is not None:
+                ttft.append(first)
+                if n > 1:
+                    tps.append((n - 1) / max(elapsed - first, 1e-9))
+            total_tokens += n
+    return {
+        "chat_turn": summarize(turn),
+        "prompt_eval_ttft": summarize(ttft),
+        "decode_tok_per_sec": {"p50": sorted(tps)[len(tps) // 2] if tps else None,
+                               "mean": sum(tps) / len(tps) if tps else None},
+        "generated_tokens": total_tokens,
+    }
+
+
+def bench_spec(poc, model_path: str, spec: str, repeat: int) -> dict:
+    """같은 명령 JSON 생성을 초안 없이 / 있이 돌려서 tok/s 와 초안 채택률 비교 (실제 모델 전용)"""
+    from llama_cpp import LlamaGrammar
+    from llm_backend import make_llm
+    from spec_decode import draft_stats, logits_bytes
+
+    grammar = LlamaGrammar.from_string(poc.TOOL_GBNF, verbose=False)
+    prompts = [poc.PROMPT_PREFIX + f" {u}\n답변:\n" for u in CANNED_PLANS]
+
+    def run(llm):
+        tokens, elapsed = 0, 0.0
+        for _ in range(repeat):
+            for p in prompts:
+                t0 = time.perf_counter()
+                out = llm(p, max_tokens=256, temperature=0.0, grammar=grammar)
+                elapsed += time.perf_counter() - t0
+                tokens += out["usage"]["completion_tokens"]
+        return {"tokens": tokens, "sec": elapsed, "tok_per_sec": tokens / elapsed if elapsed else 0.0}
+
+    base = run(make_llm(model_path, n_ctx=4096, verbose=False))
+    spec_llm = make_llm(model_path, draft=spec, n_ctx=4096, verbose=False)
+    fast = run(spec_llm)
+    return {"speculative": {
+        "draft": spec,
+        "baseline": base,
+        "with_draft": fast,
+        "speedup": fast["tok_per_sec"] / base["tok_per_sec"] if base["tok_per_sec"] else None,
+        # 초안을 붙이면 logits_all=True 가 되어 더 잡히는 scores 배열 (tok/s 와 같이 봐야 한다)
+        "logits_all_mb": logits_bytes(spec_llm.n_ctx(), spec_llm.n_vocab()) / 1e6,
+        **{k: v for k, v in draft_stats(spec_llm).stats().items() if k != "draft"},
+    }}
+
+
+# =========================
+# 실행
+# =========================
+def main():
+    ap = argparse.ArgumentParser(description="Filetalk 벤치마크 (JSON 출력)")
+    ap.add_argument("--model", default=None, help="GGUF 경로 (없으면 FakeLlama)")
+    ap.add_argument("--files", type=int, default=10000, help="가짜 트리 파일 수 (10k ~ 1M)")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--workdir", default="./bench_work")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency-ms", type=float, default=20.0, help="FakeLlama 호출당 고정 지연")
+    ap.add_argument("--tok-ms", type=float, default=5.0, help="FakeLlama 생성 토큰당 지연")
+    ap.add_argument("--prompt-us", type=float, default=50.0, help="FakeLlama 프롬프트 토큰당 지연 (마이크로초)")
+    ap.add_argument("--spec", default=None, help='추측 디코딩 비교 (--model 필요): "lookup" 또는 초안 GGUF 경로')
+    ap.add_argument("--skip", default="", help="건너뛸 항목 (쉼표): parse,normalize,tools,chat")
+    ap.add_argument("--out", default=None, help="결과 JSON 파일 (없으면 stdout)")
+    args = ap.parse_args()
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+
+    model_path = os.path.abspath(args.model) if args.model else None
+    out_path = os.path.abspath(args.out) if args.out else None
+    spec = args.spec if args.spec in (None, "lookup") else os.path.abspath(args.spec)
+    workdir = os.path.abspath(args.workdir)
+    os.makedirs(os.path.join(workdir, "filetalk_root"), exist_ok=True)
+    tree = make_tree(os.path.join(workdir, "filetalk_root"), args.files, args.seed)
+
+    # poc_test2 는 import 시점의 작업 폴더 기준으로 ROOT_DIR/CACHE_DIR 을 잡는다
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    os.chdir(workdir)
+    import poc_test2 as poc
+
+    t0 = time.perf_counter()
+    if model_path:
+        from llm_backend import make_llm
+
+        poc.MODEL_PATH = model_path
+        llm = make_llm(model_path, n_ctx=4096, verbose=False)
+        poc.setup_llm(llm)
+    else:
+        import numpy as np
+        from semantic_index import _pool
+
+        llm = FakeLlama(args.latency_ms, args.tok_ms, args.prompt_us)
+        poc.TOOL_GRAMMAR = poc.TOOL_GBNF  # 문법 경로 (한 번에 디코딩)
+        poc.MODEL_ID = "bench-fake"
+        poc.summarizer = poc.Summarizer(llm, poc.summary_cache, "bench-fake", poc.llm_lock)
+        if poc.semantic_index is not None:
+            poc.semantic_index.set_embedder(lambda texts: np.stack([_pool(v) for v in llm.embed(texts)]), "bench-fake")
+        poc.llm = llm
+    load_sec = time.perf_counter() - t0
+
+    results = {}
+    if "parse" not in skip:
+        results.update(bench_parse(poc, args.repeat))
+    if "normalize" not in skip:
+        results.update(bench_normalize(poc, args.repeat))
+    if "tools" not in skip:
+        results.update(bench_tools(poc, args.repeat))
+    if "chat" not in skip:
+        results.update(bench_chat(llm, max(1, args.repeat // 5)))
+    if spec and model_path:
+        results.update(bench_spec(poc, model_path, spec, max(1, args.repeat // 5)))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": os.path.basename(model_path) if model_path else "fake",
+            "fake": None if model_path else {"latency_ms": args.latency_ms, "tok_ms": args.tok_ms,
+                                            "prompt_us": args.prompt_us},
+            "files": args.files,
+            "repeat": args.repeat,
+            "tree": tree,
+            "model_load_sec": load_sec,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"결과 저장: {out_path}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""대량 이동/복사
+
+소스 여러 개(glob 패턴 포함)를 한 번에 옮긴다.
+- 같은 장치: os.replace / os.rename (메타데이터만 바뀌어서 크기와 상관없이 즉시 끝남)
+- 다른 장치: os.copy_file_range → os.sendfile → 일반 read/write 순으로 커널 복사.
+  "<dst>.part" 에 쓰고 다 쓰면 이름을 바꾸며, 이동이면 그 다음에 원본을 지운다.
+- 파일 단위로 작업 스레드 풀에 나눠서 돌리고 진행률/처리량을 콜백으로 알린다.
+- journal 에 항목별 상태를 적어둔다. 중간에 실패한 뒤 같은 명령을 다시 실행하면 끝난 항목은 건너뛰고,
+  원본이 그대로인 .part 는 남은 부분만 이어서 복사한다. journal 은 명령 (소스+대상) 마다 따로 두고
+  (journal_path_for), "done" 은 원본 크기/mtime 과 대상 크기가 기록과 같을 때만 믿는다.
+- 대상이 이미 있으면 덮어쓰지 않고 그 항목만 실패로 남긴다.
+"""
+import errno
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+COPY_CHUNK = 8 * 1024 * 1024
+MAX_WORKERS = 4
+PROGRESS_INTERVAL = 0.1  # 진행률 콜백 최소 간격 (초)
+PART_SUFFIX = ".part"
+
+# 커널 복사가 이 파일시스템/OS 에서 안 될 때 나는 에러 → 다음 방법으로
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.ENOTSUP}
+
+
+def has_glob(s: str) -> bool:
+    return any(c in s for c in "*?[")
+
+
+def _device(path: str) -> int:
+    """path 가 아직 없으면 있는 상위 폴더의 장치"""
+    p = os.path.abspath(path)
+    while not os.path.exists(p):
+        parent = os.path.dirname(p)
+        if parent == p:
+            break
+        p = parent
+    return os.stat(p).st_dev
+
+
+class TransferItem:
+    def __init__(self, src: str, dst: str, size: int = 0, is_dir: bool = False, tree: str = None):
+        self.src = src
+        self.dst = dst
+        self.size = size
+        self.is_dir = is_dir  # 같은 장치 폴더 이동은 통째로 rename
+        self.tree = tree  # 파일로 펼친 원본 폴더 (이동 후 빈 폴더 정리용)
+
+
+def plan_items(sources: list, dst: str, dst_is_dir: bool = None) -> list:
+    """소스(파일/폴더/glob) → TransferItem 목록
+
+    소스가 하나이고 dst_is_dir 가 False 면 dst 는 대상 파일 경로, 아니면 대상 폴더.
+    다른 장치로 가는 폴더는 안의 파일로 펼친다 (상대 경로 유지).
+    """
+    paths = []
+    for s in sources:
+        if has_glob(s):
+            paths.extend(sorted(glob.glob(s, recursive=True)))
+        elif os.path.exists(s):
+            paths.append(s)
+    if dst_is_dir is None:
+        dst_is_dir = len(sources) > 1 or any(has_glob(s) for s in sources) or os.path.isdir(dst)
+
+    items = []
+    dst_dev = _device(dst)
+    for p in paths:
+        target = os.path.join(dst, os.path.basename(p.rstrip(os.sep))) if dst_is_dir else dst
+        if os.path.abspath(target) == os.path.abspath(p):
+            continue
+        if not os.path.isdir(p):
+            items.append(TransferItem(p, target, os.path.getsize(p)))
+        elif os.stat(p).st_dev == dst_dev:
+            items.append(TransferItem(p, target, 0, is_dir=True))
+        else:
+            for d, _, files in os.walk(p):
+                for name in files:
+                    f = os.path.join(d, name)
+                    rel = os.path.relpath(f, p)
+                    items.append(TransferItem(f, os.path.join(target, rel), os.path.getsize(f), tree=p))
+    return items
+
+
+def journal_path_for(journal_dir: str, sources: list, dst: str) -> str:
+    """명령 (소스 목록 + 대상) 마다 다른 journal 파일 → 다른 명령의 기록을 잘못 이어받지 않게"""
+    key = "\n".join([os.path.abspath(s) for s in sources] + [os.path.abspath(dst)])
+    return os.path.join(journal_dir, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".jsonl")
+
+
+class Journal:
+    """항목별 상태 (src|dst → {"size", "mtime", "status"}) 를 JSON lines 로 덧붙여 기록"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue  # 기록 도중 끊긴 마지막 줄
+                    self.entries[e["key"]] = e
+
+    @staticmethod
+    def key(item: TransferItem) -> str:
+        return f"{os.path.abspath(item.src)}|{os.path.abspath(item.dst)}"
+
+    def get(self, item: TransferItem):
+        return self.entries.get(self.key(item))
+
+    def record(self, item: TransferItem, status: str, st=None, dst_size: int = None):
+        e = {"key": self.key(item), "status": status}
+        if st is not None:
+            e.update(size=st.st_size, mtime=st.st_mtime_ns)
+        if dst_size is not None:
+            e["dst_size"] = dst_size
+        with self.lock:
+            self.entries[e["key"]] = e
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def _kernel_copy(fin: int, fout: int, pos: int, size: int, report) -> str:
+    """fin → fout 을 pos 부터 size 까지. 쓴 방법 이름을 돌려준다"""
+    if hasattr(os, "copy_file_range"):
+        try:
+            while pos < size:
+                n = os.copy_file_range(fin, fout, min(COPY_CHUNK, size - pos), pos, pos)
+                if n == 0:
+                    break
+                pos += n
+                report(n)
+            if pos >= size:
+                return "copy_file_range"
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS:
+                raise
+
+    if hasattr(os, "sendfile"):
+        try:
+            os.lseek(fout, pos, os.SEEK_SET)
+            while pos < size:
+                n = os.sendfile(fout, fin, pos, min(COPY_CHUNK, size - pos))
+                if n == 0:
+                    break
+                pos += n
+                report(n)
+            if pos >= size:
+                return "sendfile"
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS:
+                raise
+
+    os.lseek(fin, pos, os.SEEK_SET)
+    os.lseek(fout, pos, os.SEEK_SET)
+    while pos < size:
+        buf = os.read(fin, min(COPY_CHUNK, size - pos))
+        if not buf:
+            break
+        os.write(fout, buf)
+        pos += len(buf)
+        report(len(buf))
+    return "read/write"
+
+
+class BulkTransfer:
+    def __init__(self, items: list, mode: str = "move", workers: int = MAX_WORKERS,
+                 journal_path: str = None, on_progress=None):
+        if mode not in ("move", "copy"):
+            raise ValueError(f"mode 는 move/copy: {mode}")
+        self.items = items
+        self.mode = mode
+        self.workers = workers
+        self.journal = Journal(journal_path)
+        self.on_progress = on_progress  # on_progress(stats dict)
+        self.lock = threading.Lock()
+        self.total_bytes = sum(i.size for i in items)
+        self.done_bytes = 0
+        self.done_files = 0
+        self.methods = {}
+        self.failed = []
+        self.resumed = 0
+        self._t0 = None
+        self._last_report = 0.0
+
+    # -------------------------
+    # 진행률
+    # -------------------------
+    def _add_bytes(self, n: int):
+        with self.lock:
+            self.done_bytes += n
+        self._report()
+
+    def _report(self, force: bool = False):
+        if self.on_progress is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        self.on_progress(self.stats())
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._t0 if self._t0 else 0.0
+        with self.lock:
+            return {
+                "files": len(self.items),
+                "done_files": self.done_files,
+                "bytes": self.total_bytes,
+                "done_bytes": self.done_bytes,
+                "failed": list(self.failed),
+                "resumed": self.resumed,
+                "methods": dict(self.methods),
+                "elapsed": elapsed,
+                "mb_per_sec": self.done_bytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+            }
+
+    # -------------------------
+    # 실행
+    # -------------------------
+    def run(self) -> dict:
+        self._t0 = time.perf_counter()
+        with ThreadPoolExecutor(self.workers) as pool:
+            list(pool.map(self._run_one, self.items))
+        if not self.failed:
+            self.journal.clear()
+            if self.mode == "move":
+                self._remove_empty_trees()
+        self._report(force=True)
+        return self.stats()
+
+    def _remove_empty_trees(self):
+        for tree in {i.tree for i in self.items if i.tree}:
+            for d, _, _ in os.walk(tree, topdown=False):
+                try:
+                    os.rmdir(d)  # 비어 있을 때만 지워진다
+                except OSError:
+                    pass
+
+    def _run_one(self, item: TransferItem):
+        try:
+            method = self._transfer(item)
+        except OSError as e:
+            with self.lock:
+                self.failed.append((item.src, str(e)))
+            self.journal.record(item, "failed")
+            return
+        with self.lock:
+            self.done_files += 1
+            self.methods[method] = self.methods.get(method, 0) + 1
+        self._report()
+
+    def _already_done(self, item: TransferItem, prev) -> bool:
+        """지난 실행의 "done" 이 지금 파일들과 맞는지 (원본이 바뀌었거나 대상이 다르면 믿지 않음)"""
+        if not prev or prev["status"] != "done" or not os.path.exists(item.dst):
+            return False
+        if item.is_dir:
+            return not os.path.exists(item.src)  # 폴더 rename 은 한 번에 끝나므로 원본이 있으면 새 폴더
+        if prev.get("dst_size") != os.path.getsize(item.dst):
+            return False
+        try:
+            st = os.stat(item.src)
+        except FileNotFoundError:
+            return True
+        return prev.get("size") == st.st_size and prev.get("mtime") == st.st_mtime_ns
+
+    def _transfer(self, item: TransferItem) -> str:
+        prev = self.journal.get(item)
+        if self._already_done(item, prev):
+            # 지난번에 끝났는데 원본 삭제 전에 멈췄을 수도 있다
+            if self.mode == "move" and os.path.exists(item.src):
+                os.remove(item.src)
+            self._add_bytes(item.size)
+            with self.lock:
+                self.resumed += 1
+            return "resumed"
+        if os.path.exists(item.dst):
+            raise FileExistsError(errno.EEXIST, "대상이 이미 있음 (덮어쓰지 않음)", item.dst)
+
+        os.makedirs(os.path.dirname(item.dst) or ".", exist_ok=True)
+        st = os.stat(item.src)
+        if self.mode == "move":
+            try:
+                if item.is_dir:
+                    os.rename(item.src, item.dst)
+                else:
+                    os.replace(item.src, item.dst)
+                self._add_bytes(item.size)
+                self.journal.record(item, "done", st, item.size)
+                return "rename"
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+            if item.is_dir:
+                # 장치 판단이 틀린 경우 (마운트 지점 등): 안전하게 shutil 에 맡김
+                shutil.move(item.src, item.dst)
+                self.journal.record(item, "done", st)
+                return "shutil"
+
+        method = self._copy(item, prev)
+        self.journal.record(item, "done", st, os.path.getsize(item.dst))
+        if self.mode == "move":
+            os.remove(item.src)
+        return method
+
+    def _copy(self, item: TransferItem, prev) -> str:
+        st = os.stat(item.src)
+        part = item.dst + PART_SUFFIX
+        pos = 0
+        if (prev and prev["status"] == "copying" and os.path.exists(part)
+                and prev.get("size") == st.st_size and prev.get("mtime") == st.st_mtime_ns):
+            # 원본이 그대로면 .part 에 이미 쓴 만큼은 다시 안 씀
+            pos = min(os.path.getsize(part), st.st_size)
+            with self.lock:
+                self.resumed += 1
+            self._add_bytes(pos)
+        self.journal.record(item, "copying", st)
+
+        fin = os.open(item.src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            fout = os.open(part, os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                os.ftruncate(fout, pos)
+                method = _kernel_copy(fin, fout, pos, st.st_size, self._add_bytes)
+            finally:
+                os.close(fout)
+        finally:
+            os.close(fin)
+        shutil.copystat(item.src, part)
+        os.replace(part, item.dst)
+        return method
+
+
+def format_stats(stats: dict, verb: str = "이동") -> str:
+    methods = ", ".join(f"{k} {v}" for k, v in sorted(stats["methods"].items()))
+    text = (
+        f"{verb} {stats['done_files']}/{stats['files']}개 파일, "
+        f"{stats['done_bytes'] / 1e6:.1f}/{stats['bytes'] / 1e6:.1f} MB, "
+        f"{stats['mb_per_sec']:.1f} MB/s, {stats['elapsed']:.2f}초"
+    )
+    if methods:
+        text += f" ({methods})"
+    if stats["resumed"]:
+        text += f" | 이어서 처리 {stats['resumed']}개"
+    return text
@@ -0,0 +1,186 @@
+"""대화 프롬프트 토큰 예산 관리 (오래된 턴은 요약으로 접기)
+
+프롬프트 = 시스템 지시 + [이전 대화 요약] + 최근 턴 그대로 + "어시스턴트:"
+- 토큰 수는 모델 tokenizer 로 센다 (메시지별로 한 번만 세서 dict 에 넣어둠)
+- 최근 턴이 recent_budget 을 넘으면 그 앞쪽을 요약에 접는다. 턴 사이에 백그라운드에서 돌고,
+  새 메시지가 오면 중단된다 (다음 기회에 다시).
+- 요약이 아직 못 따라왔어도 build 는 prompt_budget 을 넘지 않게 오래된 턴부터 뺀다.
+그래서 대화가 아무리 길어져도 프롬프트 크기(= 프롬프트 평가 시간)는 일정 범위 안에 머문다.
+메시지 하나가 혼자 예산을 넘으면 (message_limit) 화면 쪽에서 받지 않고, build 도 뒷부분만 넣는다.
+"""
+import threading
+
+SUMMARY_TOKENS = 300  # 요약 한 번에 생성할 최대 토큰
+FOLD_MIN_TOKENS = 512  # 접을 분량이 이만큼 쌓였을 때만 요약 (요약이 바뀌면 프롬프트 앞부분 KV 를 다시 평가하므로)
+FOLD_INPUT_TOKENS = 1500  # 요약 호출 한 번에 넣는 대화 분량
+
+SUMMARY_PROMPT = """다음은 사용자와 어시스턴트의 대화입니다. [기존 요약]과 [이어지는 대화]를 합쳐서
+사용자가 말한 사실, 요청, 선호, 결정된 내용이 빠지지 않도록 한국어로 짧게 요약하세요.
+
+[기존 요약]
+{summary}
+
+[이어지는 대화]
+{turns}
+
+요약:"""
+
+
+def format_turn(msg: dict) -> str:
+    if msg["role"] == "user":
+        return f"사용자: {msg['content']}\n"
+    return f"어시스턴트: {msg['content']}\n"
+
+
+class ChatContext:
+    def __init__(self, system_prompt: str, count_tokens=None, prompt_budget: int = 3072,
+                 recent_budget: int = 1536):
+        self.system_prompt = system_prompt
+        self.count_tokens = count_tokens  # text → 토큰 수 (모델 로드 후 설정, 없으면 글자 수로 어림)
+        self.prompt_budget = prompt_budget
+        self.recent_budget = recent_budget
+        self.lock = threading.Lock()
+        self.summary = ""
+        self.folded = 0  # history 앞에서부터 요약에 들어간 메시지 수
+        self.epoch = 0  # reset 마다 증가 (돌던 요약이 새 대화에 섞이지 않게)
+        self.last_stats = {}
+
+    def reset(self):
+        with self.lock:
+            self.summary = ""
+            self.folded = 0
+            self.epoch += 1
+
+    # -------------------------
+    # 토큰 수
+    # -------------------------
+    def tokens(self, text: str) -> int:
+        if self.count_tokens is None:
+            return len(text)  # 한글은 보통 글자당 1토큰 이상이라 넉넉한 쪽
+        return self.count_tokens(text)
+
+    def msg_tokens(self, msg: dict) -> int:
+        n = msg.get("tokens")
+        if n is None:
+            n = self.tokens(format_turn(msg))
+            if self.count_tokens is not None:
+                msg["tokens"] = n  # 어림값은 저장 안 함
+        return n
+
+    def message_limit(self) -> int:
+        """요약 없이 시스템 지시와 같이 들어갈 수 있는 메시지 하나의 최대 토큰 수"""
+        return self.prompt_budget - self.tokens(self.system_prompt) - self.tokens("어시스턴트:")
+
+    def _summary_block(self, summary: str) -> str:
+        return f"[이전 대화 요약]\n{summary}\n\n" if summary else ""
+
+    # -------------------------
+    # 프롬프트
+    # -------------------------
+    def build(self, history: list) -> str:
+        """예산 안에 들어가는 프롬프트. 들어간 턴은 앞부분이 매 턴 그대로 유지된다 (KV 재사용)"""
+        with self.lock:
+            summary, folded = self.summary, self.folded
+        head = self.system_prompt + self._summary_block(summary)
+        budget = self.prompt_budget - self.tokens(head) - self.tokens("어시스턴트:")
+
+        recent = history[folded:]
+        start = len(recent)
+        used = 0
+        while start > 0:
+            n = self.msg_tokens(recent[start - 1])
+            if used + n > budget:
+                if start == len(recent):
+                    # 마지막 메시지는 혼자 넘더라도 뒷부분만이라도 넣는다 (n_ctx 를 넘지 않게)
+                    recent = recent[:-1] + [self._clip(recent[-1], budget)]
+                    used = self.msg_tokens(recent[-1])
+                    start -= 1
+                break
+            used += n
+            start -= 1
+
+        self.last_stats = {
+            "summary_folded": folded,
+            "kept": len(recent) - start,
+            "dropped": start,  # 요약이 아직 못 따라와서 빠진 메시지
+            "prompt_tokens": self.tokens(head) + used,
+        }
+        return head + "".join(format_turn(m) for m in recent[start:]) + "어시스턴트:"
+
+    def _clip(self, msg: dict, budget: int) -> dict:
+        content = msg["content"]
+        while content:
+            clipped = {"role": msg["role"], "content": "…" + content}
+            if self.tokens(format_turn(clipped)) <= budget:
+                return clipped
+            content = content[len(content) // 10 + 1:]
+        return {"role": msg["role"], "content": ""}
+
+    # -------------------------
+    # 요약으로 접기
+    # -------------------------
+    def fold_range(self, history: list):
+        """요약에 접을 history[folded:end] 의 end (접을 게 충분하지 않으면 None)"""
+        with self.lock:
+            folded = self.folded
+        used = 0
+        end = len(history)
+        while end > folded:
+            n = self.msg_tokens(history[end - 1])
+            if used + n > self.recent_budget:
+                break
+            used += n
+            end -= 1
+        pending = sum(self.msg_tokens(m) for m in history[folded:end])
+        return end if pending >= FOLD_MIN_TOKENS else None
+
+    def compact(self, history: list, summarize) -> int:
+        """summarize(기존 요약, 대화 텍스트) → 새 요약 (None 이면 중단). 접은 메시지 수를 돌려준다"""
+        end = self.fold_range(history)
+        if end is None:
+            return 0
+        with self.lock:
+            summary, folded, epoch = self.summary, self.folded, self.epoch
+        start = folded
+        while folded < end:
+            # 한 번에 넣을 만큼씩 (최소 한 메시지)
+            stop, used = folded, 0
+            while stop < end and (stop == folded or used + self.msg_tokens(history[stop]) <= FOLD_INPUT_TOKENS):
+                used += self.msg_tokens(history[stop])
+                stop += 1
+            text = "".join(format_turn(m) for m in history[folded:stop])
+            new_summary = summarize(summary, text)
+            if new_summary is None:
+                break
+            with self.lock:
+                if self.epoch != epoch:
+                    break
+                summary, folded = new_summary.strip(), stop
+                self.summary, self.folded = summary, folded
+        return folded - start
+
+
+def make_summarizer(llm, cancel: threading.Event = None, max_tokens: int = SUMMARY_TOKENS):
+    """ChatContext.compact 에 넘길 요약 함수. cancel 이 켜지면 생성을 끊고 None"""
+    from llm_backend import is_remote
+
+    def summarize(summary: str, turns: str):
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(없음)", turns=turns)
+        kwargs = dict(max_tokens=max_tokens, temperature=0.2, stop=["\n\n사용자:", "[이어지는"], stream=True)
+        if cancel is not None and not is_remote(llm):
+            from llama_cpp import StoppingCriteriaList
+            kwargs["stopping_criteria"] = StoppingCriteriaList([lambda ids, logits: cancel.is_set()])
+        pieces = []
+        stream = llm(prompt, **kwargs)
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    return None
+                pieces.append(chunk["choices"][0]["text"])
+        finally:
+            stream.close()
+        if cancel is not None and cancel.is_set():
+            return None
+        return "".join(pieces)
+
+    return summarize
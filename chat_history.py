@@ -0,0 +1,118 @@
+"""채팅 기록 (덧붙이기만 하는 JSONL)
+
+한 줄에 메시지 하나: {"role": ..., "content": ..., "ts": ...}
+- append 는 파일 끝에 한 줄 쓰고 바로 flush (중간에 꺼져도 앞 기록은 안전)
+- read_before 는 파일 끝(또는 주어진 위치)에서 거꾸로 블록 단위로 읽어서 직전 메시지 n개만 돌려준다.
+  세션이 아무리 길어도 재개할 때는 마지막 몇 블록만 읽는다.
+- 메시지 위치(바이트 오프셋)가 곧 커서라서, 위로 스크롤하면 그 위치 앞을 다시 read_before 로 읽는다.
+  화면에서 아래쪽을 잘라냈으면 아래로 스크롤할 때 read_after 로 그 위치부터 읽는다.
+"""
+import json
+import os
+import threading
+import time
+
+READ_BLOCK = 64 * 1024
+
+
+class ChatLog:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, "ab")
+        self.size = self._f.tell()
+        if self.size > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # 쓰다 끊긴 마지막 줄은 닫아서 버림 (읽을 때 JSON 오류로 건너뜀)
+                    self._write(b"\n")
+
+    def _write(self, data: bytes):
+        self._f.write(data)
+        self._f.flush()
+        self.size += len(data)
+
+    def append(self, role: str, content: str) -> int:
+        """기록하고 그 메시지의 오프셋을 돌려준다"""
+        line = json.dumps({"role": role, "content": content, "ts": round(time.time(), 3)}, ensure_ascii=False)
+        with self.lock:
+            offset = self.size
+            self._write(line.encode("utf-8") + b"\n")
+        return offset
+
+    def read_before(self, end: int = None, limit: int = 50) -> list:
+        """end 바이트 앞에 있는 메시지 최대 limit 개 [(오프셋, msg), ...] (오래된 순)"""
+        with self.lock:
+            end = self.size if end is None else min(end, self.size)
+        if end <= 0 or limit <= 0:
+            return []
+        buf = b""
+        pos = end
+        with open(self.path, "rb") as f:
+            # 줄바꿈이 limit 개를 넘으면 맨 앞 조각을 빼도 완전한 줄이 limit 개 이상
+            while pos > 0 and buf.count(b"\n") <= limit:
+                step = min(READ_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+
+        out = []
+        offset = pos
+        for i, seg in enumerate(buf.split(b"\n")):
+            start = offset
+            offset += len(seg) + 1
+            if (i == 0 and pos > 0) or not seg.strip():
+                continue  # 앞이 잘린 조각 / 빈 줄
+            try:
+                msg = json.loads(seg)
+            except ValueError:
+                continue
+            if isinstance(msg, dict) and "role" in msg:
+                out.append((start, msg))
+        return out[-limit:]
+
+    def read_after(self, start: int, limit: int = 50) -> list:
+        """start 바이트 이후에 시작하는 메시지 최대 limit 개 [(오프셋, msg), ...] (오래된 순)"""
+        with self.lock:
+            end = self.size
+        out = []
+        if start >= end or limit <= 0:
+            return out
+        with open(self.path, "rb") as f:
+            offset = max(0, start)
+            if offset > 0:
+                f.seek(offset - 1)
+                if f.read(1) != b"\n":
+                    offset += len(f.readline())  # 줄 중간이면 다음 줄부터
+            f.seek(offset)
+            while offset < end and len(out) < limit:
+                seg = f.readline()
+                if not seg:
+                    break
+                at = offset
+                offset += len(seg)
+                try:
+                    msg = json.loads(seg)
+                except ValueError:
+                    continue
+                if isinstance(msg, dict) and "role" in msg:
+                    out.append((at, msg))
+        return out
+
+    def archive(self) -> str:
+        """지금 기록을 날짜 붙은 파일로 넘기고 빈 기록에서 새로 시작"""
+        stem, ext = os.path.splitext(self.path)
+        target = f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+        with self.lock:
+            self._f.close()
+            if self.size > 0:
+                os.replace(self.path, target)
+            self._f = open(self.path, "ab")
+            self.size = 0
+        return target
+
+    def close(self):
+        with self.lock:
+            self._f.close()
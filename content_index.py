@@ -0,0 +1,278 @@
+"""텍스트 파일 본문 역색인 (sqlite)
+
+FileIndex 와 같은 DB 에 테이블을 두고, files 테이블과 비교해서
+path+mtime+size 가 바뀐 문서만 다시 읽는다.
+한글은 글자 bigram (+ 구간 끝 글자 하나), 영문/숫자는 단어 단위로 토큰화한다.
+한 글자 질의 ("쌀") 는 그 글자로 시작하는 토큰 전부로 찾는다 (구간 끝 글자 덕분에 "백미쌀" 도 걸린다).
+조회는 postings 만 보고 BM25 점수로 정렬한다 (파일을 열지 않음).
+"""
+import codecs
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from file_index import RESTAT_FILES_BACKGROUND, FileIndex, normalize_ext
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id     INTEGER PRIMARY KEY,
+    path   TEXT UNIQUE NOT NULL,
+    size   INTEGER NOT NULL,
+    mtime  REAL NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term   TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf     INTEGER NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc_id);
+CREATE TABLE IF NOT EXISTS content_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+TOKENIZER_VERSION = "2"  # tokenize 가 바뀌면 올린다 (기존 본문 색인을 버리고 다시 만듦)
+
+TEXT_EXTS = {
+    ".txt", ".md", ".log", ".csv", ".tsv", ".json", ".xml", ".html", ".htm",
+    ".ini", ".cfg", ".conf", ".yaml", ".yml", ".py", ".js", ".java", ".c",
+    ".cpp", ".h", ".sql", ".srt", ".rst",
+}
+MAX_BYTES = 4 * 1024 * 1024  # 이보다 큰 파일은 본문 색인 안 함
+ENCODINGS = ("utf-8", "cp949")
+SNIFF_BYTES = 4096  # 텍스트인지 볼 앞부분 (여기에 NUL 이 있으면 바이너리)
+
+_RUN_RE = re.compile(r"[가-힣]+|[a-z0-9]+")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str, query: bool = False) -> list:
+    """한글 연속 구간 → 글자 bigram, 영문/숫자 → 소문자 단어
+
+    문서 쪽은 구간 끝 글자도 넣는다 (모든 글자가 어떤 토큰의 첫 글자가 되도록).
+    질의 쪽은 한 글자 구간만 한 글자 토큰으로 둔다 (search 에서 앞부분 일치로 찾음).
+    """
+    tokens = []
+    for run in _RUN_RE.findall(text.lower()):
+        if "가" <= run[0] <= "힣":
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if not query or len(run) == 1:
+                tokens.append(run[-1])
+        elif len(run) >= 2:
+            tokens.append(run)
+    return tokens
+
+
+def _term_match(term: str, column: str = "term"):
+    """(WHERE 조건, 인자). 한 글자 한글은 그 글자로 시작하는 토큰 전부 (PK 범위 조회)"""
+    if len(term) == 1 and "가" <= term <= "힣":
+        return f"{column} >= ? AND {column} < ?", (term, chr(ord(term) + 1))
+    return f"{column} = ?", (term,)
+
+
+def _looks_binary(raw: bytes) -> bool:
+    return b"\x00" in raw[:SNIFF_BYTES]
+
+
+def text_encoding(path: str):
+    """앞부분만 보고 텍스트 파일이면 인코딩 (pdf/docx/hwp 같은 바이너리거나 못 읽으면 None)"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return None
+    if _looks_binary(head):
+        return None
+    for enc in ENCODINGS:
+        try:
+            # 끝에서 잘린 멀티바이트 글자는 오류로 치지 않음
+            codecs.getincrementaldecoder(enc)().decode(head, final=len(head) < SNIFF_BYTES)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def _read_text(path: str):
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(MAX_BYTES + 1)
+    except OSError:
+        return None
+    if len(raw) > MAX_BYTES or _looks_binary(raw):
+        return None
+    for enc in ENCODINGS:
+        try:
+            return raw.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+class ContentIndex:
+    def __init__(self, file_index: FileIndex, exts=None):
+        self.files = file_index
+        self.conn = file_index.conn
+        self.lock = file_index.lock
+        self.exts = sorted(exts or TEXT_EXTS)
+        with self.lock:
+            self.conn.executescript(SCHEMA)
+            row = self.conn.execute("SELECT value FROM content_meta WHERE key = 'tokenizer'").fetchone()
+            if row is None or row[0] != TOKENIZER_VERSION:
+                # 토큰이 달라졌으니 다음 update 에서 전부 다시 읽게
+                self.conn.execute("DELETE FROM postings")
+                self.conn.execute("DELETE FROM docs")
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO content_meta (key, value) VALUES ('tokenizer', ?)", (TOKENIZER_VERSION,)
+                )
+                self.conn.commit()
+        self.error = None  # 마지막 백그라운드 갱신 실패 (성공하면 None)
+
+    # -------------------------
+    # 갱신
+    # -------------------------
+    def update(self, batch_size: int = 200) -> dict:
+        """files 테이블과 비교해서 바뀐 문서만 다시 색인"""
+        stats = {"indexed": 0, "removed": 0, "skipped": 0}
+        # 백그라운드에서 불리므로 파일 stat 비교를 넉넉히 (제자리에서 고친 문서도 잡도록)
+        self.files.refresh(restat_files=RESTAT_FILES_BACKGROUND)
+        marks = ", ".join("?" * len(self.exts))
+        with self.lock:
+            removed = self.conn.execute(
+                f"""SELECT d.id FROM docs d LEFT JOIN files f ON f.path = d.path
+                    WHERE f.path IS NULL OR f.ext NOT IN ({marks}) OR f.size > ?""",
+                (*self.exts, MAX_BYTES),
+            ).fetchall()
+            for (doc_id,) in removed:
+                self._delete_doc(doc_id)
+            stats["removed"] = len(removed)
+
+            stale = self.conn.execute(
+                f"""SELECT f.path, f.size, f.mtime FROM files f LEFT JOIN docs d ON d.path = f.path
+                    WHERE f.ext IN ({marks}) AND f.size <= ?
+                      AND (d.path IS NULL OR d.size != f.size OR d.mtime != f.mtime)""",
+                (*self.exts, MAX_BYTES),
+            ).fetchall()
+            self.conn.commit()
+
+        # 파일 읽기는 락 밖에서, 쓰기만 배치로 묶어서
+        batch = []
+        for path, size, mtime in stale:
+            text = _read_text(path)
+            if text is None:
+                stats["skipped"] += 1
+                text = ""
+            batch.append((path, size, mtime, Counter(tokenize(text))))
+            if len(batch) >= batch_size:
+                stats["indexed"] += self._write_batch(batch)
+                batch = []
+        if batch:
+            stats["indexed"] += self._write_batch(batch)
+        return stats
+
+    def _delete_doc(self, doc_id: int):
+        self.conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+
+    def _write_batch(self, batch: list) -> int:
+        with self.lock:
+            for path, size, mtime, counts in batch:
+                row = self.conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+                if row:
+                    self._delete_doc(row[0])
+                cur = self.conn.execute(
+                    "INSERT INTO docs (path, size, mtime, length) VALUES (?, ?, ?, ?)",
+                    (path, size, mtime, sum(counts.values())),
+                )
+                doc_id = cur.lastrowid
+                self.conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    ((term, doc_id, tf) for term, tf in counts.items()),
+                )
+            self.conn.commit()
+        return len(batch)
+
+    # -------------------------
+    # 조회
+    # -------------------------
+    def search(self, query: str, exts=None, top_k: int = 100) -> list:
+        """query 의 모든 토큰을 포함하는 문서를 BM25 순으로 [(path, score), ...]"""
+        terms = sorted(set(tokenize(query, query=True)))
+        if not terms:
+            return []
+        with self.lock:
+            n_docs, avg_len = self.conn.execute(
+                "SELECT COUNT(*), AVG(length) FROM docs"
+            ).fetchone()
+            if not n_docs:
+                return []
+            avg_len = avg_len or 1.0
+
+            df = {}
+            for t in terms:
+                where, args = _term_match(t)
+                df[t] = self.conn.execute(
+                    f"SELECT COUNT(DISTINCT doc_id) FROM postings WHERE {where}", args
+                ).fetchone()[0]
+                if df[t] == 0:
+                    return []
+
+            # 가장 드문 토큰의 문서만 후보로 삼는다
+            rare_where, rare_args = _term_match(min(terms, key=df.get))
+            rows = []
+            for t in terms:
+                where, args = _term_match(t, "p.term")
+                rows.extend(
+                    (doc_id, t, tf, length, path)
+                    for doc_id, tf, length, path in self.conn.execute(
+                        f"""SELECT p.doc_id, SUM(p.tf), d.length, d.path
+                            FROM postings p JOIN docs d ON d.id = p.doc_id
+                            WHERE {where}
+                              AND p.doc_id IN (SELECT doc_id FROM postings WHERE {rare_where})
+                            GROUP BY p.doc_id""",
+                        (*args, *rare_args),
+                    )
+                )
+
+        wanted = {normalize_ext(e) for e in exts or [] if e.strip()}
+        matched = {}
+        scores = {}
+        for doc_id, term, tf, length, path in rows:
+            idf = math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len)
+            scores[path] = scores.get(path, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+            matched[path] = matched.get(path, 0) + 1
+
+        hits = [
+            (path, score) for path, score in scores.items()
+            if matched[path] == len(terms)
+            and (not wanted or any(path.lower().endswith(e) for e in wanted))
+        ]
+        hits.sort(key=lambda h: (-h[1], h[0]))
+        return hits[:max(0, int(top_k))]
+
+    def start_background(self, interval: float = 30.0, on_status=None) -> threading.Thread:
+        """interval 초마다 update() 를 도는 데몬 스레드 (조회 시점엔 파일을 열지 않도록)
+
+        실패하면 self.error 에 남기고 on_status(문자열) 로 알린다 (다음 주기에 다시 시도).
+        """
+        def loop():
+            while True:
+                try:
+                    self.update()
+                    self.error = None
+                except Exception as e:
+                    self.error = str(e)
+                    if on_status is not None:
+                        on_status(f"본문 색인 갱신 실패: {e}")
+                time.sleep(interval)
+
+        t = threading.Thread(target=loop, daemon=True)
+        t.start()
+        return t
@@ -0,0 +1,208 @@
+"""중복 파일 찾기 (단계별 해시)
+
+1) 크기: FileIndex 에서 같은 크기가 2개 이상인 파일만 (디스크를 읽지 않음).
+   같은 (장치, inode) 인 하드 링크는 한 파일이라 (지워도 공간이 안 생김) 하나만 남긴다
+2) 앞/뒤 블록 해시: 파일마다 PARTIAL_BLOCK 두 번만 읽어서 후보를 줄인다
+3) 전체 해시: 그래도 같은 후보만 끝까지 읽는다
+
+해시는 프로세스 풀에서 계산하고, (장치, inode, 크기, mtime) 를 키로 sqlite 에 저장해서
+파일이 그대로면 다음 실행 때 다시 읽지 않는다. 크기 그룹은 묶음 단위로 스트리밍한다.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PARTIAL_BLOCK = 64 * 1024
+FULL_CHUNK = 4 * 1024 * 1024
+BATCH_FILES = 4096  # 한 번에 해시할 파일 수 (메모리 상한)
+POOL_MIN_JOBS = 64  # 이보다 적으면 프로세스 풀 없이 바로 계산
+
+
+def _digest():
+    return hashlib.blake2b(digest_size=20)
+
+
+def _hash_file(job):
+    """(path, kind, size) → (path, 파일 식별 키, 해시) / 읽기 실패면 해시 None
+
+    프로세스 풀에서 돌아서 최상위 함수여야 한다.
+    """
+    path, kind, size = job
+    try:
+        st = os.stat(path)
+        ident = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        h = _digest()
+        with open(path, "rb") as f:
+            if kind == "partial" and size > 2 * PARTIAL_BLOCK:
+                h.update(f.read(PARTIAL_BLOCK))
+                f.seek(-PARTIAL_BLOCK, os.SEEK_END)
+                h.update(f.read(PARTIAL_BLOCK))
+            else:
+                while True:
+                    block = f.read(FULL_CHUNK)
+                    if not block:
+                        break
+                    h.update(block)
+        return path, ident, h.hexdigest()
+    except OSError:
+        return path, None, None
+
+
+class HashCache:
+    """(dev, ino, size, mtime_ns, kind) → 해시"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, kind TEXT, digest TEXT NOT NULL,"
+            " PRIMARY KEY (dev, ino, size, mtime_ns, kind))"
+        )
+
+    def get_many(self, idents: list, kind: str) -> dict:
+        out = {}
+        with self.lock:
+            for ident in idents:
+                row = self.conn.execute(
+                    "SELECT digest FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? AND kind = ?",
+                    (*ident, kind),
+                ).fetchone()
+                if row:
+                    out[ident] = row[0]
+        return out
+
+    def put_many(self, rows: list, kind: str):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                [(*ident, kind, digest) for ident, digest in rows],
+            )
+            self.conn.commit()
+
+
+class DuplicateFinder:
+    def __init__(self, file_index, cache: HashCache, workers: int = None):
+        self.file_index = file_index
+        self.cache = cache
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.stats = {}
+
+    def _collapse_links(self, groups: list):
+        """({path: 파일 식별 키}, 하드 링크를 하나로 줄인 크기 그룹)"""
+        idents = {}
+        out = []
+        for size, paths in groups:
+            seen = set()
+            keep = []
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) in seen:
+                    self.stats["hardlinks"] += 1
+                    continue
+                seen.add((st.st_dev, st.st_ino))
+                idents[path] = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+                keep.append(path)
+            if len(keep) > 1:
+                out.append((size, keep))
+        return idents, out
+
+    def _hash_stage(self, pool, paths_sizes: list, kind: str, idents: dict) -> dict:
+        """[(path, size)] → {path: 해시}. 캐시에 있으면 파일을 읽지 않는다"""
+        keys = [idents[p] for p, _ in paths_sizes]
+        cached = self.cache.get_many(keys, kind)
+        out = {p: cached[idents[p]] for p, _ in paths_sizes if idents[p] in cached}
+        self.stats["cache_hits"] += len(out)
+
+        jobs = [(p, kind, size) for p, size in paths_sizes if p not in out]
+        if not jobs:
+            return out
+        if pool is not None and len(jobs) >= POOL_MIN_JOBS:
+            results = pool.map(_hash_file, jobs, chunksize=max(1, len(jobs) // (self.workers * 4)))
+        else:
+            results = map(_hash_file, jobs)
+
+        new_rows = []
+        for (path, ident, digest), (_, _, size) in zip(results, jobs):
+            if digest is None:
+                continue
+            out[path] = digest
+            new_rows.append((ident, digest))
+            self.stats[kind + "_hashed"] += 1
+            self.stats["bytes_read"] += min(size, 2 * PARTIAL_BLOCK) if kind == "partial" else size
+        self.cache.put_many(new_rows, kind)
+        return out
+
+    @staticmethod
+    def _regroup(groups: list, digests: dict) -> list:
+        out = []
+        for size, paths in groups:
+            by_hash = {}
+            for p in paths:
+                if p in digests:
+                    by_hash.setdefault(digests[p], []).append(p)
+            out.extend((size, ps) for ps in by_hash.values() if len(ps) > 1)
+        return out
+
+    def _process(self, pool, groups: list) -> list:
+        idents, groups = self._collapse_links(groups)
+        self.stats["size_groups"] += len(groups)
+        partial = self._hash_stage(pool, [(p, s) for s, ps in groups for p in ps], "partial", idents)
+        groups = self._regroup(groups, partial)
+        # 앞뒤 블록이 곧 전체인 작은 파일은 이미 확정
+        done = [g for g in groups if g[0] <= 2 * PARTIAL_BLOCK]
+        rest = [g for g in groups if g[0] > 2 * PARTIAL_BLOCK]
+        full = self._hash_stage(pool, [(p, s) for s, ps in rest for p in ps], "full", idents)
+        return done + self._regroup(rest, full)
+
+    def find(self, exts=None, min_size: int = 1) -> list:
+        """[(크기, [경로, ...]), ...] 낭비되는 용량이 큰 순"""
+        t0 = time.perf_counter()
+        self.stats = {"candidates": 0, "size_groups": 0, "hardlinks": 0, "partial_hashed": 0, "full_hashed": 0,
+                      "cache_hits": 0, "bytes_read": 0}
+        result = []
+        pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        try:
+            batch, n = [], 0
+            for size, paths in self.file_index.same_size_groups(exts, min_size):
+                self.stats["candidates"] += len(paths)
+                batch.append((size, paths))
+                n += len(paths)
+                if n >= BATCH_FILES:
+                    result.extend(self._process(pool, batch))
+                    batch, n = [], 0
+            if batch:
+                result.extend(self._process(pool, batch))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        result.sort(key=lambda g: g[0] * (len(g[1]) - 1), reverse=True)
+        self.stats["elapsed"] = time.perf_counter() - t0
+        return result
+
+
+def format_duplicates(groups: list, stats: dict, max_groups: int = 50) -> str:
+    if not groups:
+        return f"중복 파일 없음 (같은 크기 후보 {stats['candidates']}개 검사, {stats['elapsed']:.2f}초)"
+    wasted = sum(size * (len(paths) - 1) for size, paths in groups)
+    lines = [f"중복 {len(groups)}묶음, 정리하면 {wasted / 1e6:.1f} MB 확보 가능"]
+    for size, paths in groups[:max_groups]:
+        lines.append(f"\n[{size:,} bytes × {len(paths)}]")
+        lines.extend("  " + p for p in sorted(paths))
+    if len(groups) > max_groups:
+        lines.append(f"\n... 외 {len(groups) - max_groups}묶음")
+    if stats.get("hardlinks"):
+        lines.append(f"\n(하드 링크 {stats['hardlinks']}개는 원본과 같은 파일이라 중복에서 뺐음)")
+    lines.append(
+        f"\n후보 {stats['candidates']}개 | 앞뒤 해시 {stats['partial_hashed']} / 전체 해시 {stats['full_hashed']} / "
+        f"캐시 {stats['cache_hits']} | 읽은 양 {stats['bytes_read'] / 1e6:.1f} MB | {stats['elapsed']:.2f}초"
+    )
+    return "\n".join(lines)
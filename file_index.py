@@ -0,0 +1,299 @@
+"""관리 폴더 메타데이터 인덱스 (sqlite)
+
+search_files 가 매번 os.walk 로 전체를 훑지 않도록
+경로/이름/확장자/크기/mtime 을 디스크에 저장해 두고 조회한다.
+refresh() 는 mtime 이 바뀐 디렉토리만 다시 스캔한다. 제자리에서 고친 파일은 디렉토리 mtime 을
+바꾸지 않으므로, refresh 마다 RESTAT_FILES 개 정도씩 돌아가며 파일 stat 도 다시 비교한다.
+첫 refresh 가 끝나기 전 (built 가 False) 에는 live_search 로 직접 훑는다.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path  TEXT PRIMARY KEY,
+    dir   TEXT NOT NULL,
+    name  TEXT NOT NULL,
+    ext   TEXT NOT NULL,
+    size  INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS files_ext ON files(ext);
+CREATE INDEX IF NOT EXISTS files_size ON files(size);
+
+CREATE TABLE IF NOT EXISTS dirs (
+    path   TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+"""
+
+RESTAT_FILES = 2000  # refresh 한 번에 다시 stat 할 파일 수 (조회 경로에서도 불리므로 작게)
+RESTAT_FILES_BACKGROUND = 50000  # 백그라운드 갱신에서 쓸 값
+
+
+def normalize_ext(ext: str) -> str:
+    # "pdf", ".PDF" → ".pdf"
+    ext = ext.strip().lower()
+    if ext and not ext.startswith("."):
+        ext = "." + ext
+    return ext
+
+
+def _like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _ext_condition(exts):
+    """확장자 목록 → (SQL 조건 또는 None, 파라미터)"""
+    simple, compound = [], []
+    for e in exts or []:
+        e = normalize_ext(e)
+        if not e:
+            continue
+        # ".tar.gz" 처럼 점이 여러 개면 이름 끝으로 비교
+        (compound if "." in e[1:] else simple).append(e)
+    conds, params = [], []
+    if simple:
+        conds.append(f"ext IN ({', '.join('?' * len(simple))})")
+        params.extend(simple)
+    for e in compound:
+        conds.append("lower(name) LIKE ? ESCAPE '\\'")
+        params.append("%" + _like_escape(e))
+    if not conds:
+        return None, []
+    return "(" + " OR ".join(conds) + ")", params
+
+
+class FileIndex:
+    def __init__(self, root: str, db_path: str, min_refresh_interval: float = 2.0):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path
+        self.min_refresh_interval = min_refresh_interval
+        self.last_refresh = 0.0
+        self.lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # 루트 디렉토리 행은 첫 refresh 가 끝날 때 같이 커밋된다
+        self.built = self.conn.execute("SELECT 1 FROM dirs WHERE path = ?", (self.root,)).fetchone() is not None
+        self._build_lock = threading.Lock()  # self.lock 은 refresh 동안 잡혀 있으므로 따로
+        self._build_thread = None
+        self._restat_after = ""  # _restat 이 마지막으로 본 디렉토리 (경로 순)
+        self.listeners = []  # refresh 뒤 [(디렉토리, 파일 이름 목록 또는 None)] 를 받을 함수
+
+    # -------------------------
+    # 갱신
+    # -------------------------
+    def refresh(self, restat_files: int = RESTAT_FILES) -> dict:
+        """mtime 이 바뀐 디렉토리만 다시 읽어서 인덱스를 맞춘다.
+
+        파일 내용만 고치면 디렉토리 mtime 은 그대로라서, 그와 별도로 매번 restat_files 개 정도씩
+        디렉토리를 돌아가며 파일 크기/mtime 을 다시 비교한다 (전체를 한 바퀴 도는 데 여러 번 걸림).
+        """
+        stats = {"dirs_checked": 0, "dirs_rescanned": 0, "files_added": 0, "files_removed": 0,
+                 "files_restat": 0, "dirs_restat_changed": 0}
+        with self.lock:
+            known = {}
+            children = {}
+            for path, parent, mtime in self.conn.execute("SELECT path, parent, mtime FROM dirs"):
+                known[path] = mtime
+                children.setdefault(parent, []).append(path)
+
+            seen = set()
+            changes = []
+            stack = [self.root]
+            cur = self.conn.cursor()
+            while stack:
+                d = stack.pop()
+                try:
+                    st = os.stat(d)
+                except OSError:
+                    continue
+                seen.add(d)
+                stats["dirs_checked"] += 1
+
+                if known.get(d) == st.st_mtime:
+                    # 디렉토리 항목이 그대로면 하위 디렉토리만 따라 내려간다
+                    stack.extend(children.get(d, ()))
+                    continue
+
+                rows = self._read_dir(d, stack)
+                if rows is None:
+                    continue
+                stats["dirs_rescanned"] += 1
+                self._store_dir(cur, d, rows, st.st_mtime, stats, changes)
+
+            # 사라진 디렉토리 정리
+            gone = [p for p in known if p not in seen]
+            for p in gone:
+                n = cur.execute("SELECT COUNT(*) FROM files WHERE dir = ?", (p,)).fetchone()[0]
+                stats["files_removed"] += n
+                cur.execute("DELETE FROM files WHERE dir = ?", (p,))
+                cur.execute("DELETE FROM dirs WHERE path = ?", (p,))
+                changes.append((p, None))
+
+            if known:
+                self._restat(cur, restat_files, stats, changes)
+
+            self.conn.commit()
+            self.last_refresh = time.time()
+            self.built = True
+            if changes:
+                for fn in self.listeners:
+                    fn(changes)
+        return stats
+
+    def _read_dir(self, d: str, subdirs: list = None):
+        """d 바로 아래 파일 행 목록 (하위 디렉토리는 subdirs 에 추가). 못 읽으면 None"""
+        rows = []
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if subdirs is not None:
+                                subdirs.append(entry.path)
+                            continue
+                        est = entry.stat()
+                    except OSError:
+                        continue
+                    name = entry.name
+                    rows.append((
+                        entry.path, d, name,
+                        os.path.splitext(name)[1].lower(),
+                        est.st_size, est.st_mtime,
+                    ))
+        except OSError:
+            return None
+        return rows
+
+    def _store_dir(self, cur, d: str, rows: list, mtime: float, stats: dict, changes: list):
+        old = cur.execute("SELECT COUNT(*) FROM files WHERE dir = ?", (d,)).fetchone()[0]
+        cur.execute("DELETE FROM files WHERE dir = ?", (d,))
+        cur.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", rows)
+        stats["files_removed"] += old
+        stats["files_added"] += len(rows)
+        changes.append((d, [r[2] for r in rows]))
+
+        parent = None if d == self.root else os.path.dirname(d)
+        cur.execute(
+            "INSERT OR REPLACE INTO dirs (path, parent, mtime) VALUES (?, ?, ?)",
+            (d, parent, mtime),
+        )
+
+    def _restat(self, cur, budget: int, stats: dict, changes: list):
+        """경로 순으로 지난번 이어서 디렉토리 몇 개의 파일 stat 을 DB 와 비교 (끝까지 가면 처음부터)"""
+        wrapped = False
+        while stats["files_restat"] < budget:
+            batch = cur.execute(
+                "SELECT path, mtime FROM dirs WHERE path > ? ORDER BY path LIMIT 64", (self._restat_after,)
+            ).fetchall()
+            if not batch:
+                if wrapped or not self._restat_after:
+                    break
+                self._restat_after, wrapped = "", True
+                continue
+            for d, mtime in batch:
+                self._restat_after = d
+                rows = self._read_dir(d)
+                if rows is None:
+                    continue
+                stats["files_restat"] += len(rows) + 1
+                old = {p: (size, m) for p, size, m in cur.execute(
+                    "SELECT path, size, mtime FROM files WHERE dir = ?", (d,))}
+                if old != {r[0]: (r[4], r[5]) for r in rows}:
+                    stats["dirs_restat_changed"] += 1
+                    self._store_dir(cur, d, rows, mtime, stats, changes)
+                if stats["files_restat"] >= budget:
+                    break
+
+    def start_build(self):
+        """첫 색인을 백그라운드에서 (이미 끝났거나 도는 중이면 아무것도 안 함)"""
+        with self._build_lock:
+            if self.built or (self._build_thread is not None and self._build_thread.is_alive()):
+                return
+            self._build_thread = threading.Thread(target=self.refresh, daemon=True)
+            self._build_thread.start()
+
+    def mark_stale(self):
+        """직접 파일을 바꾼 뒤: 다음 조회에서 min_refresh_interval 을 기다리지 않고 다시 확인"""
+        self.last_refresh = 0.0
+
+    def ensure_fresh(self):
+        if time.time() - self.last_refresh >= self.min_refresh_interval:
+            self.refresh()
+
+    # -------------------------
+    # 조회
+    # -------------------------
+    def search(self, keywords=None, exts=None, top_k: int = 100) -> list:
+        """이름에 keywords 가 모두 들어가고 확장자가 exts 중 하나인 파일 경로"""
+        self.ensure_fresh()
+
+        conds, params = [], []
+        for kw in keywords or []:
+            conds.append("instr(name, ?) > 0")
+            params.append(kw)
+
+        ext_sql, ext_params = _ext_condition(exts)
+        if ext_sql:
+            conds.append(ext_sql)
+            params.extend(ext_params)
+
+        sql = "SELECT path FROM files"
+        if conds:
+            sql += " WHERE " + " AND ".join(conds)
+        sql += " ORDER BY path LIMIT ?"
+        params.append(max(0, int(top_k)))
+
+        with self.lock:
+            return [row[0] for row in self.conn.execute(sql, params)]
+
+    def same_size_groups(self, exts=None, min_size: int = 1, batch: int = 512):
+        """크기가 같은 파일이 2개 이상인 (크기, [경로]) 를 크기 순으로 하나씩
+
+        크기 목록만 먼저 읽고 경로는 batch 개 크기씩 조회해서, 호출 쪽이 오래 걸려도 락을 오래 잡지 않는다.
+        """
+        self.ensure_fresh()
+        where, params = "size >= ?", [max(0, int(min_size))]
+        ext_sql, ext_params = _ext_condition(exts)
+        if ext_sql:
+            where += " AND " + ext_sql
+            params.extend(ext_params)
+
+        with self.lock:
+            sizes = [row[0] for row in self.conn.execute(
+                f"SELECT size FROM files WHERE {where} GROUP BY size HAVING COUNT(*) > 1 ORDER BY size", params)]
+        for i in range(0, len(sizes), batch):
+            part = sizes[i:i + batch]
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT size, path FROM files WHERE {where} AND size IN ({', '.join('?' * len(part))})"
+                    " ORDER BY size, path",
+                    params + part,
+                ).fetchall()
+            group, cur = [], None
+            for size, path in rows:
+                if size != cur and group:
+                    yield cur, group
+                    group = []
+                cur = size
+                group.append(path)
+            if group:
+                yield cur, group
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
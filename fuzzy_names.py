@@ -0,0 +1,161 @@
+"""모델이 낸 파일 이름을 실제 파일로 맞추는 메모리 trigram 색인
+
+"보고서.txt" 처럼 실제 ("보고서_final.txt") 와 조금 다른 이름이 오면 제일 가까운 파일을 찾는다.
+- 이름 (소문자, 공백/하이픈은 밑줄로, 앞 공백 2칸 / 뒤 1칸) 의 3글자 조각마다 파일 id 목록 (array) 을 둔다.
+- 조회: 질의 조각을 목록이 짧은 (드문) 순으로 세다가 센 id 가 POSTING_BUDGET 을 넘으면 멈춘다
+  (".tx", "txt" 같은 흔한 조각은 세지 않음). 조각이 전부 흔하면 가장 드문 목록의 앞부분만 센다
+  (그런 이름은 어차피 비슷한 파일이 너무 많아 하나로 고를 수 없다).
+  많이 겹친 후보 CANDIDATES 개만 다시 채점하므로 백만 파일에서도 1ms 안쪽.
+- 점수: 확장자를 뺀 이름끼리 Dice 계수와 질의 조각이 후보에 들어 있는 비율의 평균
+  (확장자는 같아야 하고, 모델은 보통 이름 일부를 빼먹으므로 포함 비율도 본다).
+- FileIndex.refresh 가 다시 읽은 디렉토리만 on_change 로 받아서 고친다 (지운 id 는 표시만 하고
+  많이 쌓이면 한 번에 다시 만든다). 처음에는 sqlite 의 files 테이블에서 채운다.
+"""
+import os
+import threading
+from array import array
+from collections import Counter
+
+POSTING_BUDGET = 3000  # 후보 수집에서 셀 id 수 상한
+CANDIDATES = 32  # 정밀 채점할 후보 수
+MIN_SCORE = 0.45  # 이보다 낮으면 비슷한 파일 없음
+MARGIN = 0.1  # 1등과 2등 점수 차가 이보다 작으면 애매하다고 보고 고르지 않음
+DIR_BONUS = 0.1  # 질의와 같은 폴더에 있는 파일 가산점 (MIN_SCORE 를 넘은 것만)
+
+
+_SEPARATORS = str.maketrans({" ": "_", "-": "_"})
+
+
+def grams(name: str) -> set:
+    # "분기별 매출 보고서" 와 "분기별_매출_보고서" 는 같은 조각으로
+    s = f"  {name.lower().translate(_SEPARATORS)} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class FuzzyNames:
+    def __init__(self, file_index):
+        self.files = file_index
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.loaded = False
+        self._clear()
+
+    def ensure_loaded(self):
+        """files 테이블에서 한 번 채우고 그다음부터는 refresh 변경분만 받는다"""
+        with self.load_lock:
+            if self.loaded:
+                return
+            files = self.files
+            with files.lock:
+                # 읽는 동안 refresh 가 끼어들지 않게 같은 락 안에서 읽고 구독
+                rows = files.conn.execute("SELECT dir, name FROM files ORDER BY dir").fetchall()
+                files.listeners.append(self.on_change)
+            by_dir = {}
+            for d, name in rows:
+                by_dir.setdefault(d, []).append(name)
+            with self.lock:
+                for d, names in by_dir.items():
+                    self._add_dir(d, names)
+            self.loaded = True
+
+    def start_background(self) -> threading.Thread:
+        """앱 시작을 늦추지 않도록 처음 채우기는 뒤에서"""
+        t = threading.Thread(target=self.ensure_loaded, daemon=True)
+        t.start()
+        return t
+
+    def _clear(self):
+        self.paths = []  # id → 전체 경로 (지운 항목은 None)
+        self.postings = {}  # 조각 → array('i') id 목록
+        self.by_dir = {}  # 디렉토리 → id 목록
+        self.dead = 0
+
+    def _add_dir(self, d: str, names):
+        ids = []
+        for name in names:
+            i = len(self.paths)
+            self.paths.append(os.path.join(d, name))
+            for g in grams(name):
+                p = self.postings.get(g)
+                if p is None:
+                    p = self.postings[g] = array("i")
+                p.append(i)
+            ids.append(i)
+        self.by_dir[d] = ids
+
+    def _drop_dir(self, d: str):
+        for i in self.by_dir.pop(d, ()):
+            self.paths[i] = None
+            self.dead += 1
+
+    def on_change(self, changes):
+        """FileIndex.refresh 가 부름: [(디렉토리, 파일 이름 목록 또는 사라졌으면 None)]"""
+        with self.lock:
+            for d, names in changes:
+                self._drop_dir(d)
+                if names:
+                    self._add_dir(d, names)
+            if self.dead > 10000 and self.dead > len(self.paths) // 2:
+                live = [p for p in self.paths if p is not None]
+                self._clear()
+                by_dir = {}
+                for p in live:
+                    by_dir.setdefault(os.path.dirname(p), []).append(os.path.basename(p))
+                for d, names in by_dir.items():
+                    self._add_dir(d, names)
+
+    def __len__(self) -> int:
+        return len(self.paths) - self.dead
+
+    # -------------------------
+    # 조회
+    # -------------------------
+    def lookup(self, query: str, limit: int = 5) -> list:
+        """비슷한 파일 [(경로, 점수)] 점수 높은 순. 확장자가 있으면 같은 확장자만"""
+        name = os.path.basename(query)
+        if not name:
+            return []
+        self.ensure_loaded()
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        q = grams(name)
+        qs = grams(stem)
+        qdir = os.path.dirname(query)
+        with self.lock:
+            lists = sorted((self.postings[g] for g in q if g in self.postings), key=len)
+            if not lists:
+                return []
+            counts = Counter(lists[0][:POSTING_BUDGET])
+            used = len(lists[0])
+            for p in lists[1:]:
+                used += len(p)
+                if used > POSTING_BUDGET:
+                    break
+                counts.update(p)
+            cands = [self.paths[i] for i, _ in counts.most_common(CANDIDATES)]
+
+        scored = []
+        for path in cands:
+            if path is None:
+                continue
+            base = os.path.basename(path)
+            cstem, cext = os.path.splitext(base)
+            if ext and cext.lower() != ext:
+                continue
+            g = grams(cstem)
+            shared = len(qs & g)
+            score = (2 * shared / (len(qs) + len(g)) + shared / len(qs)) / 2
+            if score >= MIN_SCORE and qdir and os.path.dirname(path) == qdir:
+                score += DIR_BONUS
+            scored.append((path, score))
+        scored.sort(key=lambda x: (-x[1], len(x[0])))
+        return scored[:limit]
+
+    def resolve(self, query: str):
+        """(고른 경로 또는 None, 후보 [(경로, 점수)]). 점수가 낮거나 1·2등이 비슷하면 None"""
+        cands = [c for c in self.lookup(query) if c[1] >= MIN_SCORE]
+        if not cands:
+            return None, []
+        if len(cands) > 1 and cands[0][1] - cands[1][1] < MARGIN:
+            return None, cands
+        return cands[0][0], cands
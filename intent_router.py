@@ -0,0 +1,137 @@
+"""규칙 기반 명령 해석기 (LLM 앞단 fast-path)
+
+"down 폴더 만들어줘" 처럼 뻔한 요청은 정규식으로 바로 JSON 을 만든다.
+route() 는 (cmd, confidence, rule) 을 돌려주고, 확신이 낮으면 cmd=None.
+cmd 는 llm_parse 출력과 같은 모양이라 normalize_cmd 로 그대로 넘기면 된다.
+잡아낸 이름이 "새", "파일" 같은 일반 명사/수식어면 (GENERIC_WORDS) 규칙이 물러나고 LLM 에 맡긴다.
+"""
+import re
+from collections import Counter
+
+# SYSTEM_PROMPT 의 키워드 규칙과 같은 힌트 (여러 tool 이 섞이면 애매한 요청)
+TOOL_HINTS = {
+    "search_files": ("찾아", "어디", "검색", "목록", "확장자"),
+    "summarize_file": ("요약",),
+    "create_folder": ("폴더",),
+    "create_file": ("파일 만들", "txt", "생성"),
+    "move_file": ("옮겨", "옮기", "이동", "보내"),
+    "find_duplicates": ("중복",),
+}
+
+# 같이 나와도 애매하지 않은 힌트 ("중복 파일 찾아줘" 의 "찾아")
+COMPATIBLE_HINTS = {
+    "find_duplicates": {"search_files"},
+}
+
+KNOWN_EXTS = {
+    "txt", "pdf", "doc", "docx", "hwp", "hwpx", "xls", "xlsx", "ppt", "pptx",
+    "csv", "md", "log", "json", "xml", "html", "jpg", "jpeg", "png", "gif",
+    "zip", "mp3", "mp4", "py",
+}
+
+# 이름 자리에 와도 실제 이름이 아닌 말 ("새 폴더 만들어줘", "파일 찾아줘")
+GENERIC_WORDS = {
+    "새", "새로운", "빈", "아무", "그", "이", "저", "내", "제", "모든", "전체", "다른", "임시", "하나",
+    "파일", "폴더", "문서", "디렉토리", "디렉터리", "것", "거", "자료", "데이터",
+}
+NAME_GROUPS = ("name", "kw", "dst")
+
+_NAME = r"[\w\-.가-힣]+?"
+_FILE = r"[\w\-.가-힣]+\.[A-Za-z0-9]{1,5}"
+_EXT_RE = re.compile(r"\.[A-Za-z0-9]{1,5}$")
+_TAIL = r"\s*(?:해\s*)?(?:줘|주세요|줄래|라|봐)?\s*[.!?~]*"  # 어미/문장부호
+
+
+def _rule(pattern: str):
+    return re.compile(r"^\s*" + pattern + _TAIL + r"$")
+
+
+# (이름, tool, 정규식, 기본 확신도)
+RULES = [
+    ("create_folder", "create_folder",
+     _rule(r"(?:기본\s*폴더에\s*)?(?P<name>" + _NAME + r")\s*(?:이?라는\s*)?폴더\s*(?:를|을|하나)?\s*(?:만들어|만들|생성)"),
+     0.97),
+    ("create_file", "create_file",
+     _rule(r"(?P<name>" + _FILE + r")\s*(?:파일)?\s*(?:을|를|하나)?\s*(?:만들어|만들|생성)"),
+     0.95),
+    ("move_file", "move_file",
+     _rule(r"(?P<src>" + _FILE + r")\s*(?:파일)?(?:을|를)?\s+(?P<dst>" + _NAME + r")\s*(?P<as_folder>폴더)?\s*(?:으로|로|에)\s*(?:옮겨|이동|보내)"),
+     0.95),
+    ("move_ext", "move_file",
+     _rule(r"(?:확장자\s*(?:가|이)?\s*)?(?:\*?\.)?(?P<ext>[A-Za-z0-9]{1,5})\s*(?:인\s*)?(?:파일)?\s*(?:들)?\s*(?:을|를)?\s*(?:다\s*|전부\s*|모두\s*)?(?P<dst>" + _NAME + r")\s*(?:폴더)?\s*(?:으로|로|에)\s*(?:옮겨|이동|보내)"),
+     0.93),
+    ("summarize_file", "summarize_file",
+     _rule(r"(?P<path>" + _FILE + r")\s*(?:파일)?\s*(?:을|를|좀)?\s*(?:좀\s*)?요약"),
+     0.96),
+    ("find_duplicates", "find_duplicates",
+     _rule(r"(?:(?:확장자\s*(?:가|이)?\s*)?\.?(?P<ext>[A-Za-z0-9]{1,5})\s*(?:인\s*)?(?:파일)?\s*(?:중에?서?\s*)?)?(?:똑같은|같은|중복(?:된|되는)?)\s*(?:파일)?\s*(?:을|를|들|이|가)?\s*(?:다\s*|전부\s*|모두\s*)?(?:찾아|검색|정리|보여|있어)"),
+     0.94),
+    ("search_content", "search_files",
+     _rule(r"(?:파일\s*)?내용에\s*(?P<kw>" + _NAME + r")\s*(?:이|가|라는\s*말이?)?\s*(?:들어간|들어있는|있는|포함된)\s*(?:파일)?\s*(?:을|를|들)?\s*(?:다\s*|전부\s*|모두\s*)?(?:찾아|검색)"),
+     0.93),
+    ("search_ext", "search_files",
+     _rule(r"(?:확장자\s*(?:가|이)?\s*)?\.?(?P<ext>[A-Za-z0-9]{1,5})\s*(?:인\s*)?(?:파일)?\s*(?:들|을|를)?\s*(?:다\s*|전부\s*|모두\s*)?(?:찾아|검색|목록|보여)"),
+     0.95),
+    # 이름 검색은 본문/뜻 검색이어야 할 때가 많아서 poc_test2 의 ROUTER_MIN_CONFIDENCE (0.9) 아래로 두고 LLM 에 맡긴다
+    ("search_name", "search_files",
+     _rule(r"(?P<kw>" + _NAME + r")\s*(?:파일)?\s*(?:을|를|들|이|가)?\s*(?:어디\s*있어|어디야|(?:다\s*|전부\s*|모두\s*)?(?:찾아|검색))"),
+     0.85),
+]
+
+
+def _build(rule: str, m) -> dict:
+    g = m.groupdict()
+    if rule == "create_folder":
+        return {"tool": "create_folder", "arguments": {"name": g["name"]}}
+    if rule == "create_file":
+        return {"tool": "create_file", "arguments": {"path": g["name"], "content": ""}}
+    if rule == "move_file":
+        if _EXT_RE.search(g["dst"]) and not g["as_folder"]:
+            # "a.txt를 b.txt로 옮겨줘" 는 이름 바꾸기 (b.txt 라는 폴더를 만들지 않게)
+            return {"tool": "move_file", "arguments": {"src": g["src"], "dst": g["dst"]}}
+        return {"tool": "move_file", "arguments": {"file": g["src"], "folder": g["dst"]}}
+    if rule == "move_ext":
+        return {"tool": "move_file", "arguments": {"src": "*." + g["ext"].lower(), "dst": g["dst"]}}
+    if rule == "summarize_file":
+        return {"tool": "summarize_file", "arguments": {"path": g["path"]}}
+    if rule == "find_duplicates":
+        ext = g.get("ext")
+        return {"tool": "find_duplicates", "arguments": {"ext": [ext.lower()] if ext else []}}
+    if rule == "search_content":
+        return {"tool": "search_files", "arguments": {"keywords": [g["kw"]], "content": True}}
+    if rule == "search_ext":
+        return {"tool": "search_files", "arguments": {"ext": [g["ext"].lower()]}}
+    return {"tool": "search_files", "arguments": {"keywords": [g["kw"]]}}
+
+
+def hinted_tools(text: str) -> set:
+    return {tool for tool, words in TOOL_HINTS.items() if any(w in text for w in words)}
+
+
+stats = Counter()
+
+
+def route(text: str):
+    """(cmd 또는 None, confidence, 규칙 이름)"""
+    for name, tool, regex, base in RULES:
+        m = regex.match(text)
+        if not m:
+            continue
+        conf = base
+        ext = m.groupdict().get("ext")
+        if name in ("search_ext", "move_ext", "find_duplicates") and ext is not None and ext.lower() not in KNOWN_EXTS:
+            # "보고서 찾아줘" 같은 경우는 이름 검색 규칙에 맡긴다
+            continue
+        if any((m.groupdict().get(g) or "").lower() in GENERIC_WORDS for g in NAME_GROUPS if m.groupdict().get(g)):
+            # "새 폴더 만들어줘" 의 "새" 는 이름이 아님 → 다른 규칙도 보지 않고 LLM 에
+            stats["generic"] += 1
+            return None, 0.0, name
+        # 다른 tool 의 키워드가 섞여 있으면 (예: "옮기고 요약해줘") 확신도를 깎는다
+        others = hinted_tools(text) - {tool, "create_folder", "create_file"} - COMPATIBLE_HINTS.get(tool, set())
+        if others:
+            conf *= 0.5
+        stats[name] += 1
+        return _build(name, m), conf, name
+
+    stats["no_match"] += 1
+    return None, 0.0, None
@@ -0,0 +1,75 @@
+"""tool 스키마 → llama.cpp GBNF 문법
+
+{"tool": "<이름>", "arguments": {...}} 형태만 생성되도록 제한한다.
+plan=True 면 그런 객체의 배열 [{...}, {...}] (한 발화 → 여러 명령).
+문법이 닫히면(마지막 "}" 또는 "]") EOS 만 허용되므로 거기서 바로 생성이 끝난다.
+
+스키마 예: {"create_folder": {"name": "string"}, "search_files": {"ext": "string[]", "top_k": "integer"}}
+"""
+import json
+
+# 타입별 값 규칙
+VALUE_RULES = {
+    "string": "string",
+    "string[]": "string-list",
+    "integer": "integer",
+    "boolean": "boolean",
+}
+
+MAX_WS = 6  # 공백/줄바꿈으로 토큰을 낭비하지 않도록 길이 제한
+
+COMMON_RULES = r'''
+string ::= "\"" ( [^"\\\x00-\x1f] | "\\" ( ["\\/bfnrt] | "u" hex hex hex hex ) )* "\""
+hex ::= [0-9a-fA-F]
+string-list ::= "[" ws ( string ( ws "," ws string )* )? ws "]"
+integer ::= "-"? [0-9] [0-9]? [0-9]? [0-9]? [0-9]? [0-9]?
+boolean ::= "true" | "false"
+'''
+
+
+def _literal(s: str) -> str:
+    # GBNF 문자열 리터럴 = JSON 문자열 리터럴을 한 번 더 감싼 것
+    return json.dumps(json.dumps(s, ensure_ascii=False), ensure_ascii=False)
+
+
+def _rule_name(tool: str) -> str:
+    return "tool-" + tool.replace("_", "-")
+
+
+def _ws_rule() -> str:
+    body = ""
+    for _ in range(MAX_WS):
+        body = f"([ \\t\\n] {body})?" if body else "[ \\t\\n]?"
+    return f"ws ::= {body}"
+
+
+def build_tool_grammar(tool_schemas: dict, plan: bool = False, max_steps: int = 8) -> str:
+    """tool_schemas: {tool 이름: {인자 이름: 타입}} → GBNF 문자열"""
+    tools = sorted(tool_schemas)
+    if plan:
+        # 명령 개수도 문법으로 제한 (1 ~ max_steps 개)
+        more = ""
+        for _ in range(max_steps - 1):
+            more = f'( ws "," ws command {more})?' if more else '( ws "," ws command )?'
+        lines = [f'root ::= "[" ws command {more} ws "]"']
+    else:
+        lines = ["root ::= command"]
+    lines.append(
+        'command ::= "{" ws "\\"tool\\"" ws ":" ws ( '
+        + " | ".join(_rule_name(t) for t in tools)
+        + ' ) ws "}"'
+    )
+    for tool in tools:
+        props = tool_schemas[tool]
+        parts = []
+        for key, typ in props.items():
+            if typ not in VALUE_RULES:
+                raise ValueError(f"지원하지 않는 타입: {tool}.{key} = {typ}")
+            parts.append(f'{_literal(key)} ws ":" ws {VALUE_RULES[typ]}')
+        args = ' ws "," ws '.join(parts)
+        body = f'"{{" ws {args} ws "}}"' if parts else '"{" ws "}"'
+        lines.append(
+            f'{_rule_name(tool)} ::= {_literal(tool)} ws "," ws "\\"arguments\\"" ws ":" ws {body}'
+        )
+    lines.append(_ws_rule())
+    return "\n".join(lines) + "\n" + COMMON_RULES.strip() + "\n"
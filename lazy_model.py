@@ -0,0 +1,113 @@
+"""모델 백그라운드 로딩
+
+UI 와 파일 툴은 바로 쓰고, 모델은 뒤에서 mmap 으로 올린다.
+로드 전에 들어온 요청은 defer() 로 쌓아뒀다가 take_pending() 으로 꺼내 처리한다.
+timings 에 import / 모델 로드 / 첫 추론 시간을 기록한다. 준비 중에 알릴 것은 note() 로 남기면
+status_text() 뒤에 붙는다 (콘솔에 찍지 않고 UI 상태 줄로).
+"""
+import os
+import threading
+import time
+
+from llm_backend import make_llm, server_url
+
+PREFETCH_CHUNK = 16 * 1024 * 1024
+
+
+class LazyModel:
+    def __init__(self, model_path: str, setup=None, prefetch: bool = True, **llama_kwargs):
+        self.model_path = model_path
+        self.setup = setup  # setup(llm): 로더 스레드에서 로드 직후 한 번 호출
+        self.prefetch = prefetch
+        self.llama_kwargs = llama_kwargs
+        self.llm = None
+        self.error = None
+        self.phase = "대기"
+        self.progress = 0.0
+        self.ready = threading.Event()
+        self.timings = {}
+        self.notes = []  # 준비 완료 상태 뒤에 붙일 짧은 메모 ("prefix 캐시: disk" 등)
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def start(self, import_sec: float = None):
+        if import_sec is not None:
+            self.timings["import"] = import_sec
+        threading.Thread(target=self._load, daemon=True).start()
+        return self
+
+    def _load(self):
+        t0 = time.perf_counter()
+        try:
+            if self.prefetch and not server_url():
+                self._prefetch()
+            self.phase = "모델 로드"
+            llm = make_llm(self.model_path, use_mmap=True, **self.llama_kwargs)
+            self.timings["load"] = time.perf_counter() - t0
+            if self.setup is not None:
+                self.phase = "준비"
+                t1 = time.perf_counter()
+                self.setup(llm)
+                self.timings["setup"] = time.perf_counter() - t1
+            self.llm = llm
+            self.phase = "준비 완료"
+        except Exception as e:
+            self.error = e
+            self.phase = "로드 실패"
+        finally:
+            self.ready.set()
+
+    def _prefetch(self):
+        """모델 파일을 순서대로 한 번 읽어서 페이지 캐시에 올린다 (mmap 로드가 빨라지고 진행률을 알 수 있음)"""
+        self.phase = "모델 파일 읽는 중"
+        total = os.path.getsize(self.model_path) or 1
+        done = 0
+        with open(self.model_path, "rb", buffering=0) as f:
+            while True:
+                n = len(f.read(PREFETCH_CHUNK))
+                if not n:
+                    break
+                done += n
+                self.progress = done / total
+        self.progress = 1.0
+
+    # -------------------------
+    # 대기열
+    # -------------------------
+    def defer(self, item) -> int:
+        with self._lock:
+            self._pending.append(item)
+            return len(self._pending)
+
+    def take_pending(self) -> list:
+        with self._lock:
+            items, self._pending = self._pending, []
+            return items
+
+    # -------------------------
+    # 측정
+    # -------------------------
+    def note(self, text: str):
+        self.notes.append(text)
+
+    def record_first_inference(self, seconds: float) -> bool:
+        """첫 추론이면 기록하고 True (호출 쪽이 상태 줄/추적에 timing_text() 를 남길 수 있게)"""
+        if "first_inference" in self.timings:
+            return False
+        self.timings["first_inference"] = seconds
+        return True
+
+    def timing_text(self) -> str:
+        names = (("import", "import"), ("load", "모델 로드"), ("setup", "준비"), ("first_inference", "첫 추론"))
+        return " · ".join(f"{label} {self.timings[k]:.2f}초" for k, label in names if k in self.timings)
+
+    def status_text(self) -> str:
+        if self.error is not None:
+            return f"모델 로드 실패: {self.error}"
+        if not self.ready.is_set():
+            text = f"모델 {self.phase}"
+            if self.phase == "모델 파일 읽는 중":
+                text += f" {self.progress:.0%}"
+            n = len(self._pending)
+            return text + (f" (대기 {n}건)" if n else "")
+        return " | ".join(["모델 준비 완료", self.timing_text(), *self.notes])
@@ -0,0 +1,160 @@
+"""색인 없이 바로 훑는 병렬 파일 검색 (scandir + work stealing)
+
+FileIndex 가 아직 첫 색인을 못 끝낸 트리 (큰 트리는 몇 분 걸림) 에서 search_files 가 쓰는 경로.
+- 스레드마다 디렉토리 deque 를 갖고, 찾은 하위 디렉토리는 자기 deque 뒤에 넣고 뒤에서 꺼낸다 (깊이 우선).
+  자기 deque 가 비면 다른 스레드 deque 의 앞 (트리 위쪽 = 큰 하위 트리) 을 훔쳐 온다.
+  deque 의 append/pop/popleft 는 스레드 안전하므로 따로 락을 잡지 않는다.
+- 이름 조건 (keywords/ext/glob/regex) 을 먼저 보고, 크기/mtime 조건이 있을 때만 DirEntry.stat() 을 부른다
+  (DirEntry 가 결과를 캐시하고, Windows 에서는 scandir 가 이미 읽어 온 값이라 시스템 콜이 없다).
+- top_k 개를 찾으면 모든 스레드가 바로 멈추고, 찾는 즉시 on_result 로 넘긴다 (UI 에 흘려 보내기용).
+"""
+import fnmatch
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from file_index import normalize_ext
+
+LIVE_WORKERS = 8  # 디렉토리 읽기는 대부분 I/O 대기라 코어 수보다 많아도 된다
+IDLE_WAIT = 0.001  # 훔칠 게 없을 때 다시 볼 때까지 쉬는 시간
+
+
+def make_matcher(keywords=None, exts=None, glob=None, regex=None, min_size=None, max_size=None,
+                 newer_than=None, older_than=None):
+    """DirEntry → bool. newer_than/older_than 은 epoch 초 (mtime 기준)"""
+    keywords = [k for k in keywords or [] if k]
+    exts = [e for e in (normalize_ext(e) for e in exts or []) if e]
+    glob_re = re.compile(fnmatch.translate(glob), re.IGNORECASE) if glob else None
+    name_re = re.compile(regex) if regex else None
+    need_stat = any(v is not None for v in (min_size, max_size, newer_than, older_than))
+
+    def match(entry) -> bool:
+        name = entry.name
+        if keywords and not all(k in name for k in keywords):
+            return False
+        if exts:
+            lower = name.lower()
+            if not any(lower.endswith(e) for e in exts):
+                return False
+        if glob_re is not None and not glob_re.match(name):
+            return False
+        if name_re is not None and not name_re.search(name):
+            return False
+        if need_stat:
+            st = entry.stat(follow_symlinks=False)
+            if min_size is not None and st.st_size < min_size:
+                return False
+            if max_size is not None and st.st_size > max_size:
+                return False
+            if newer_than is not None and st.st_mtime < newer_than:
+                return False
+            if older_than is not None and st.st_mtime > older_than:
+                return False
+        return True
+
+    return match
+
+
+class LiveSearch:
+    def __init__(self, root: str, workers: int = LIVE_WORKERS):
+        self.root = os.path.abspath(root)
+        self.workers = max(1, workers)
+
+    def search(self, match, top_k: int = 100, on_result=None, cancel: threading.Event = None) -> dict:
+        """match(DirEntry) 가 참인 파일을 top_k 개까지. on_result(path) 는 워커 스레드에서 불린다
+
+        결과는 찾은 순서라서 색인 검색처럼 경로 순 앞 top_k 개는 아니다 (돌려줄 때만 정렬).
+        """
+        top_k = max(0, int(top_k))
+        stop = threading.Event()
+        if top_k == 0:
+            stop.set()
+        queues = [deque() for _ in range(self.workers)]
+        queues[0].append(self.root)
+        lock = threading.Lock()
+        found = []
+        stats = {"dirs": 0, "entries": 0, "steals": 0, "errors": 0}
+        pending = [1]  # 아직 다 읽지 않은 디렉토리 수 (0 이 되면 끝)
+
+        def add(path: str) -> bool:
+            with lock:
+                if stop.is_set():
+                    return False
+                found.append(path)
+                if len(found) >= top_k:
+                    stop.set()  # 다른 스레드도 다음 항목에서 멈춘다
+            if on_result is not None:
+                on_result(path)
+            return True
+
+        def take(i: int):
+            own = queues[i]
+            try:
+                return own.pop()
+            except IndexError:
+                pass
+            for j in range(1, self.workers):
+                try:
+                    d = queues[(i + j) % self.workers].popleft()
+                except IndexError:
+                    continue
+                with lock:
+                    stats["steals"] += 1
+                return d
+            return None
+
+        def worker(i: int):
+            own = queues[i]
+            dirs = entries = errors = 0
+            while not stop.is_set():
+                if cancel is not None and cancel.is_set():
+                    stop.set()
+                    break
+                d = take(i)
+                if d is None:
+                    with lock:
+                        if pending[0] == 0:
+                            break
+                    time.sleep(IDLE_WAIT)
+                    continue
+
+                subdirs = []
+                try:
+                    with os.scandir(d) as it:
+                        for entry in it:
+                            if stop.is_set():
+                                break
+                            entries += 1
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    subdirs.append(entry.path)
+                                elif match(entry) and not add(entry.path):
+                                    break
+                            except OSError:
+                                errors += 1
+                except OSError:
+                    errors += 1
+                dirs += 1
+                with lock:
+                    # 하위 디렉토리를 먼저 세고 나서 이 디렉토리를 빼야 중간에 0 이 되지 않는다
+                    pending[0] += len(subdirs) - 1
+                own.extend(subdirs)
+            with lock:
+                stats["dirs"] += dirs
+                stats["entries"] += entries
+                stats["errors"] += errors
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats.update(
+            paths=sorted(found),
+            truncated=len(found) >= top_k > 0 or (cancel is not None and cancel.is_set()),
+            elapsed=time.perf_counter() - t0,
+        )
+        return stats
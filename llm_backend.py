@@ -0,0 +1,184 @@
+"""Llama 생성 진입점: 로컬 로드 또는 llm_server.py 클라이언트
+
+FILETALK_LLM_SERVER=http://127.0.0.1:8765 가 설정되어 있으면 모델을 직접 올리지 않고
+서버에 붙는다. RemoteLlama 는 스크립트들이 쓰는 Llama 호출 방식(llm(prompt, ...),
+stream=True, tokenize)을 그대로 흉내 낸다.
+"""
+import http.client
+import json
+import os
+import uuid
+from urllib.parse import urlparse
+
+SERVER_ENV = "FILETALK_LLM_SERVER"
+
+# JSON 으로 보낼 수 있는 llama 인자만 서버로 넘긴다
+REMOTE_KEYS = {
+    "max_tokens", "temperature", "top_p", "top_k", "min_p", "repeat_penalty",
+    "stop", "seed", "logprobs", "echo", "presence_penalty", "frequency_penalty",
+    "grammar",
+}
+
+
+def server_url():
+    return os.environ.get(SERVER_ENV) or None
+
+
+def make_llm(model_path: str, draft: str = None, **kwargs):
+    """서버가 설정되어 있으면 RemoteLlama, 아니면 로컬 Llama
+
+    draft: 추측 디코딩 초안 ("lookup" 또는 작은 GGUF 경로, spec_decode 참고). 원격이면 서버 설정을 따름.
+           logits_all=True 가 강제되어 n_ctx × 어휘 float32 배열만큼 메모리를 더 쓴다
+    autotune.py 로 잰 이 PC 프로필(n_threads/n_threads_batch/n_batch)이 있으면 기본값으로 깐다.
+    """
+    url = server_url()
+    if url:
+        return RemoteLlama(url)
+    from llama_cpp import Llama
+    from autotune import tuned_kwargs
+
+    kwargs = tuned_kwargs(model_path, **kwargs)
+
+    if draft:
+        from spec_decode import make_draft
+
+        kwargs["draft_model"] = make_draft(draft, n_ctx=kwargs.get("n_ctx", 4096))
+    return Llama(model_path=model_path, **kwargs)
+
+
+def is_remote(llm) -> bool:
+    return isinstance(llm, RemoteLlama)
+
+
+def model_identity(llm, model_path: str, cache_dir: str) -> str:
+    """캐시 키로 쓰는 모델 식별자 (원격이면 서버가 알려준 값)"""
+    if is_remote(llm):
+        return llm.model_id
+    from prompt_cache import file_sha256
+
+    return file_sha256(model_path, os.path.join(cache_dir, "model_hashes.json"))[:16]
+
+
+def last_logits(llm):
+    """로컬 Llama 가 마지막으로 eval 한 토큰 다음의 logits (n_vocab,) 복사본
+
+    logits_all 이 아니면 llama_cpp 0.3 은 eval 때 scores 를 채우지 않고 (행도 n_batch 개뿐)
+    컨텍스트에 마지막 토큰의 logits 만 남긴다. 그래서 scores 대신 컨텍스트에서 읽는다.
+    logits_all 이면 (초안 모델을 붙인 경우) 컨텍스트에는 마지막 배치 전체가 있으므로 scores 를 쓴다.
+    """
+    import numpy as np
+
+    logits_all = getattr(llm, "_logits_all", None)
+    if logits_all is None:
+        logits_all = getattr(llm.context_params, "logits_all", False)
+    if logits_all:
+        return np.array(llm.scores[llm.n_tokens - 1])
+    return np.ctypeslib.as_array(llm._ctx.get_logits(), shape=(llm.n_vocab(),)).copy()
+
+
+def eval_next_logprobs(llm, tokens: list, token_ids: list):
+    """프롬프트를 한 번만 평가하고 다음 토큰 logprob 중 token_ids 에 해당하는 값만
+
+    KV 캐시에 남아 있는 앞부분은 다시 평가하지 않는다 (마지막 토큰은 logits 를 얻으려고 항상 평가).
+    """
+    import numpy as np
+
+    n = 0
+    for a, b in zip(llm.input_ids[:llm.n_tokens], tokens[:-1]):
+        if a != b:
+            break
+        n += 1
+    llm.n_tokens = n
+    llm.eval(tokens[n:])
+    logits = last_logits(llm).astype(np.float64)
+    m = logits.max()
+    logprobs = logits - (m + np.log(np.exp(logits - m).sum()))
+    return logprobs[list(token_ids)]
+
+
+class RemoteLlama:
+    def __init__(self, url: str, timeout: float = 600.0):
+        u = urlparse(url)
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 8765
+        self.timeout = timeout
+        self.session = uuid.uuid4().hex  # 서버가 같은 시퀀스로 보내도록
+        info = self.stats()
+        self.model_id = info["model_id"]
+        self.n_parallel = info["parallel"]
+        self._n_ctx = info["n_ctx"]
+
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    # -------------------------
+    # HTTP
+    # -------------------------
+    def _conn(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        conn = self._conn()
+        try:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            data = json.loads(resp.read())
+        finally:
+            conn.close()
+        if resp.status != 200:
+            raise RuntimeError(f"모델 서버 오류 ({resp.status}): {data.get('error')}")
+        return data
+
+    def stats(self) -> dict:
+        return self._request("GET", "/stats")
+
+    # -------------------------
+    # Llama 호환
+    # -------------------------
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> list:
+        return self._request("POST", "/v1/tokenize", {
+            "text": text.decode("utf-8"), "add_bos": add_bos,
+        })["tokens"]
+
+    def next_token_logprobs(self, prompt, token_ids: list) -> list:
+        return self._request("POST", "/v1/next_token_logprobs", {
+            "prompt": prompt, "token_ids": list(token_ids), "session": self.session,
+        })["logprobs"]
+
+    def embed(self, texts: list) -> list:
+        """문자열마다 벡터 하나 (서버에서 mean pooling)"""
+        return self._request("POST", "/v1/embeddings", {"input": list(texts)})["data"]
+
+    def __call__(self, prompt, stream: bool = False, **kwargs):
+        return self.create_completion(prompt, stream=stream, **kwargs)
+
+    def create_completion(self, prompt, stream: bool = False, **kwargs):
+        grammar = kwargs.get("grammar")
+        if grammar is not None and not isinstance(grammar, str):
+            raise TypeError("원격 모드에서는 grammar 를 GBNF 문자열로 넘겨야 합니다")
+        payload = {k: v for k, v in kwargs.items() if k in REMOTE_KEYS and v is not None}
+        payload.update(prompt=prompt if isinstance(prompt, str) else list(prompt),
+                       stream=stream, session=self.session)
+        if not stream:
+            return self._request("POST", "/v1/completions", payload)
+        return self._stream(payload)
+
+    def _stream(self, payload: dict):
+        conn = self._conn()
+        try:
+            conn.request("POST", "/v1/completions",
+                         body=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                         headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            while True:
+                line = resp.readline()
+                if not line:
+                    break
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(f"모델 서버 오류: {chunk['error']}")
+                yield chunk
+        finally:
+            # 제너레이터를 중간에 닫으면 연결이 끊기고 서버도 생성을 멈춘다
+            conn.close()
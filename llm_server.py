@@ -0,0 +1,335 @@
+"""로컬 모델 서버: GGUF 를 한 번만 로드해서 여러 스크립트가 같이 쓴다
+
+    python llm_server.py --model hyperclovax-seed-text-instruct-1.5b-q4_k_m.gguf --parallel 2
+
+--draft lookup (또는 작은 GGUF 경로) 이면 시퀀스마다 추측 디코딩 초안을 붙인다 (spec_decode).
+  초안을 붙이면 시퀀스마다 logits_all 배열 (n_ctx × 어휘 × 4바이트, 4096 × 110k ≈ 1.8GB) 이 더 잡힌다.
+--parallel N 이면 시퀀스(컨텍스트)를 N 개 띄운다. 가중치는 mmap 이라 한 벌만 메모리에 올라가고
+KV 캐시만 시퀀스마다 따로 잡힌다. 요청은 큐에 쌓였다가 비어 있는 시퀀스가 가져가며,
+같은 session 의 요청은 가능하면 직전에 처리한 시퀀스로 보내서 KV 캐시 앞부분을 재사용한다.
+
+엔드포인트 (JSON):
+    POST /v1/completions          llama 호출 인자 그대로 (+ grammar: GBNF 문자열, session)
+    POST /v1/tokenize             {"text", "add_bos"}
+    POST /v1/next_token_logprobs  {"prompt", "token_ids"}
+    POST /v1/embeddings           {"input": [문자열, ...]} → {"data": [[float, ...], ...]} (mean pooling)
+    GET  /stats                   큐 길이, 지연시간 p50/p99, 프롬프트 재사용 토큰 수, 초안 채택률
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llama_cpp import Llama, LlamaGrammar, StoppingCriteriaList
+
+from llm_backend import eval_next_logprobs
+from prompt_cache import file_sha256
+from spec_decode import draft_stats, make_draft
+from autotune import tuned_kwargs
+
+# llama 호출로 그대로 넘기는 인자
+COMPLETION_KEYS = {
+    "max_tokens", "temperature", "top_p", "top_k", "min_p", "repeat_penalty",
+    "stop", "seed", "logprobs", "echo", "presence_penalty", "frequency_penalty",
+}
+
+_DONE = object()
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(len(s) * p))]
+
+
+class Job:
+    def __init__(self, kind: str, payload: dict):
+        self.kind = kind
+        self.payload = payload
+        self.session = payload.get("session")
+        self.out = queue.Queue()
+        self.cancelled = threading.Event()
+        self.created = time.perf_counter()
+        self.started = None
+
+
+class Sequence(threading.Thread):
+    """Llama 인스턴스 하나 = 병렬 시퀀스 하나"""
+
+    def __init__(self, server, idx: int, llm: Llama):
+        super().__init__(daemon=True)
+        self.server = server
+        self.idx = idx
+        self.llm = llm
+        self.last_session = None
+        self.grammars = {}
+
+    def run(self):
+        while True:
+            job = self.server.next_job(self)
+            job.started = time.perf_counter()
+            try:
+                if job.kind == "completion":
+                    self.complete(job)
+                elif job.kind == "logprobs":
+                    job.out.put(self.next_token_logprobs(job.payload))
+            except Exception as e:
+                job.out.put({"error": str(e)})
+            finally:
+                job.out.put(_DONE)
+                self.last_session = job.session
+                self.server.job_done(job)
+
+    def _tokens(self, prompt):
+        if isinstance(prompt, str):
+            return self.llm.tokenize(prompt.encode("utf-8"))
+        return list(prompt)
+
+    def _grammar(self, text: str):
+        # LlamaGrammar 는 상태가 있어서 시퀀스마다 따로 만든다
+        if text not in self.grammars:
+            self.grammars[text] = LlamaGrammar.from_string(text, verbose=False)
+        return self.grammars[text]
+
+    def _count_reuse(self, tokens):
+        reused = 0
+        for a, b in zip(self.llm.input_ids[:self.llm.n_tokens], tokens[:-1]):
+            if a != b:
+                break
+            reused += 1
+        self.server.count_prompt(reused, len(tokens) - reused)
+
+    def complete(self, job: Job):
+        p = job.payload
+        tokens = self._tokens(p["prompt"])
+        self._count_reuse(tokens)
+        kwargs = {k: v for k, v in p.items() if k in COMPLETION_KEYS}
+        if p.get("grammar"):
+            kwargs["grammar"] = self._grammar(p["grammar"])
+        # 클라이언트가 연결을 끊으면 다음 토큰에서 멈춘다
+        kwargs["stopping_criteria"] = StoppingCriteriaList([lambda ids, logits: job.cancelled.is_set()])
+
+        if p.get("stream"):
+            for chunk in self.llm(tokens, stream=True, **kwargs):
+                job.out.put(chunk)
+                if job.cancelled.is_set():
+                    break
+        else:
+            job.out.put(self.llm(tokens, **kwargs))
+
+    def next_token_logprobs(self, p: dict) -> dict:
+        tokens = self._tokens(p["prompt"])
+        self._count_reuse(tokens)
+        logprobs = eval_next_logprobs(self.llm, tokens, p["token_ids"])
+        return {"logprobs": [float(x) for x in logprobs]}
+
+
+class ModelServer:
+    def __init__(self, model_path: str, parallel: int = 1, cache_dir: str = None, draft: str = None,
+                 **llama_kwargs):
+        self.model_path = model_path
+        memo = os.path.join(cache_dir, "model_hashes.json") if cache_dir else None
+        self.model_id = file_sha256(model_path, memo)[:16]
+        self.cond = threading.Condition()
+        self.jobs = []
+        self.busy = 0
+        self.requests = 0
+        self.latency = deque(maxlen=1000)
+        self.wait = deque(maxlen=1000)
+        self.prompt_reused = 0
+        self.prompt_evaluated = 0
+
+        self.llama_kwargs = tuned_kwargs(model_path, **llama_kwargs)  # autotune 프로필 + 직접 준 값
+        self.embed_llm = None  # 첫 /v1/embeddings 요청 때 임베딩 모드로 하나 더 띄움
+        self.embed_lock = threading.Lock()
+        self.sequences = []
+        for i in range(parallel):
+            kwargs = dict(self.llama_kwargs)
+            if draft:
+                # 초안도 KV 상태가 있어서 시퀀스마다 따로
+                kwargs["draft_model"] = make_draft(draft, n_ctx=llama_kwargs.get("n_ctx", 4096))
+            llm = Llama(model_path=model_path, use_mmap=True, verbose=False, **kwargs)
+            seq = Sequence(self, i, llm)
+            self.sequences.append(seq)
+            seq.start()
+
+    # -------------------------
+    # 큐
+    # -------------------------
+    def submit(self, kind: str, payload: dict) -> Job:
+        job = Job(kind, payload)
+        with self.cond:
+            self.jobs.append(job)
+            self.requests += 1
+            self.cond.notify()
+        return job
+
+    def next_job(self, seq: Sequence) -> Job:
+        with self.cond:
+            while not self.jobs:
+                self.cond.wait()
+            # 같은 session 을 마지막으로 처리한 시퀀스가 우선 (KV 캐시 재사용)
+            pick = 0
+            for i, job in enumerate(self.jobs):
+                if job.session is not None and job.session == seq.last_session:
+                    pick = i
+                    break
+            job = self.jobs.pop(pick)
+            self.busy += 1
+            return job
+
+    def job_done(self, job: Job):
+        now = time.perf_counter()
+        with self.cond:
+            self.busy -= 1
+            self.latency.append(now - job.created)
+            self.wait.append(job.started - job.created)
+
+    def count_prompt(self, reused: int, evaluated: int):
+        with self.cond:
+            self.prompt_reused += reused
+            self.prompt_evaluated += evaluated
+
+    def stats(self) -> dict:
+        drafts = [d.snapshot() for d in map(draft_stats, (s.llm for s in self.sequences)) if d is not None]
+        with self.cond:
+            lat, wait = list(self.latency), list(self.wait)
+            return {
+                "model": os.path.basename(self.model_path),
+                "model_id": self.model_id,
+                "parallel": len(self.sequences),
+                "n_ctx": self.sequences[0].llm.n_ctx() if self.sequences else 0,
+                "queue_depth": len(self.jobs),
+                "busy": self.busy,
+                "requests": self.requests,
+                "latency_ms": {"p50": percentile(lat, 0.5) * 1000, "p99": percentile(lat, 0.99) * 1000},
+                "queue_wait_ms": {"p50": percentile(wait, 0.5) * 1000, "p99": percentile(wait, 0.99) * 1000},
+                "prompt_tokens": {"reused": self.prompt_reused, "evaluated": self.prompt_evaluated},
+                "draft_tokens": {"proposed": sum(p for p, _ in drafts), "accepted": sum(a for _, a in drafts)},
+            }
+
+    def tokenize(self, text: str, add_bos: bool = True) -> list:
+        return self.sequences[0].llm.tokenize(text.encode("utf-8"), add_bos=add_bos)
+
+    def embed(self, texts: list) -> list:
+        import llama_cpp
+        import numpy as np
+
+        with self.embed_lock:
+            if self.embed_llm is None:
+                kwargs = dict(self.llama_kwargs, n_ctx=512, n_batch=512)
+                if hasattr(llama_cpp, "LLAMA_POOLING_TYPE_MEAN"):
+                    kwargs["pooling_type"] = llama_cpp.LLAMA_POOLING_TYPE_MEAN
+                self.embed_llm = Llama(model_path=self.model_path, embedding=True, use_mmap=True,
+                                       verbose=False, **kwargs)
+            out = self.embed_llm.embed(texts, truncate=True)
+        # 토큰별 벡터가 오면 평균
+        return [np.asarray(v, dtype=np.float32).reshape(-1, np.shape(v)[-1]).mean(axis=0).tolist() for v in out]
+
+
+def make_handler(server: ModelServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.0"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _json(self, obj, code: int = 200):
+            body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> dict:
+            n = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(n) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._json(server.stats())
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            try:
+                p = self._body()
+            except ValueError:
+                self._json({"error": "bad json"}, 400)
+                return
+
+            if self.path == "/v1/tokenize":
+                self._json({"tokens": server.tokenize(p["text"], p.get("add_bos", True))})
+            elif self.path == "/v1/embeddings":
+                texts = p.get("input", [])
+                self._json({"data": server.embed([texts] if isinstance(texts, str) else list(texts))})
+            elif self.path == "/v1/next_token_logprobs":
+                self._reply(server.submit("logprobs", p))
+            elif self.path == "/v1/completions":
+                job = server.submit("completion", p)
+                if p.get("stream"):
+                    self._stream(job)
+                else:
+                    self._reply(job)
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def _reply(self, job: Job):
+            result = job.out.get()
+            job.out.get()  # _DONE
+            self._json(result, 500 if "error" in result else 200)
+
+        def _stream(self, job: Job):
+            # 한 줄에 chunk 하나 (NDJSON), 끝나면 연결 종료
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            while True:
+                item = job.out.get()
+                if item is _DONE:
+                    break
+                if job.cancelled.is_set():
+                    continue
+                try:
+                    self.wfile.write(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                except OSError:
+                    job.cancelled.set()
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Filetalk 로컬 모델 서버")
+    ap.add_argument("--model", required=True)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--parallel", type=int, default=1, help="동시에 처리할 시퀀스 수")
+    ap.add_argument("--n-ctx", type=int, default=4096)
+    ap.add_argument("--n-threads", type=int, default=None, help="없으면 autotune 프로필 / llama 기본값")
+    ap.add_argument("--cache-dir", default="./filetalk_cache")
+    ap.add_argument("--draft", default=None,
+                    help='추측 디코딩 초안: "lookup" 또는 작은 GGUF 경로 (시퀀스마다 n_ctx×어휘 float32 logits 를 더 씀)')
+    args = ap.parse_args()
+
+    kwargs = {"n_ctx": args.n_ctx}
+    if args.n_threads:
+        kwargs["n_threads"] = args.n_threads
+
+    t0 = time.perf_counter()
+    os.makedirs(args.cache_dir, exist_ok=True)
+    server = ModelServer(args.model, args.parallel, args.cache_dir, args.draft, **kwargs)
+    print(f"모델 로드 완료 ({time.perf_counter() - t0:.1f}초, 시퀀스 {args.parallel}개)")
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(server))
+    print(f"http://{args.host}:{args.port} 에서 대기 중")
+    httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
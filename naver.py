@@ -1,5 +1,5 @@
-from llama_cpp import Llama
+from llm_backend import make_llm
 
-llm = Llama(model_path="C:\local_lm\hyperclovax-seed-text-instruct-1.5b-q4_k_m.gguf")
+llm = make_llm("C:\local_lm\hyperclovax-seed-text-instruct-1.5b-q4_k_m.gguf")
 response = llm(input(), max_tokens=4096)
 print(response["choices"][0]["text"])
\ No newline at end of file
@@ -1,10 +1,31 @@
 import tkinter as tk
 from tkinter import scrolledtext
-from llama_cpp import Llama
+from llm_backend import make_llm, server_url, is_remote
+from trace_log import Tracer
+from chat_history import ChatLog
+from chat_context import ChatContext, make_summarizer
+from collections import Counter, deque
+import queue
 import threading
+import time
 import sys
 import os
 
+STREAM_FLUSH_MS = 50  # 워커가 보낸 UI 이벤트/스트리밍 토큰을 모아서 화면에 반영하는 주기
+TRACE = False  # 턴별 단계 시간/토큰 수를 TRACE_PATH 에 기록 (FILETALK_TRACE=1 로도 켬)
+TRACE_PATH = os.path.abspath("./chat_trace.jsonl")
+HISTORY_PATH = os.path.abspath("./chat_history.jsonl")  # 대화 기록 (다음 실행 때 이어서 보여줌)
+RENDER_WINDOW = 200  # 화면에 남겨두는 최근 메시지 수 (넘으면 위에서부터 지움)
+HISTORY_PAGE = 50  # 재개할 때 / 맨 위로 스크롤할 때 한 번에 불러오는 메시지 수
+RESUME_CONTEXT = 10  # 재개할 때 프롬프트에 다시 넣는 최근 메시지 수
+N_CTX = 4096
+MAX_NEW_TOKENS = 1024  # 답변 최대 길이 (프롬프트 예산 = N_CTX - 이 값)
+RECENT_TOKENS = 1536  # 그대로 두는 최근 대화 분량, 이보다 오래된 턴은 턴 사이에 요약으로 접음
+
+SYSTEM_PROMPT = """당신은 친절하고 정확한 AI 어시스턴트입니다. 사용자의 질문에 정확하고 도움이 되는 답변을 제공하세요.
+
+"""
+
 def get_resource_path(relative_path):
     """PyInstaller로 패키징된 경우 올바른 경로 반환"""
     try:
@@ -22,8 +43,31 @@ class SimpleLLMChat:
         self.llm = None
         self.conversation_history = []
         self.is_generating = False
+        self.pending = deque()  # 생성 중에 입력한 메시지 [내용, 화면 마크]
+        self.cancel = threading.Event()  # 중지 버튼
+        self.ui_events = queue.Queue()  # 워커 스레드 → (함수, 인자), 메인 스레드에서만 실행
+        self.stream_buffer = []
+        self.stream_lock = threading.Lock()
+        # 턴마다 KV 캐시에서 재사용한 프롬프트 토큰 / 새로 평가한 토큰 누적
+        self.kv_stats = {"turns": 0, "reused": 0, "evaluated": 0}
+        self.tracer = Tracer(TRACE_PATH, enabled=TRACE)
+        self.context = ChatContext(SYSTEM_PROMPT, prompt_budget=N_CTX - MAX_NEW_TOKENS, recent_budget=RECENT_TOKENS)
+        self.llm_lock = threading.Lock()  # 답변 생성과 대화 요약이 모델을 같이 씀
+        self.compact_cancel = threading.Event()  # 새 메시지가 오면 요약 중단
+        self.compacting = False
+        # 생성 중 실시간 tok/s (워커가 채우고 flush_stream 이 표시)
+        self.live = {"first_at": None, "tokens": 0, "first_token": None}
+        self.chat_log = ChatLog(HISTORY_PATH)
+        # 화면에 있는 메시지 [마크 이름, 기록 오프셋] (오래된 순). 오프셋 앞쪽이 아직 안 불러온 기록
+        self.rendered = deque()
+        self.mark_seq = 0
+        self.loading_older = False
+        self.history_exhausted = False
+        self.newer_cursor = None  # 위로 스크롤하다 아래쪽을 지웠으면 지운 첫 메시지의 기록 오프셋
         
         self.setup_ui()
+        self.resume_history()
+        self.window.after(STREAM_FLUSH_MS, self.dispatch_ui)
         self.load_model()
         
     def setup_ui(self):
@@ -40,6 +84,14 @@ class SimpleLLMChat:
             state=tk.DISABLED
         )
         self.chat_display.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+        self.chat_display.tag_config("user", foreground="blue")
+        self.chat_display.tag_config("assistant", foreground="green")
+        self.chat_display.tag_config("system", foreground="orange")
+        self.chat_display.tag_config("pending", foreground="gray")
+        # 대기 메시지는 맨 아래에 따로 두고, 나머지 (메시지/답변 스트리밍) 는 그 위 "queue" 마크에 넣는다
+        self.chat_display.mark_set("queue", "end-1c")
+        # 맨 위에 닿으면 이전 기록을 더 불러온다
+        self.chat_display.config(yscrollcommand=self.on_chat_scroll)
         
         # 입력 영역
         input_frame = tk.Frame(self.window)
@@ -66,11 +118,21 @@ class SimpleLLMChat:
             text="전송",
             command=self.send_message,
             width=8,
-            height=3,
+            height=2,
             font=("", 10)
         )
         self.send_btn.pack()
         
+        self.stop_btn = tk.Button(
+            button_frame,
+            text="중지",
+            command=self.stop_generation,
+            width=8,
+            font=("", 10),
+            state=tk.DISABLED
+        )
+        self.stop_btn.pack(pady=(2, 0))
+        
         # 하단 버튼
         bottom_frame = tk.Frame(self.window)
         bottom_frame.pack(padx=10, pady=(0, 10), fill=tk.X)
@@ -94,7 +156,16 @@ class SimpleLLMChat:
     def load_model(self):
         def load():
             try:
-                self.update_status("모델 로딩 중...")
+                self.post(self.update_status, "모델 로딩 중...")
+                
+                # 모델 서버가 떠 있으면 직접 로드하지 않고 붙기만 한다
+                if server_url():
+                    self.llm = make_llm(None)
+                    self.context.count_tokens = self.count_tokens
+                    self.post(self.update_status, "준비 완료")
+                    self.post(self.add_message, "system", f"모델 서버 연결: {server_url()}")
+                    self.post(self.start_next)
+                    return
                 
                 # 여러 경로 시도
                 script_dir = os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd()
@@ -119,38 +190,230 @@ class SimpleLLMChat:
                 if model_path is None:
                     raise FileNotFoundError("gguf 파일을 찾을 수 없습니다. model.gguf 파일을 스크립트와 같은 폴더에 넣어주세요.")
                 
-                self.llm = Llama(
-                    model_path=model_path,
-                    n_ctx=4096,
-                    n_threads=4
+                self.llm = make_llm(
+                    model_path,
+                    n_ctx=N_CTX
                 )
-                self.update_status("준비 완료")
-                self.add_message("system", f"모델 로드 완료: {os.path.basename(model_path)}")
+                self.context.count_tokens = self.count_tokens
+                self.post(self.update_status, "준비 완료")
+                self.post(self.add_message, "system", f"모델 로드 완료: {os.path.basename(model_path)}")
+                self.post(self.start_next)  # 로딩 중에 입력한 메시지
             except Exception as e:
-                self.update_status(f"로딩 실패: {str(e)}")
-                self.add_message("system", f"오류: {str(e)}")
+                self.post(self.update_status, f"로딩 실패: {str(e)}")
+                self.post(self.add_message, "system", f"오류: {str(e)}")
+                self.post(self.restore_pending)
         
         threading.Thread(target=load, daemon=True).start()
     
+    # -------------------------
+    # 스레드 → UI (Tk 위젯은 메인 스레드에서만 만진다)
+    # -------------------------
+    def post(self, fn, *args):
+        """워커 스레드에서 UI 를 바꿀 때. 실제 호출은 dispatch_ui 가 메인 스레드에서 순서대로"""
+        self.ui_events.put((fn, args))
+    
+    def dispatch_ui(self):
+        while True:
+            try:
+                fn, args = self.ui_events.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                # 이벤트 하나가 실패해도 루프는 계속 돈다
+                self.update_status(f"화면 갱신 실패 ({getattr(fn, '__name__', fn)}): {e}")
+        self.flush_stream()
+        self.window.after(STREAM_FLUSH_MS, self.dispatch_ui)
+    
     def update_status(self, message):
         self.status_label.config(text=message)
     
+    def count_tokens(self, text):
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+    
+    @staticmethod
+    def format_message(role, content):
+        if role == "user":
+            return f"\n[사용자]\n{content}\n"
+        if role == "assistant":
+            return f"\n[어시스턴트]\n{content}\n"
+        if role in ("queued", "unqueued"):
+            return ""  # 대기 표시는 기록에만. 처리하면 user 로, 입력창으로 돌려주면 unqueued 로 다시 남는다
+        return f"\n>>> {content}\n"
+    
     def add_message(self, role, content):
+        """화면에 붙이고, 사용자/어시스턴트 메시지는 기록 파일에도 남김 (system 은 화면에만)"""
+        if self.newer_cursor is not None:
+            self.show_latest()
+        if role == "system":
+            offset = self.chat_log.size
+        else:
+            offset = self.chat_log.append(role, content)
+        self.render_message(self.format_message(role, content), role, offset)
+    
+    def render_message(self, text, tag, offset):
         self.chat_display.config(state=tk.NORMAL)
+        start = self.chat_display.index("queue")
+        self.chat_display.insert("queue", text, tag)
+        self.mark_seq += 1
+        name = f"msg{self.mark_seq}"
+        self.chat_display.mark_set(name, start)
+        entry = [name, offset]
+        self.rendered.append(entry)
         
-        if role == "user":
-            self.chat_display.insert(tk.END, f"\n[사용자]\n{content}\n", "user")
-        elif role == "assistant":
-            self.chat_display.insert(tk.END, f"\n[어시스턴트]\n{content}\n", "assistant")
-        elif role == "system":
-            self.chat_display.insert(tk.END, f"\n>>> {content}\n", "system")
-        
-        self.chat_display.tag_config("user", foreground="blue")
-        self.chat_display.tag_config("assistant", foreground="green")
-        self.chat_display.tag_config("system", foreground="orange")
+        # 창 크기 유지: 오래된 메시지는 화면에서만 지운다 (스크롤하면 다시 불러옴)
+        while len(self.rendered) > RENDER_WINDOW:
+            old, _ = self.rendered.popleft()
+            self.chat_display.delete("1.0", self.rendered[0][0])
+            self.chat_display.mark_unset(old)
+            self.history_exhausted = False
         
         self.chat_display.config(state=tk.DISABLED)
         self.chat_display.see(tk.END)
+        return entry
+    
+    def render_pending(self, text):
+        """대기 메시지를 맨 아래에 (대기) 로 붙이고 마크 이름을 돌려준다"""
+        self.chat_display.config(state=tk.NORMAL)
+        start = self.chat_display.index("end-1c")
+        self.chat_display.insert(tk.END, f"\n[사용자 · 대기]\n{text}\n", "pending")
+        self.mark_seq += 1
+        name = f"msg{self.mark_seq}"
+        self.chat_display.mark_set(name, start)
+        if not any(mark for _, mark in self.pending):
+            # 첫 대기 메시지: 이 앞이 일반 메시지가 들어갈 자리
+            self.chat_display.mark_set("queue", start)
+        self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.see(tk.END)
+        return name
+    
+    def unrender_pending(self, name):
+        """pending 에서 막 꺼낸 (맨 앞) 대기 메시지를 화면에서 지운다"""
+        end = self.pending[0][1] if self.pending and self.pending[0][1] else "end-1c"
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.delete(name, end)
+        self.chat_display.mark_unset(name)
+        self.chat_display.config(state=tk.DISABLED)
+    
+    # -------------------------
+    # 기록 재개 / 이전 기록 불러오기
+    # -------------------------
+    def resume_history(self):
+        """기록 파일 끝에서 HISTORY_PAGE 개만 읽어서 표시 (파일 크기와 상관없이 바로 끝남)"""
+        items = self.chat_log.read_before(None, HISTORY_PAGE)
+        if not items:
+            return
+        for offset, msg in items:
+            self.render_message(self.format_message(msg["role"], msg["content"]), msg["role"], offset)
+        self.conversation_history = [
+            {"role": m["role"], "content": m["content"]}
+            for _, m in items[-RESUME_CONTEXT:] if m["role"] in ("user", "assistant")
+        ]
+        self.add_message("system", "이전 대화를 이어갑니다 (위로 스크롤하면 더 오래된 기록)")
+        
+        # 처리하기 전에 꺼진 대기 메시지 (뒤에 같은 내용의 사용자 메시지가 없음) 는 다시 대기열로
+        later = Counter()
+        unsent = []
+        for _, m in reversed(items):
+            if m["role"] in ("user", "unqueued"):
+                later[m["content"]] += 1
+            elif m["role"] == "queued":
+                if later[m["content"]]:
+                    later[m["content"]] -= 1
+                else:
+                    unsent.append(m["content"])
+        for text in reversed(unsent):
+            self.pending.append([text, self.render_pending(text)])
+        if unsent:
+            self.add_message("system", f"보내지 못한 메시지 {len(unsent)}개를 모델이 준비되면 이어서 보냅니다.")
+    
+    def on_chat_scroll(self, first, last):
+        self.chat_display.vbar.set(first, last)
+        if self.loading_older:
+            return
+        # 내용이 창보다 길고 맨 위 / (아래를 지웠으면) 맨 아래에 닿았을 때만
+        if float(first) <= 0.0 and float(last) < 1.0:
+            self.loading_older = True
+            self.window.after_idle(self.load_older)
+        elif float(last) >= 1.0 and float(first) > 0.0 and self.newer_cursor is not None:
+            self.loading_older = True
+            self.window.after_idle(self.load_newer)
+    
+    def load_older(self):
+        try:
+            cursor = self.rendered[0][1] if self.rendered else self.chat_log.size
+            if self.history_exhausted or cursor <= 0:
+                return
+            if self.is_generating and len(self.rendered) >= RENDER_WINDOW:
+                return  # 답변이 아래에 붙는 중이라 아래쪽을 지울 수 없으니 더 불러오지 않는다
+            items = self.chat_log.read_before(cursor, HISTORY_PAGE)
+            if not items:
+                self.history_exhausted = True
+                return
+            anchor = self.rendered[0][0] if self.rendered else None
+            self.chat_display.config(state=tk.NORMAL)
+            for offset, msg in reversed(items):
+                self.chat_display.insert("1.0", self.format_message(msg["role"], msg["content"]), msg["role"])
+                self.mark_seq += 1
+                name = f"msg{self.mark_seq}"
+                self.chat_display.mark_set(name, "1.0")
+                self.rendered.appendleft([name, offset])
+            # 창 크기 유지: 이번에는 아래쪽을 지운다 (아래로 스크롤하면 load_newer 가 다시 붙임)
+            while len(self.rendered) > RENDER_WINDOW and not self.is_generating:
+                old, offset = self.rendered.pop()
+                self.chat_display.delete(old, "queue")
+                self.chat_display.mark_unset(old)
+                self.newer_cursor = offset
+            self.chat_display.config(state=tk.DISABLED)
+            if anchor is not None:
+                # 보고 있던 위치 유지
+                self.chat_display.yview(anchor)
+        finally:
+            self.loading_older = False
+    
+    def load_newer(self):
+        """load_older 가 지운 아래쪽을 다시 붙이고 그만큼 위를 지운다"""
+        try:
+            if self.newer_cursor is None:
+                return
+            items = self.chat_log.read_after(self.newer_cursor, HISTORY_PAGE)
+            anchor = self.rendered[-1][0] if self.rendered else None
+            self.chat_display.config(state=tk.NORMAL)
+            for offset, msg in items:
+                start = self.chat_display.index("queue")
+                self.chat_display.insert("queue", self.format_message(msg["role"], msg["content"]), msg["role"])
+                self.mark_seq += 1
+                name = f"msg{self.mark_seq}"
+                self.chat_display.mark_set(name, start)
+                self.rendered.append([name, offset])
+            while len(self.rendered) > RENDER_WINDOW:
+                old, _ = self.rendered.popleft()
+                self.chat_display.delete("1.0", self.rendered[0][0])
+                self.chat_display.mark_unset(old)
+                self.history_exhausted = False
+            self.chat_display.config(state=tk.DISABLED)
+            if len(items) == HISTORY_PAGE:
+                self.newer_cursor = items[-1][0] + 1
+            else:
+                self.newer_cursor = None  # 끝까지 다시 붙였다
+            if anchor is not None:
+                self.chat_display.yview(anchor)
+        finally:
+            self.loading_older = False
+    
+    def show_latest(self):
+        """아래쪽을 지운 채로 새 메시지가 오면 최근 기록부터 다시 그린다 (중간이 비지 않게)"""
+        self.newer_cursor = None
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.delete("1.0", "queue")
+        for name, _ in self.rendered:
+            self.chat_display.mark_unset(name)
+        self.chat_display.config(state=tk.DISABLED)
+        self.rendered.clear()
+        self.history_exhausted = False
+        for offset, msg in self.chat_log.read_before(None, HISTORY_PAGE):
+            self.render_message(self.format_message(msg["role"], msg["content"]), msg["role"], offset)
     
     def send_message_event(self, event):
         # Shift+Enter는 줄바꿈
@@ -160,76 +423,302 @@ class SimpleLLMChat:
         return "break"
     
     def send_message(self):
-        if self.is_generating or self.llm is None:
-            return
+        """입력은 항상 받아서 대기열에 넣고, 생성 중이 아니면 바로 시작
         
+        대기 메시지는 화면 맨 아래에 바로 보이고 기록에도 "queued" 로 남긴다 (꺼져도 다음 실행 때 다시 대기열로).
+        사용자 메시지로는 처리할 때 기록하므로 기록 순서는 질문/답변 순서 그대로다.
+        """
         user_input = self.input_box.get("1.0", tk.END).strip()
         if not user_input:
             return
+        if self.llm is not None and not self.check_length(user_input):
+            return  # 입력창에 그대로 둔다
         
         self.input_box.delete("1.0", tk.END)
+        if self.is_generating or self.llm is None:
+            self.chat_log.append("queued", user_input)
+            self.pending.append([user_input, self.render_pending(user_input)])
+            self.update_status(f"대기 중인 메시지 {len(self.pending)}개")
+            return
+        self.pending.append([user_input, None])
+        self.start_next()
+    
+    def check_length(self, text):
+        """혼자서 컨텍스트를 넘는 메시지는 받지 않는다"""
+        n, limit = self.count_tokens(text), self.context.message_limit()
+        if n <= limit:
+            return True
+        self.add_message("system", f"메시지가 너무 깁니다 ({n} 토큰, 최대 {limit} 토큰). 줄여서 다시 보내주세요.")
+        return False
+    
+    def start_next(self):
+        if self.is_generating or self.llm is None or not self.pending:
+            return
+        user_input, mark = self.pending.popleft()
+        if mark is not None:
+            self.unrender_pending(mark)
+        if not self.check_length(user_input):
+            # 모델 로딩 중에 입력한 긴 메시지: 입력창으로 돌려준다
+            self.chat_log.append("unqueued", user_input)
+            if not self.input_box.get("1.0", tk.END).strip():
+                self.input_box.insert("1.0", user_input)
+            self.start_next()
+            return
         self.add_message("user", user_input)
         self.conversation_history.append({"role": "user", "content": user_input})
         
+        # 답변은 토큰 단위로 흘러오므로 헤더만 먼저 찍고 dispatch_ui 에서 모아서 붙인다
+        self.is_generating = True
+        self.cancel.clear()
+        self.compact_cancel.set()  # 요약 중이면 양보
+        self.live = {"first_at": None, "tokens": 0, "first_token": None}
+        self.stop_btn.config(state=tk.NORMAL)
+        self.clear_btn.config(state=tk.DISABLED)
+        self.update_status("생성 중..." + self.pending_text())
+        self.begin_stream()
         threading.Thread(target=self.generate_response, daemon=True).start()
     
-    def generate_response(self):
-        self.is_generating = True
-        self.update_status("생성 중...")
-        self.send_btn.config(state=tk.DISABLED)
+    def restore_pending(self):
+        """모델 로딩이 실패하면 대기 메시지를 입력창으로 돌려준다"""
+        texts = []
+        while self.pending:
+            text, mark = self.pending.popleft()
+            if mark is not None:
+                self.unrender_pending(mark)
+            self.chat_log.append("unqueued", text)
+            texts.append(text)
+        if not texts:
+            return
+        current = self.input_box.get("1.0", tk.END).strip()
+        self.input_box.delete("1.0", tk.END)
+        self.input_box.insert("1.0", "\n\n".join(texts + ([current] if current else [])))
+        self.add_message("system", f"대기 중이던 메시지 {len(texts)}개를 입력창으로 돌려놓았습니다.")
+    
+    def pending_text(self):
+        return f" | 대기 {len(self.pending)}개" if self.pending else ""
+    
+    def stop_generation(self):
+        if self.is_generating:
+            self.cancel.set()
+            self.update_status("중지하는 중...")
+    
+    def begin_stream(self):
+        # 답변은 다 나온 뒤에 기록되므로 오프셋은 그때 채운다
+        if self.newer_cursor is not None:
+            self.show_latest()
+        self.stream_entry = self.render_message("\n[어시스턴트]\n", "assistant", self.chat_log.size)
+    
+    def flush_stream(self):
+        """워커가 쌓아둔 토큰을 한 번에 위젯에 반영 (Tk 메인 스레드에서만 호출)"""
+        with self.stream_lock:
+            text = "".join(self.stream_buffer)
+            self.stream_buffer.clear()
+        if not text:
+            return
         
+        live = self.live
+        if self.is_generating and live["first_at"] is not None and not self.cancel.is_set():
+            gen = time.perf_counter() - live["first_at"]
+            tps = live["tokens"] / gen if gen > 0 else 0.0
+            self.status_label.config(
+                text=f"생성 중... (첫 토큰 {live['first_token']:.2f}초, {tps:.1f} tok/s)" + self.pending_text()
+            )
+        
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.insert("queue", text, "assistant")
+        self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.see(tk.END)
+    
+    def end_turn(self):
+        """워커가 끝나면 (dispatch_ui 에서) 남은 토큰을 붙이고 다음 대기 메시지로"""
+        self.flush_stream()
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.insert("queue", "\n")
+        self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.see(tk.END)
+        self.is_generating = False
+        self.stop_btn.config(state=tk.DISABLED)
+        self.clear_btn.config(state=tk.NORMAL)
+        if self.pending:
+            self.start_next()
+        else:
+            self.input_box.focus_set()
+            self.start_compaction()
+    
+    def start_compaction(self):
+        """오래된 턴이 충분히 쌓였으면 다음 메시지가 오기 전에 백그라운드에서 요약으로 접는다"""
+        if self.compacting or self.llm is None:
+            return
+        if self.context.fold_range(self.conversation_history) is None:
+            return
+        self.compacting = True
+        self.compact_cancel.clear()
+        history = list(self.conversation_history)
+        
+        def work():
+            try:
+                with self.llm_lock, self.tracer.request("compact") as req:
+                    # 요약 프롬프트가 대화 KV 캐시를 덮어쓰므로 끝나면 (중단돼도) 되돌린다.
+                    # 안 그러면 다음 턴이 프롬프트 전체를 다시 평가한다
+                    saved = None if is_remote(self.llm) else self.llm.save_state()
+                    try:
+                        folded = self.context.compact(history, make_summarizer(self.llm, self.compact_cancel))
+                    finally:
+                        if saved is not None:
+                            self.llm.load_state(saved)
+                    req.set(folded=folded, summary_tokens=self.context.tokens(self.context.summary))
+            except Exception as e:
+                # 요약이 없어도 대화는 이어진다 (오래된 턴은 build 가 잘라냄). 추적에도 남는다
+                self.post(self.update_status, f"대화 요약 실패: {e}")
+            finally:
+                self.post(self.end_compaction)
+        
+        threading.Thread(target=work, daemon=True).start()
+    
+    def end_compaction(self):
+        self.compacting = False
+    
+    def generate_response(self):
+        """워커 스레드. 위젯은 직접 만지지 않고 stream_buffer / post 로만 넘긴다"""
+        req = self.tracer.request("chat", turn=len(self.conversation_history))
+        with req.span("lock_wait"):
+            self.llm_lock.acquire()  # 돌던 요약은 compact_cancel 로 바로 끝남
         try:
-            prompt = self.build_prompt()
-            response = self.llm(
-                prompt,
-                max_tokens=4096,
+            with req.span("build_prompt"):
+                prompt = self.build_prompt()
+            req.set(**self.context.last_stats)
+            with req.span("tokenize"):
+                prompt_tokens = self.llm.tokenize(prompt.encode("utf-8"))
+            reused, evaluated = self.measure_prefix_reuse(prompt_tokens)
+            req.set(tokens_in=len(prompt_tokens))
+            if reused is not None:
+                req.set(reused=reused, evaluated=evaluated)
+            started = time.perf_counter()
+            first_token = None
+            first_at = None
+            pieces = []
+        
+            kwargs = dict(
+                max_tokens=MAX_NEW_TOKENS,
                 temperature=0.7,
                 top_p=0.9,
                 repeat_penalty=1.1,
-                stop=["사용자:", "\n사용자:", "User:", "\nUser:"]
+                stop=["사용자:", "\n사용자:", "User:", "\nUser:"],
+                stream=True
             )
-            
-            assistant_response = response["choices"][0]["text"].strip()
-            
-            # 혹시 "사용자:"가 포함되어 있으면 그 전까지만 사용
-            if "사용자:" in assistant_response:
-                assistant_response = assistant_response.split("사용자:")[0].strip()
-            
-            self.add_message("assistant", assistant_response)
+            if not is_remote(self.llm):
+                # stop 문자열 때문에 아직 안 내보낸 토큰이 있어도 다음 토큰에서 바로 멈춤
+                from llama_cpp import StoppingCriteriaList
+                kwargs["stopping_criteria"] = StoppingCriteriaList([lambda ids, logits: self.cancel.is_set()])
+        
+            # 토큰 리스트를 그대로 넘기면 llama가 KV 캐시와 겹치는 앞부분을 건너뛴다
+            stream = self.llm(prompt_tokens, **kwargs)
+            try:
+                for chunk in stream:
+                    if self.cancel.is_set():
+                        break
+                    piece = chunk["choices"][0]["text"]
+                    if not pieces:
+                        # 앞 공백은 버림 (기존 strip()과 동일)
+                        piece = piece.lstrip()
+                        if not piece:
+                            continue
+                        first_at = time.perf_counter()
+                        first_token = first_at - started
+                        self.live.update(first_at=first_at, first_token=first_token)
+                        self.post(self.update_status, f"생성 중... (첫 토큰 {first_token:.2f}초)" + self.pending_text())
+                    pieces.append(piece)
+                    self.live["tokens"] = len(pieces)
+                    with self.stream_lock:
+                        self.stream_buffer.append(piece)
+            finally:
+                # 중간에 닫으면 로컬은 생성 루프가 끝나고, 원격은 연결이 끊겨 서버도 멈춘다
+                stream.close()
+        
+            assistant_response = "".join(pieces).strip()
+            elapsed = time.perf_counter() - started
+            cancelled = self.cancel.is_set()
+            if first_at is not None:
+                req.add_time("prompt_eval", first_token)
+                req.add_time("generate", elapsed - first_token)
+            req.set(tokens_out=len(pieces), cancelled=cancelled)
+            # 중지해도 나온 만큼은 남김 (다음 턴 프롬프트 앞부분이 KV 캐시와 그대로 맞음)
             self.conversation_history.append({"role": "assistant", "content": assistant_response})
-            
-            self.update_status("준비 완료")
+            self.stream_entry[1] = self.chat_log.append("assistant", assistant_response)
+        
+            info = []
+            if first_token is not None:
+                tps = len(pieces) / max(elapsed - first_token, 1e-6)
+                info.append(f"첫 토큰 {first_token:.2f}초, {tps:.1f} tok/s")
+            if reused is not None:
+                info.append(f"프롬프트 재사용 {reused} / 평가 {evaluated} 토큰")
+            req.finish()
+            if req.active and first_token is not None:
+                # 추적 중이면 첫 토큰/tok/s 대신 단계별 시간 표시
+                info[0] = req.summary()
+            head = "중지됨" if cancelled else "준비 완료"
+            self.post(self.update_status, head + (f" ({', '.join(info)})" if info else ""))
         except Exception as e:
-            self.add_message("system", f"오류: {str(e)}")
-            self.update_status("오류 발생")
+            req.set(error=str(e))
+            req.finish()
+            self.post(self.add_message, "system", f"오류: {str(e)}")
+            self.post(self.update_status, "오류 발생")
         finally:
-            self.is_generating = False
-            self.send_btn.config(state=tk.NORMAL)
-            self.input_box.focus_set()
+            self.llm_lock.release()
+            self.post(self.end_turn)
     
-    def build_prompt(self):
-        """대화 히스토리를 포함한 프롬프트 구성"""
-        # 시스템 프롬프트로 역할 명확히 지시
-        prompt = """당신은 친절하고 정확한 AI 어시스턴트입니다. 사용자의 질문에 정확하고 도움이 되는 답변을 제공하세요.
-
-"""
+    def measure_prefix_reuse(self, prompt_tokens):
+        """KV 캐시에 이미 있는 앞부분 토큰 수와 새로 평가할 토큰 수"""
+        if is_remote(self.llm):
+            # 원격이면 서버가 /stats 에 집계한다
+            return None, None
+        cached = self.llm.input_ids[:self.llm.n_tokens]
+        reused = 0
+        # llama는 마지막 토큰은 항상 다시 평가하므로 [:-1]까지만 비교
+        for a, b in zip(cached, prompt_tokens[:-1]):
+            if a != b:
+                break
+            reused += 1
+        evaluated = len(prompt_tokens) - reused
         
-        # 대화 히스토리
-        for msg in self.conversation_history:
-            if msg["role"] == "user":
-                prompt += f"사용자: {msg['content']}\n"
-            else:
-                prompt += f"어시스턴트: {msg['content']}\n"
+        self.kv_stats["turns"] += 1
+        self.kv_stats["reused"] += reused
+        self.kv_stats["evaluated"] += evaluated
+        return reused, evaluated
+    
+    def build_prompt(self):
+        """대화 히스토리를 포함한 프롬프트 구성
         
-        prompt += "어시스턴트:"
-        return prompt
+        시스템 지시 + 요약 + 최근 턴을 N_CTX - MAX_NEW_TOKENS 안에 맞춘다.
+        요약이 안 바뀌는 동안은 append-only 형태라 앞부분이 그대로 유지된다.
+        어시스턴트 답변은 앞뒤 공백을 뗀 채로 저장되어 "어시스턴트: 내용\n" 으로 들어간다.
+        생성한 토큰과 다시 토큰화한 결과가 답변 끝 (공백/줄바꿈) 에서 조금 달라질 수 있어서
+        KV 캐시는 그 앞까지 재사용하고 끝부분 몇 토큰만 다시 평가한다 (상태 줄의 "프롬프트 재사용" 참고).
+        """
+        return self.context.build(self.conversation_history)
     
     def clear_conversation(self):
         self.conversation_history = []
+        self.compact_cancel.set()
+        self.context.reset()
+        self.chat_log.archive()  # 지난 대화는 날짜 붙은 파일로 보관
         self.chat_display.config(state=tk.NORMAL)
         self.chat_display.delete("1.0", tk.END)
+        for name, _ in self.rendered:
+            self.chat_display.mark_unset(name)
         self.chat_display.config(state=tk.DISABLED)
+        self.rendered.clear()
+        self.history_exhausted = False
+        self.newer_cursor = None
         self.add_message("system", "대화가 초기화되었습니다.")
+        # 아직 처리 안 한 (모델 로딩 중에 입력한) 메시지는 다시 맨 아래에
+        for item in self.pending:
+            if item[1] is not None:
+                self.chat_display.mark_unset(item[1])
+            item[1] = None
+        for item in self.pending:
+            self.chat_log.append("queued", item[0])
+            item[1] = self.render_pending(item[0])
     
     def run(self):
         self.window.mainloop()
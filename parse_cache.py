@@ -0,0 +1,84 @@
+"""자연어 명령 → 해석 결과 LRU 캐시
+
+키는 정규화한 발화 + 모델 식별자, 값은 normalize_cmd 까지 끝난 cmd.
+path 를 주면 JSON 파일로 저장해서 재시작 후에도 쓴다.
+"""
+import copy
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_utterance(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    text = _SPACE_RE.sub(" ", text).strip()
+    return text.rstrip(".!?~ ")
+
+
+class ParseCache:
+    def __init__(self, max_size: int = 1000, path: str = None):
+        self.max_size = max_size
+        self.path = path
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def key(text: str, model_id: str) -> str:
+        return f"{model_id}\t{normalize_utterance(text)}"
+
+    def get(self, text: str, model_id: str):
+        k = self.key(text, model_id)
+        with self.lock:
+            cmd = self.items.get(k)
+            if cmd is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(k)
+            self.hits += 1
+            return copy.deepcopy(cmd)
+
+    def put(self, text: str, model_id: str, cmd: dict):
+        k = self.key(text, model_id)
+        with self.lock:
+            self.items[k] = copy.deepcopy(cmd)
+            self.items.move_to_end(k)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+            if self.path:
+                self._save_locked()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.items),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self.lock:
+            # 파일에는 오래된 것부터 저장되어 있음
+            for k, cmd in data[-self.max_size:]:
+                self.items[k] = cmd
+
+    def _save_locked(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(self.items.items()), f, ensure_ascii=False)
+        os.replace(tmp, self.path)
@@ -0,0 +1,117 @@
+"""여러 명령(plan) 실행기
+
+한 발화에서 나온 명령 목록을 받아서, 건드리는 경로가 겹치지 않는 명령끼리는
+스레드 풀에서 동시에 실행한다. 겹치면 발화 순서대로 앞 명령이 끝난 뒤에 실행하고,
+앞 명령이 실패하면 그 뒤에 걸린 명령은 건너뛴다.
+
+access(cmd) → (읽는 경로 집합, 쓰는 경로 집합). 디렉토리 경로는 그 아래 전체를 뜻한다.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+MAX_WORKERS = 4
+
+
+def paths_overlap(a: str, b: str) -> bool:
+    """같은 경로이거나 한쪽이 다른 쪽 아래에 있음"""
+    a, b = os.path.normcase(os.path.abspath(a)), os.path.normcase(os.path.abspath(b))
+    if a == b:
+        return True
+    return a.startswith(b.rstrip(os.sep) + os.sep) or b.startswith(a.rstrip(os.sep) + os.sep)
+
+
+def _conflict(xs, ys) -> bool:
+    return any(paths_overlap(x, y) for x in xs for y in ys)
+
+
+def infer_deps(accesses: list) -> list:
+    """accesses[i] = (reads, writes) → deps[i] = i 보다 먼저 끝나야 하는 명령 번호 집합
+
+    쓰기-읽기 / 읽기-쓰기 / 쓰기-쓰기 가 겹치면 의존. 읽기끼리는 동시에 해도 된다.
+    """
+    deps = []
+    for j, (rj, wj) in enumerate(accesses):
+        d = set()
+        for i in range(j):
+            ri, wi = accesses[i]
+            if _conflict(wi, rj | wj) or _conflict(wj, ri):
+                d.add(i)
+        deps.append(d)
+    return deps
+
+
+class Step:
+    def __init__(self, idx: int, cmd: dict, deps: set):
+        self.idx = idx
+        self.cmd = cmd
+        self.deps = deps
+        self.status = "대기"  # 대기 / 완료 / 실패 / 건너뜀
+        self.result = None
+        self.start = None  # plan 시작 기준 (초)
+        self.elapsed = 0.0
+
+
+class PlanExecutor:
+    def __init__(self, run_fn, access_fn, max_workers: int = MAX_WORKERS):
+        self.run_fn = run_fn  # run_fn(cmd) → 결과 문자열 (실패는 예외)
+        self.access_fn = access_fn
+        self.max_workers = max_workers
+
+    def run(self, cmds: list, on_step=None) -> dict:
+        """on_step(step): 명령 하나가 끝날 때마다 (실행 스레드에서) 호출"""
+        deps = infer_deps([self.access_fn(c) for c in cmds])
+        steps = [Step(i, c, d) for i, (c, d) in enumerate(zip(cmds, deps))]
+        t0 = time.perf_counter()
+
+        def run_step(step: Step):
+            step.start = time.perf_counter() - t0
+            try:
+                step.result = self.run_fn(step.cmd)
+                step.status = "완료"
+            except Exception as e:
+                step.result = f"{type(e).__name__}: {e}"
+                step.status = "실패"
+            step.elapsed = time.perf_counter() - t0 - step.start
+            return step
+
+        def finish(step: Step):
+            if on_step is not None:
+                on_step(step)
+
+        waiting = list(steps)
+        running = {}
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            while waiting or running:
+                for step in list(waiting):
+                    dep_status = [steps[i].status for i in step.deps]
+                    if any(s in ("실패", "건너뜀") for s in dep_status):
+                        step.status = "건너뜀"
+                        step.result = "앞 명령 실패로 건너뜀"
+                        waiting.remove(step)
+                        finish(step)
+                    elif all(s == "완료" for s in dep_status):
+                        waiting.remove(step)
+                        running[pool.submit(run_step, step)] = step
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    finish(running.pop(fut))
+
+        return {"steps": steps, "elapsed": time.perf_counter() - t0}
+
+
+def format_report(res: dict) -> str:
+    steps = res["steps"]
+    lines = []
+    for s in steps:
+        after = f" (← {', '.join(str(i + 1) for i in sorted(s.deps))})" if s.deps else ""
+        timing = f"{s.start:.2f}초 시작, {s.elapsed:.2f}초" if s.start is not None else "-"
+        lines.append(f"{s.idx + 1}. [{s.status}] {s.cmd['tool']}{after} {timing}\n   {s.result}")
+    serial = sum(s.elapsed for s in steps)
+    ok = sum(s.status == "완료" for s in steps)
+    lines.append(
+        f"\n명령 {len(steps)}개 중 {ok}개 완료 | 전체 {res['elapsed']:.2f}초 (순차 실행이면 {serial:.2f}초)"
+    )
+    return "\n".join(lines)
@@ -1,19 +1,41 @@
+import time
+_T_START = time.perf_counter()
+
 import os, json, shutil
+import numpy as np
 import tkinter as tk
 from tkinter import messagebox
-from llama_cpp import Llama
+from llm_backend import eval_next_logprobs, is_remote, model_identity
+from lazy_model import LazyModel
+from parse_cache import ParseCache
+
+IMPORT_SEC = time.perf_counter() - _T_START
 
 # ===== 0. 기본 설정 =====
 MODEL_PATH = "hyperclovax-seed-text-instruct-1.5b-q4_k_m.gguf"  # 네 경로로 바꿔
 TEST_ROOT = os.path.abspath("./filetalk_test")
 os.makedirs(TEST_ROOT, exist_ok=True)
+CACHE_DIR = os.path.abspath("./filetalk_cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+PARSE_CACHE_SIZE = 1000
+PICK_MODE = "logprob"  # "logprob": 한 번의 forward로 번호 확률 비교 / "generate": 기존 생성 방식
+PICK_MIN_CONFIDENCE = 0.6  # 이보다 확신이 낮으면 llm_make_args 안 돌리고 unknown
+SPECULATIVE = None  # 추측 디코딩 초안: None / "lookup" (발화 n-gram) / 작은 GGUF 경로 (예: 0.5B)
+
+# ===== 1. LLM 로드 (백그라운드) =====
+llm = None
+MODEL_ID = None
+
+def setup_llm(loaded):
+    global llm, MODEL_ID
+    MODEL_ID = model_identity(loaded, MODEL_PATH, CACHE_DIR) + ":poc1"
+    llm = loaded
 
-# ===== 1. LLM 로드 =====
-llm = Llama(
-    model_path=MODEL_PATH,
-    n_ctx=4096,
-    n_threads=8,
-)
+# FILETALK_LLM_SERVER 가 있으면 공유 모델 서버에 붙음
+model = LazyModel(MODEL_PATH, setup=setup_llm, n_ctx=4096, draft=SPECULATIVE)
+
+# 같은 발화는 llm_pick_tool + llm_make_args 두 번 호출을 건너뛴다
+parse_cache = ParseCache(PARSE_CACHE_SIZE, os.path.join(CACHE_DIR, "parse_cache_poc1.json"))
 
 TOOL_MAP = {
     "1": "create_folder",
@@ -22,8 +44,8 @@ TOOL_MAP = {
 }
 
 # ===== 2. LLM에게 툴만 고르게 =====
-def llm_pick_tool(user_text: str) -> str:
-    prompt = f"""너는 로컬 파일관리 전용 LLM이다.
+def pick_prompt(user_text: str) -> str:
+    return f"""너는 로컬 파일관리 전용 LLM이다.
 아래 사용자 요청을 보고 **번호 하나만** 골라라.
 
 1. 폴더 만들기 (예: 폴더 만들어줘, 디렉토리 생성)
@@ -33,10 +55,48 @@ def llm_pick_tool(user_text: str) -> str:
 다른 글자, 설명, 따옴표 없이 번호만.
 요청: {user_text}
 번호:"""
-    out = llm(prompt, max_tokens=8, temperature=0.1)
+
+def llm_pick_tool(user_text: str) -> str:
+    out = llm(pick_prompt(user_text), max_tokens=8, temperature=0.1)
     num = out["choices"][0]["text"].strip()
     return TOOL_MAP.get(num, "unknown")
 
+_label_ids = {}
+
+def label_token_ids(label: str) -> list:
+    """ "1" / " 1" 처럼 번호 하나가 토큰 하나인 경우의 토큰 id들 """
+    if label not in _label_ids:
+        ids = set()
+        for variant in (label, " " + label):
+            toks = llm.tokenize(variant.encode("utf-8"), add_bos=False)
+            if len(toks) == 1:
+                ids.add(toks[0])
+        _label_ids[label] = sorted(ids)
+    return _label_ids[label]
+
+def next_token_logprobs(tokens: list, token_ids: list):
+    """다음 토큰 logprob 중 token_ids 에 해당하는 값만 (원격이면 서버에서 계산)"""
+    if is_remote(llm):
+        return np.array(llm.next_token_logprobs(tokens, token_ids))
+    # logits_all 없이 올린 모델이라 scores 는 비어 있다 → 컨텍스트에서 읽음
+    return eval_next_logprobs(llm, tokens, token_ids)
+
+def llm_score_tool(user_text: str):
+    """샘플링 없이 번호 후보들의 logprob 비교 → (tool, 후보 내 확률)"""
+    nums = list(TOOL_MAP)
+    ids = {num: label_token_ids(num) for num in nums}
+    all_ids = [i for num in nums for i in ids[num]]
+    lp = dict(zip(all_ids, next_token_logprobs(llm.tokenize(pick_prompt(user_text).encode("utf-8")), all_ids)))
+
+    scores = np.array([
+        np.logaddexp.reduce([lp[i] for i in ids[num]]) if ids[num] else -np.inf
+        for num in nums
+    ])
+    probs = np.exp(scores - scores.max())
+    probs /= probs.sum()
+    best = int(probs.argmax())
+    return TOOL_MAP[nums[best]], float(probs[best])
+
 # ===== 3. LLM에게 arguments만 고르게 =====
 def llm_make_args(user_text: str, tool: str) -> dict:
     if tool == "create_folder":
@@ -102,24 +162,16 @@ def run_cmd(cmd: dict) -> str:
 
     return "지원하지 않는 tool"
 
-# ===== 5. UI =====
-root = tk.Tk()
-root.title("Filetalk PoC (3툴)")
-tk.Label(root, text=f"테스트 폴더: {TEST_ROOT}").pack(padx=10, pady=5)
-
-entry = tk.Entry(root, width=70)
-entry.pack(padx=10, pady=10)
-
-text = tk.Text(root, height=12, width=70)
-text.pack(padx=10, pady=5)
-
-state = {"cmd": None}
-
-def on_parse():
-    user = entry.get().strip()
-    if not user:
-        return
-    tool = llm_pick_tool(user)
+# ===== 4-1. 툴 고르기 + arguments (LLM 두 단계) =====
+def parse_with_llm(user: str) -> dict:
+    conf = None
+    if PICK_MODE == "logprob":
+        tool, conf = llm_score_tool(user)
+        # 확신이 낮으면 arguments 생성(두 번째 호출)을 아예 안 한다
+        if conf < PICK_MIN_CONFIDENCE:
+            tool = "unknown"
+    else:
+        tool = llm_pick_tool(user)
     args = llm_make_args(user, tool) if tool != "unknown" else {}
     # TEST_ROOT 강제 주입
     if tool == "create_file" and "path" in args:
@@ -130,20 +182,92 @@ def on_parse():
         if "dst" in args:
             args["dst"] = under_root(args["dst"])
     cmd = {"tool": tool, "arguments": args}
-    state["cmd"] = cmd
-    text.delete("1.0", tk.END)
-    text.insert(tk.END, json.dumps(cmd, ensure_ascii=False, indent=2))
-
-def on_exec():
-    cmd = state.get("cmd")
-    if not cmd:
-        messagebox.showinfo("알림", "먼저 해석하세요.")
-        return
-    res = run_cmd(cmd)
-    messagebox.showinfo("결과", res)
-
-btns = tk.Frame(root); btns.pack(pady=5)
-tk.Button(btns, text="명령 해석하기", command=on_parse).pack(side=tk.LEFT, padx=5)
-tk.Button(btns, text="실제로 실행", command=on_exec).pack(side=tk.LEFT, padx=5)
-
-root.mainloop()
+    if conf is not None:
+        cmd["confidence"] = round(conf, 3)
+    return cmd
+
+# ===== 5. UI =====
+def main():
+    root = tk.Tk()
+    root.title("Filetalk PoC (3툴)")
+    tk.Label(root, text=f"테스트 폴더: {TEST_ROOT}").pack(padx=10, pady=5)
+
+    entry = tk.Entry(root, width=70)
+    entry.pack(padx=10, pady=10)
+
+    text = tk.Text(root, height=12, width=70)
+    text.pack(padx=10, pady=5)
+
+    state = {"cmd": None}
+
+    def handle_parse(user: str):
+        if llm is None:
+            # 모델 로드 끝나면 poll_model 에서 다시 처리
+            model.defer(user)
+            cache_label.config(text=model.status_text())
+            return
+        cmd = parse_cache.get(user, MODEL_ID)
+        first = False
+        if cmd is None:
+            t0 = time.perf_counter()
+            cmd = parse_with_llm(user)
+            first = model.record_first_inference(time.perf_counter() - t0)
+            if cmd["tool"] != "unknown":
+                parse_cache.put(user, MODEL_ID, cmd)
+        state["cmd"] = cmd
+        text.delete("1.0", tk.END)
+        text.insert(tk.END, json.dumps(cmd, ensure_ascii=False, indent=2))
+        cs = parse_cache.stats()
+        status = f"캐시 적중 {cs['hits']} / 미스 {cs['misses']} ({cs['hit_rate']:.0%})"
+        if first:
+            status += " | " + model.timing_text()  # 첫 추론까지 걸린 시간
+        cache_label.config(text=status)
+
+    def on_parse():
+        user = entry.get().strip()
+        if not user:
+            return
+        handle_parse(user)
+
+    def on_exec():
+        cmd = state.get("cmd")
+        if not cmd:
+            messagebox.showinfo("알림", "먼저 해석하세요.")
+            return
+        res = run_cmd(cmd)
+        messagebox.showinfo("결과", res)
+
+    def poll_model():
+        if not model.ready.is_set():
+            cache_label.config(text=model.status_text())
+            root.after(200, poll_model)
+            return
+        cache_label.config(text=model.status_text())
+        users = model.take_pending()
+        if not users:
+            return
+        if model.error is not None:
+            cache_label.config(text=f"{model.status_text()} | 대기 중이던 요청 {len(users)}건 처리 못 함: "
+                                    + " / ".join(users))
+            return
+        # 명령은 하나만 들고 있으므로 (state["cmd"]) 가장 최근 요청만 해석하고 나머지는 알린다
+        handle_parse(users[-1])
+        if len(users) > 1:
+            cache_label.config(text=cache_label.cget("text") + f" | 대기 중이던 이전 요청 {len(users) - 1}건 건너뜀: "
+                                    + " / ".join(users[:-1]))
+
+    btns = tk.Frame(root); btns.pack(pady=5)
+    tk.Button(btns, text="명령 해석하기", command=on_parse).pack(side=tk.LEFT, padx=5)
+    tk.Button(btns, text="실제로 실행", command=on_exec).pack(side=tk.LEFT, padx=5)
+
+    cache_label = tk.Label(root, text="", fg="gray")
+    cache_label.pack(pady=(0, 5))
+
+    # 창을 먼저 띄우고 모델은 뒤에서
+    model.start(import_sec=IMPORT_SEC)
+    poll_model()
+
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,31 @@
+import time
+_T_START = time.perf_counter()
+
 import os
 import json
-import shutil
+import queue
+import threading
 import tkinter as tk
 from tkinter import messagebox
-from llama_cpp import Llama
+from llm_backend import is_remote, model_identity
+from lazy_model import LazyModel
+from file_index import FileIndex
+from live_search import LiveSearch, make_matcher
+from fuzzy_names import FuzzyNames
+from content_index import ContentIndex, text_encoding
+from semantic_index import SemanticIndex, make_embedder
+from prompt_cache import PrefixState, text_sha256
+from parse_cache import ParseCache
+from json_grammar import build_tool_grammar
+import intent_router
+from summarizer import Summarizer, SummaryCache
+from plan_executor import PlanExecutor, format_report
+from bulk_transfer import BulkTransfer, format_stats, has_glob, journal_path_for, plan_items
+from dup_finder import DuplicateFinder, HashCache, format_duplicates
+from trace_log import Tracer, traced_completion
+from spec_decode import draft_stats
+
+IMPORT_SEC = time.perf_counter() - _T_START
 
 # =========================
 # 설정
@@ -11,46 +33,90 @@ from llama_cpp import Llama
 MODEL_PATH = "hyperclovax-seed-text-instruct-1.5b-q4_k_m.gguf"  # 너 모델 경로로 바꿔
 ROOT_DIR = os.path.abspath("./filetalk_root")
 os.makedirs(ROOT_DIR, exist_ok=True)
+CACHE_DIR = os.path.abspath("./filetalk_cache")  # 인덱스/캐시 저장 위치 (ROOT_DIR 밖)
+os.makedirs(CACHE_DIR, exist_ok=True)
+CONTENT_INDEX = True  # 본문 검색용 역색인 사용 여부
+CONTENT_REFRESH_SEC = 30
+SEMANTIC_INDEX = True  # 이름/앞부분 임베딩으로 뜻 검색 ("회의록" → meeting_notes.txt)
+SEMANTIC_REFRESH_SEC = 60
+SEMANTIC_TOP_K = 10
+SEMANTIC_MIN_SCORE = 0.35  # 뜻 검색에서 이보다 유사도가 낮으면 결과에서 뺌 ("조회 결과 없음." 이 나오도록)
+GRAMMAR_DECODING = True  # JSON 문법으로 출력 제한 (재시도 없이 한 번에 유효한 JSON)
+ROUTER_MIN_CONFIDENCE = 0.9  # 규칙 해석기 확신도가 이 이상이면 LLM 생략
+PARSE_CACHE_SIZE = 1000  # LLM 해석 결과 LRU 캐시 크기 (디스크에도 저장)
+MAX_PLAN_STEPS = 8  # 한 발화에서 나올 수 있는 명령 수
+PLAN_WORKERS = 4  # 서로 안 겹치는 명령을 동시에 실행할 스레드 수
+TRANSFER_WORKERS = 4  # 다른 드라이브로 옮길 때 동시에 복사할 파일 수
+FUZZY_NAMES = True  # 모델이 낸 파일 이름이 없으면 제일 비슷한 실제 파일로 ("보고서.txt" → 보고서_final.txt)
+LIVE_SEARCH_WORKERS = 8  # 첫 색인 전 search_files 가 직접 훑을 때 스레드 수
+SPECULATIVE = None  # 추측 디코딩 초안: None / "lookup" (발화 n-gram) / 작은 GGUF 경로 (예: 0.5B)
+# 켜면 llama 가 logits_all=True 가 되어 n_ctx × 어휘 float32 배열을 더 잡는다 (4096 × 110k ≈ 1.8GB, spec_decode 참고)
+TRACE = False  # 요청별 단계 시간/토큰 수를 CACHE_DIR/trace.jsonl 에 기록 (FILETALK_TRACE=1 로도 켬)
+
+# =========================
+# 파일 인덱스
+# =========================
+file_index = FileIndex(ROOT_DIR, os.path.join(CACHE_DIR, "file_index.sqlite3"))
+content_index = ContentIndex(file_index) if CONTENT_INDEX else None
+semantic_index = SemanticIndex(file_index, os.path.join(CACHE_DIR, "semantic")) if SEMANTIC_INDEX else None
+fuzzy_names = FuzzyNames(file_index) if FUZZY_NAMES else None
+dup_finder = DuplicateFinder(file_index, HashCache(os.path.join(CACHE_DIR, "hash_cache.sqlite3")))
+tracer = Tracer(os.path.join(CACHE_DIR, "trace.jsonl"), enabled=TRACE)
 
 # =========================
-# LLM 로드
+# LLM (백그라운드 로드 → setup_llm 에서 채워짐)
 # =========================
-llm = Llama(
-    model_path=MODEL_PATH,
-    n_ctx=4096,
-    n_threads=8,
-)
+llm = None
+llm_lock = threading.Lock()  # 로컬 Llama 는 한 번에 하나의 호출만
+TOOL_GRAMMAR = None
+prefix_state = None
+MODEL_ID = None
+summarizer = None
+summary_cache = SummaryCache(os.path.join(CACHE_DIR, "summaries.sqlite3"))
 
 # =========================
 # 프롬프트 (한 방)
 # =========================
 SYSTEM_PROMPT = """너는 Filetalk용 파일관리 LLM이다.
-아래 사용자 요청을 보고 딱 1개의 JSON만 출력한다.
+아래 사용자 요청을 보고 명령 JSON 배열 1개만 출력한다.
 
 형식:
-{
-  "tool": "<search_files|summarize_file|create_folder|create_file|move_file>",
-  "arguments": { ... }
-}
+[
+  {
+    "tool": "<search_files|summarize_file|create_folder|create_file|move_file|find_duplicates>",
+    "arguments": { ... }
+  }
+]
 
 규칙:
-- 위 5개 tool만 쓴다. 다른 이름 쓰면 안 된다.
+- 위 6개 tool만 쓴다. 다른 이름 쓰면 안 된다.
 - 경로를 직접 쓰지 말고 가능하면 파일명/폴더명만 써라.
 - 경로가 필요하면 "./filetalk_root" 로 시작하게 해라.
 - 설명, 말줄임표(...), 코드블록 없이 JSON만 출력한다.
+- 요청이 여러 작업이면 하는 순서대로 배열에 명령을 여러 개 넣는다. 작업이 하나면 명령도 하나.
 - "찾아줘", "어디", "검색", "목록", "확장자" → search_files
+- 파일 "내용"으로 찾으면 search_files 의 arguments 에 "content": true
+- 이름이 아니라 주제/뜻으로 찾으면 (예: "회의록 같은 거") search_files 의 arguments 에 "semantic": true
 - "요약" → summarize_file
 - "폴더" → create_folder
 - "파일 만들어", "txt", "생성" → create_file
 - "옮겨", "이동", "보내" → move_file
+- "중복" → find_duplicates (확장자를 말하면 ext 에 넣는다)
+- 여러 파일을 한 번에 옮기면 move_file 의 src 에 "*.log" 같은 패턴을 쓴다
 
 예시)
 사용자: 기본 폴더에 down 폴더 만들어줘
 →
-{
-  "tool": "create_folder",
-  "arguments": { "name": "down" }
-}
+[
+  { "tool": "create_folder", "arguments": { "name": "down" } }
+]
+
+사용자: a.log 를 archive 로 옮기고 요약해줘
+→
+[
+  { "tool": "move_file", "arguments": { "src": "a.log", "dst": "archive" } },
+  { "tool": "summarize_file", "arguments": { "path": "archive/a.log" } }
+]
 """
 
 ALLOWED_TOOLS = {
@@ -59,7 +125,56 @@ ALLOWED_TOOLS = {
     "create_folder",
     "create_file",
     "move_file",
+    "find_duplicates",
+}
+
+# tool별 arguments 스키마 (문법 생성용, 키 순서대로 출력됨)
+TOOL_SCHEMAS = {
+    "search_files": {"keywords": "string[]", "ext": "string[]", "top_k": "integer", "content": "boolean", "semantic": "boolean"},
+    "summarize_file": {"path": "string"},
+    "create_folder": {"name": "string"},
+    "create_file": {"path": "string", "content": "string"},
+    "move_file": {"src": "string", "dst": "string"},
+    "find_duplicates": {"ext": "string[]", "min_size": "integer"},
 }
+TOOL_GBNF = build_tool_grammar({t: TOOL_SCHEMAS[t] for t in ALLOWED_TOOLS}, plan=True, max_steps=MAX_PLAN_STEPS)
+
+# 매 요청마다 똑같은 앞부분 → KV 상태를 한 번만 계산해서 디스크에 저장/복원
+PROMPT_PREFIX = SYSTEM_PROMPT + "\n사용자:"
+
+# 같은 발화는 LLM 을 다시 부르지 않는다 (모델/프롬프트/문법이 바뀌면 키가 달라짐)
+parse_cache = ParseCache(PARSE_CACHE_SIZE, os.path.join(CACHE_DIR, "parse_cache.json"))
+
+def setup_llm(loaded):
+    """로더 스레드에서 모델 로드 직후 한 번: 문법 컴파일, SYSTEM_PROMPT KV 상태 복원"""
+    global llm, TOOL_GRAMMAR, prefix_state, MODEL_ID, summarizer
+
+    if not GRAMMAR_DECODING:
+        TOOL_GRAMMAR = None
+    elif is_remote(loaded):
+        TOOL_GRAMMAR = TOOL_GBNF  # 서버에는 GBNF 문자열로 넘긴다
+    else:
+        from llama_cpp import LlamaGrammar
+        TOOL_GRAMMAR = LlamaGrammar.from_string(TOOL_GBNF, verbose=False)
+
+    # (원격이면 서버 쪽 시퀀스가 KV 앞부분을 알아서 재사용한다)
+    if not is_remote(loaded):
+        prefix_state = PrefixState(loaded, MODEL_PATH, PROMPT_PREFIX, CACHE_DIR)
+        source = prefix_state.load_or_build()
+        if prefix_state.restore_error:
+            source += f" (디스크 캐시 복원 실패: {prefix_state.restore_error})"
+        model.note(f"prefix 캐시: {source}")
+
+    model_hash = model_identity(loaded, MODEL_PATH, CACHE_DIR)
+    MODEL_ID = model_hash + ":" + text_sha256(PROMPT_PREFIX + TOOL_GBNF)[:8]
+    summarizer = Summarizer(loaded, summary_cache, model_hash, llm_lock)
+    if semantic_index is not None:
+        # 벡터는 모델마다 다르므로 모델이 바뀌면 색인을 새로 만든다
+        semantic_index.set_embedder(make_embedder(loaded, MODEL_PATH), model_hash)
+    llm = loaded
+
+# FILETALK_LLM_SERVER 가 있으면 공유 모델 서버에 붙음
+model = LazyModel(MODEL_PATH, setup=setup_llm, n_ctx=4096, draft=SPECULATIVE)
 
 # =========================
 # 유틸
@@ -68,27 +183,124 @@ def to_root_path(name: str) -> str:
     name = os.path.basename(name)
     return os.path.join(ROOT_DIR, name)
 
+def root_rel_path(p: str) -> str:
+    """"archive/a.log" 처럼 하위 폴더까지 살린 ROOT_DIR 기준 경로 (밖으로 나가면 파일명만)"""
+    p = p.replace("\\", "/")
+    for prefix in ("./filetalk_root/", "filetalk_root/", "./"):
+        if p.startswith(prefix):
+            p = p[len(prefix):]
+    rel = os.path.normpath(p.lstrip("/"))
+    if rel.startswith("..") or os.path.isabs(rel):
+        rel = os.path.basename(p)
+    return os.path.join(ROOT_DIR, rel)
+
 # =========================
 # LLM → JSON → 보정
 # =========================
-def llm_parse(user_text: str) -> dict:
-    prompt = SYSTEM_PROMPT + "\n사용자: " + user_text + "\n답변:\n"
-    out = llm(prompt, max_tokens=256, temperature=0.1, stop=["사용자:"])
-    text = out["choices"][0]["text"].strip()
-    text = text.replace("```json", "").replace("```", "").strip()
-
+def parse_prompt(suffix: str):
+    """PROMPT_PREFIX + suffix (로컬이면 prefix KV 를 재사용하는 토큰 리스트)"""
+    if prefix_state is None:
+        return PROMPT_PREFIX + suffix
+    prefix_state.ensure()  # 사용자 발화 부분만 평가되도록
+    return prefix_state.prompt_tokens(suffix)
+
+def llm_complete(prompt, **kwargs) -> dict:
+    """llm(prompt, ...) 와 같지만 추적 중이면 호출 시간과 토큰 수, 초안 채택 수를 남김"""
+    req = tracer.current()
+    draft = draft_stats(llm)
+    before = draft.snapshot() if draft is not None else None
+    out = traced_completion(llm, prompt, req, **kwargs)
+    if before is not None:
+        proposed, accepted = draft.snapshot()
+        req.add(draft_proposed=proposed - before[0], draft_accepted=accepted - before[1])
+    return out
+
+def load_json_loose(text: str):
+    """코드 펜스 (```json) 를 벗기고 JSON 으로 읽음. 안 되면 None"""
+    text = text.strip().replace("```json", "").replace("```", "").strip()
     try:
-        cmd = json.loads(text)
-    except Exception:
-        # 한 번 더 시도
-        out2 = llm(prompt + "JSON 형식으로 다시:\n", max_tokens=256, temperature=0.1)
-        text2 = out2["choices"][0]["text"].strip().replace("```json", "").replace("```", "").strip()
+        return json.loads(text)
+    except ValueError:
+        return None
+
+def llm_parse(user_text: str) -> list:
+    suffix = " " + user_text + "\n답변:\n"
+
+    if TOOL_GRAMMAR is not None:
+        # 문법이 닫히는 "]" 에서 바로 끝나므로 재시도/기본값 대체가 필요 없다
+        out = llm_complete(parse_prompt(suffix), max_tokens=256, temperature=0.1, grammar=TOOL_GRAMMAR)
+        text = out["choices"][0]["text"].strip()
         try:
-            cmd = json.loads(text2)
-        except Exception:
+            cmd = json.loads(text)
+        except ValueError:
+            # 문법상 유효하지 않은 JSON 은 max_tokens 에서 잘린 경우뿐
+            raise ValueError(f"LLM 출력이 max_tokens 에서 잘렸습니다: {text[:80]}")
+        with tracer.span("normalize"):
+            return normalize_plan(cmd)
+
+    out = llm_complete(parse_prompt(suffix), max_tokens=256, temperature=0.1, stop=["사용자:"])
+    with tracer.span("json_repair"):
+        cmd = load_json_loose(out["choices"][0]["text"])
+    if cmd is None:
+        # 한 번 더 시도
+        tracer.current().add(retries=1)
+        out2 = llm_complete(parse_prompt(suffix + "JSON 형식으로 다시:\n"), max_tokens=256, temperature=0.1)
+        with tracer.span("json_repair"):
+            cmd = load_json_loose(out2["choices"][0]["text"])
+        if cmd is None:
             cmd = {"tool": "create_file", "arguments": {"path": "./filetalk_root/new.txt", "content": ""}}
 
-    return normalize_cmd(cmd)
+    with tracer.span("normalize"):
+        return normalize_plan(cmd)
+
+# 캐시 → 규칙 해석기 → (애매하면) LLM
+parse_stats = {"cache": 0, "rule": 0, "llm": 0}
+
+def parse_command(user_text: str):
+    """(명령 리스트, 경로 "cache"/"rule"/"llm", 규칙 확신도)
+
+    모델이 아직 로드 중인데 LLM 이 필요하면 (None, "pending", 확신도)
+    """
+    with tracer.request("parse") as req:
+        cmds, source, conf = _parse_command(user_text)
+        req.set(source=source, confidence=round(conf, 3), steps=len(cmds or []))
+    return cmds, source, conf
+
+def _parse_command(user_text: str):
+    if MODEL_ID is not None:
+        with tracer.span("cache"):
+            cached = parse_cache.get(user_text, MODEL_ID)
+        if cached is not None:
+            parse_stats["cache"] += 1
+            return cached, "cache", 1.0
+    with tracer.span("router"):
+        cmd, conf, _ = intent_router.route(user_text)
+    if cmd is not None and conf >= ROUTER_MIN_CONFIDENCE:
+        parse_stats["rule"] += 1
+        with tracer.span("normalize"):
+            return [normalize_cmd(cmd)], "rule", conf
+    if llm is None:
+        return None, "pending", conf
+    parse_stats["llm"] += 1
+    t0 = time.perf_counter()
+    with tracer.span("lock_wait"):
+        llm_lock.acquire()
+    try:
+        cmds = llm_parse(user_text)
+    finally:
+        llm_lock.release()
+    if model.record_first_inference(time.perf_counter() - t0):
+        tracer.current().set(startup=model.timing_text())
+    parse_cache.put(user_text, MODEL_ID, cmds)
+    return cmds, "llm", conf
+
+def normalize_plan(obj) -> list:
+    """LLM 출력 (명령 하나 또는 배열) → normalize_cmd 를 거친 명령 리스트"""
+    items = obj if isinstance(obj, list) else [obj]
+    cmds = [normalize_cmd(c) for c in items[:MAX_PLAN_STEPS] if isinstance(c, dict)]
+    if not cmds:
+        raise ValueError("LLM 출력에 명령이 없습니다")
+    return cmds
 
 def normalize_cmd(cmd: dict) -> dict:
     tool = cmd.get("tool", "unknown")
@@ -133,12 +345,17 @@ def normalize_cmd(cmd: dict) -> dict:
         folder_name = args.get("folder")
         if file_name and folder_name:
             src = os.path.join(ROOT_DIR, os.path.basename(file_name))
+            # 대상 폴더는 실행할 때 만든다 (해석만 하고 실행하지 않으면 디스크에 흔적이 남지 않게)
             dst_dir = os.path.join(ROOT_DIR, os.path.basename(folder_name))
-            os.makedirs(dst_dir, exist_ok=True)
             dst = os.path.join(dst_dir, os.path.basename(file_name))
             args = {"src": src, "dst": dst, "dry_run": False}
+        elif has_glob(args.get("src", "")):
+            # 2) "*.log" 같은 패턴 → dst 는 폴더
+            src_path = root_rel_path(args["src"])
+            dst_path = os.path.join(ROOT_DIR, os.path.basename(args.get("dst", "")))
+            args = {"src": src_path, "dst": dst_path, "dry_run": False}
         else:
-            # 2) src/dst로 온 경우 → basename만
+            # 3) src/dst로 온 경우 → basename만
             src = os.path.basename(args.get("src", ""))
             dst = os.path.basename(args.get("dst", ""))
             src_path = os.path.join(ROOT_DIR, src)
@@ -154,8 +371,13 @@ def normalize_cmd(cmd: dict) -> dict:
             args = {"src": src_path, "dst": dst_path, "dry_run": False}
 
     elif tool == "summarize_file":
-        p = os.path.basename(args.get("path", "unknown.txt"))
-        args = {"path": os.path.join(ROOT_DIR, p), "max_tokens": 200}
+        args = {"path": root_rel_path(args.get("path", "unknown.txt")), "max_tokens": 200}
+
+    elif tool == "find_duplicates":
+        ext = args.get("ext", [])
+        if isinstance(ext, str):
+            ext = [ext]
+        args = {"ext": ext, "min_size": max(1, int(args.get("min_size", 1)))}
 
     elif tool == "search_files":
         kw = args.get("keywords", [])
@@ -167,7 +389,9 @@ def normalize_cmd(cmd: dict) -> dict:
         args = {
             "keywords": kw,
             "ext": ext,
-            "top_k": int(args.get("top_k", 100))
+            "top_k": int(args.get("top_k", 100)),
+            "content": bool(args.get("content", False)),
+            "semantic": bool(args.get("semantic", False)),
         }
 
     cmd["tool"] = tool
@@ -177,6 +401,52 @@ def normalize_cmd(cmd: dict) -> dict:
 # =========================
 # 실제 실행
 # =========================
+progress_listener = None  # 긴 작업 진행률 문자열을 받을 함수 (UI 에서 설정)
+
+result_listener = None  # 검색 중 찾은 경로를 바로 받을 함수 (UI 에서 설정)
+
+def notify_progress(text: str):
+    if progress_listener is not None:
+        progress_listener(text)
+
+def notify_result(path: str):
+    if result_listener is not None:
+        result_listener(path)
+
+def resolve_name(path: str, missing: str = "파일 없음: {}", auto: bool = True):
+    """(실제 경로, 결과 앞에 붙일 보정 안내). 없는 파일이면 이름이 제일 비슷한 파일로
+
+    auto=False (이동처럼 되돌리기 어려운 명령) 이면 바꿔 치지 않고 후보만 붙여서 FileNotFoundError.
+    """
+    if os.path.exists(path):
+        return path, ""
+    if fuzzy_names is None:
+        raise FileNotFoundError(missing.format(path))
+    if file_index.built:
+        file_index.ensure_fresh()  # 앞 단계에서 만든/옮긴 파일도 후보에 들어가도록
+    else:
+        file_index.start_build()
+    best, cands = fuzzy_names.resolve(path)
+    if auto and best is not None:
+        return best, f"이름 보정: {os.path.basename(path)} → {os.path.relpath(best, ROOT_DIR)}\n"
+    hint = ", ".join(os.path.relpath(p, ROOT_DIR) for p, _ in cands[:3])
+    if hint and not auto:
+        hint = f"혹시 {hint} ? 맞으면 그 이름으로 다시 요청하세요"
+    raise FileNotFoundError(missing.format(path) + (f" ({hint})" if hint else ""))
+
+def live_search(keywords, exts, top_k: int) -> list:
+    """첫 색인 전: 인덱스는 뒤에서 만들고, 그동안은 트리를 직접 훑어서 찾는 대로 흘려 보낸다"""
+    file_index.start_build()
+    found = [0]
+
+    def on_result(path: str):
+        found[0] += 1
+        notify_result(path)
+        notify_progress(f"색인 만드는 중이라 직접 찾는 중... {found[0]}개")
+
+    res = LiveSearch(ROOT_DIR, LIVE_SEARCH_WORKERS).search(make_matcher(keywords, exts), top_k, on_result)
+    return res["paths"]
+
 def run_cmd(cmd: dict) -> str:
     tool = cmd["tool"]
     args = cmd["arguments"]
@@ -184,6 +454,7 @@ def run_cmd(cmd: dict) -> str:
     if tool == "create_folder":
         path = os.path.join(ROOT_DIR, args["name"])
         os.makedirs(path, exist_ok=True)
+        file_index.mark_stale()
         return f"폴더 생성: {path}"
 
     if tool == "create_file":
@@ -191,94 +462,275 @@ def run_cmd(cmd: dict) -> str:
         os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, "w", encoding="utf-8") as f:
             f.write(args.get("content", ""))
+        file_index.mark_stale()
         return f"파일 생성: {path}"
 
     if tool == "move_file":
         src = args["src"]
         dst = args["dst"]
-        dry = args.get("dry_run", False)
-        if dry:
-            return f"[DRY RUN] {src} -> {dst}"
-        if not os.path.exists(src):
-            return f"소스 없음: {src}"
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
-        shutil.move(src, dst)
-        return f"이동 완료: {src} -> {dst}"
+        if not has_glob(src):
+            # 비슷한 이름으로 몰래 옮기지 않는다: 없으면 후보만 알려주고 실패
+            resolve_name(src, "소스 없음: {}", auto=False)
+        items = plan_items([src], dst, dst_is_dir=has_glob(src))
+        if args.get("dry_run", False):
+            return "[DRY RUN]\n" + "\n".join(f"{i.src} -> {i.dst}" for i in items)
+        if not items:
+            # plan 에서 뒤 명령이 건너뛰어지도록 예외로
+            raise FileNotFoundError(f"소스 없음: {src}")
+        job = BulkTransfer(
+            items, "move", TRANSFER_WORKERS,
+            journal_path=journal_path_for(os.path.join(CACHE_DIR, "transfer"), [src], dst),
+            on_progress=lambda st: notify_progress(format_stats(st)),
+        )
+        st = job.run()
+        file_index.mark_stale()
+        if st["failed"]:
+            errors = "\n".join(f"{p}: {e}" for p, e in st["failed"][:5])
+            raise OSError(f"{format_stats(st)}\n실패 {len(st['failed'])}개 (다시 실행하면 이어서 처리):\n{errors}")
+        if len(items) == 1:
+            return f"이동 완료: {items[0].src} -> {items[0].dst}"
+        return format_stats(st)
 
     if tool == "search_files":
         keywords = args.get("keywords", [])
         exts = args.get("ext", [])
         top_k = args.get("top_k", 100)
-        results = []
-        for root, _, files in os.walk(ROOT_DIR):
-            for fn in files:
-                fpath = os.path.join(root, fn)
-                # 이름 필터
-                name_ok = all(kw in fn for kw in keywords) if keywords else True
-                # 확장자 필터
-                if exts:
-                    ext_ok = any(fn.lower().endswith(e.lower()) for e in exts)
-                else:
-                    ext_ok = True
-                if name_ok and ext_ok:
-                    results.append(fpath)
-                    if len(results) >= top_k:
-                        break
+        if args.get("content") and content_index is not None and keywords:
+            # 본문 검색: 역색인만 조회 (파일은 열지 않음)
+            hits = content_index.search(" ".join(keywords), exts, top_k)
+            results = [f"{p} (점수 {score:.2f})" for p, score in hits]
+        elif args.get("semantic") and semantic_index is not None and semantic_index.ready and keywords:
+            return semantic_results(" ".join(keywords), exts, top_k)
+        elif not file_index.built:
+            results = live_search(keywords, exts, top_k)
+        else:
+            results = file_index.search(keywords, exts, top_k)
+            if not results and keywords and semantic_index is not None and semantic_index.ready:
+                # 이름에 글자가 없으면 (회의록 ↔ meeting_notes) 뜻으로 한 번 더
+                return semantic_results(" ".join(keywords), exts, min(top_k, SEMANTIC_TOP_K), "이름 일치 없음 → ")
         if not results:
             return "조회 결과 없음."
         return "조회 결과:\n" + "\n".join(results)
 
     if tool == "summarize_file":
-        path = args["path"]
-        if not os.path.exists(path):
-            return f"요약 실패: 파일 없음 {path}"
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                text = f.read()
-        except UnicodeDecodeError:
-            text = "[텍스트가 아닌 파일]"
-        preview = text[:200].replace("\n", " ")
-        return f"요약(앞 200자): {preview}"
+        # 읽기만 하므로 비슷한 이름으로 바꿔도 되지만, 바꿨다는 건 결과에 남긴다
+        path, note = resolve_name(args["path"], "요약 실패: 파일 없음 {}")
+        encoding = text_encoding(path)
+        if encoding is None:
+            # pdf/docx/hwp 같은 바이너리를 깨진 글자로 모델에 넣지 않는다
+            return f"{note}요약: [텍스트가 아닌 파일] {path}"
+        if summarizer is None:
+            # 모델 로드 전: 앞부분만 읽어서 미리보기
+            with open(path, "r", encoding=encoding, errors="replace") as f:
+                preview = f.read(200).replace("\n", " ")
+            return f"{note}요약(모델 로딩 중, 앞 200자): {preview}"
+        res = summarizer.summarize_file(path, args.get("max_tokens", 200), encoding)
+        return note + (
+            f"요약 ({res['chunks']}개 청크, LLM {res['llm_calls']}회 / 캐시 {res['cached']}회, "
+            f"{res['elapsed']:.1f}초):\n{res['summary']}"
+        )
+
+    if tool == "find_duplicates":
+        # 크기 → 앞뒤 블록 → 전체 해시 순으로 후보를 줄여서 대부분의 파일은 읽지 않는다
+        groups = dup_finder.find(args.get("ext"), args.get("min_size", 1))
+        return format_duplicates(groups, dup_finder.stats)
 
     return "지원하지 않는 tool"
 
-# =========================
-# UI
-# =========================
-root = tk.Tk()
-root.title("Filetalk PoC")
-
-tk.Label(root, text=f"관리 폴더: {ROOT_DIR}").pack(padx=10, pady=5)
-
-entry = tk.Entry(root, width=70)
-entry.pack(padx=10, pady=10)
-
-text_box = tk.Text(root, width=80, height=15)
-text_box.pack(padx=10, pady=5)
-
-state = {"cmd": None}
-
-def on_parse():
-    user = entry.get().strip()
-    if not user:
-        return
-    cmd = llm_parse(user)
-    state["cmd"] = cmd
-    text_box.delete("1.0", tk.END)
-    text_box.insert(tk.END, json.dumps(cmd, ensure_ascii=False, indent=2))
-
-def on_exec():
-    cmd = state.get("cmd")
-    if not cmd:
-        messagebox.showinfo("알림", "먼저 LLM으로 해석하세요.")
-        return
-    res = run_cmd(cmd)
-    messagebox.showinfo("결과", res)
+def semantic_results(query: str, exts, top_k: int, note: str = "") -> str:
+    hits = semantic_index.search(query, exts, min(top_k, SEMANTIC_TOP_K), SEMANTIC_MIN_SCORE)
+    if not hits:
+        return "조회 결과 없음."
+    return f"{note}뜻 검색 결과:\n" + "\n".join(f"{p} (유사도 {score:.2f})" for p, score in hits)
 
-btn_frame = tk.Frame(root)
-btn_frame.pack(pady=5)
+def cmd_access(cmd: dict):
+    """(읽는 경로, 쓰는 경로) → plan 안에서 순서가 필요한 명령 판단용"""
+    tool = cmd["tool"]
+    args = cmd["arguments"]
+    if tool == "create_folder":
+        return set(), {os.path.join(ROOT_DIR, args["name"])}
+    if tool == "create_file":
+        return set(), {args["path"]}
+    if tool == "move_file":
+        src = os.path.dirname(args["src"]) if has_glob(args["src"]) else args["src"]
+        return {src}, {src, args["dst"]}
+    if tool == "summarize_file":
+        return {args["path"]}, set()
+    if tool in ("search_files", "find_duplicates"):
+        return {ROOT_DIR}, set()  # 검색은 앞에서 바꾼 결과를 봐야 한다
+    return {ROOT_DIR}, {ROOT_DIR}
 
-tk.Button(btn_frame, text="LLM으로 해석", command=on_parse).pack(side=tk.LEFT, padx=5)
-tk.Button(btn_frame, text="명령 실행", command=on_exec).pack(side=tk.LEFT, padx=5)
+# 요약은 Summarizer 안에서 llm_lock 을 잡으므로 I/O 명령과 같이 돌려도 된다
+plan_executor = PlanExecutor(run_cmd, cmd_access, PLAN_WORKERS)
 
-root.mainloop()
+# =========================
+# UI
+# =========================
+def main():
+    root = tk.Tk()
+    root.title("Filetalk PoC")
+
+    tk.Label(root, text=f"관리 폴더: {ROOT_DIR}").pack(padx=10, pady=5)
+
+    entry = tk.Entry(root, width=70)
+    entry.pack(padx=10, pady=10)
+
+    text_box = tk.Text(root, width=80, height=15)
+    text_box.pack(padx=10, pady=5)
+
+    # 실행 중에 흘러오는 결과 (찾은 경로) 는 명령 JSON 과 섞이지 않게 따로
+    result_box = tk.Text(root, width=80, height=6, fg="gray")
+    result_box.pack(padx=10, pady=(0, 5))
+
+    global progress_listener, result_listener
+    state = {"cmds": None, "running": False, "deferred": 0}
+    events = queue.Queue()  # 실행 스레드 → UI
+    progress_listener = lambda text: events.put(("progress", text))
+    result_listener = lambda path: events.put(("found", path))
+
+    def trace_text() -> str:
+        # 마지막 요청의 단계별 시간 (추적을 끄면 빈 문자열)
+        return f" | {tracer.last.summary()}" if tracer.last is not None else ""
+
+    def show_plan(cmds: list, text: str):
+        state["cmds"] = cmds
+        text_box.delete("1.0", tk.END)
+        text_box.insert(tk.END, json.dumps(cmds, ensure_ascii=False, indent=2))
+        cs = parse_cache.stats()
+        status_label.config(
+            text=f"{text} | 캐시 {parse_stats['cache']}회 / "
+                 f"규칙 {parse_stats['rule']}회 / LLM {parse_stats['llm']}회 | 캐시 적중률 {cs['hit_rate']:.0%}"
+                 + trace_text()
+        )
+
+    def handle_parse(user: str):
+        if state["deferred"]:
+            # 앞 요청이 모델을 기다리는 중이면 같이 기다렸다가 입력한 순서대로 합친다
+            state["deferred"] = model.defer(user)
+            status_label.config(text=model.status_text())
+            return
+        try:
+            cmds, source, conf = parse_command(user)
+        except ValueError as e:
+            messagebox.showerror("해석 실패", str(e))
+            return
+        if source == "pending":
+            # 모델 로드 끝나면 poll_model 에서 다시 처리
+            state["deferred"] = model.defer(user)
+            status_label.config(text=model.status_text())
+            return
+        show_plan(cmds, f"해석: {source} (규칙 확신도 {conf:.2f})")
+
+    def handle_deferred(users: list):
+        """로딩 중에 쌓인 요청들을 하나의 계획으로 (따로 보여주면 마지막 것만 남는다)"""
+        cmds, failed = [], []
+        for user in users:
+            try:
+                plan, _, _ = parse_command(user)
+            except ValueError as e:
+                failed.append(f"{user}: {e}")
+                continue
+            cmds.extend(plan)
+        if failed:
+            messagebox.showerror("해석 실패", "\n".join(failed))
+        if cmds:
+            show_plan(cmds, f"대기 중이던 요청 {len(users) - len(failed)}건을 입력 순서대로 합침 (명령 {len(cmds)}개)")
+
+    def on_parse():
+        user = entry.get().strip()
+        if not user:
+            return
+        handle_parse(user)
+
+    def on_exec():
+        cmds = state.get("cmds")
+        if not cmds:
+            messagebox.showinfo("알림", "먼저 LLM으로 해석하세요.")
+            return
+        if state["running"]:
+            return
+        state["running"] = True
+        exec_btn.config(state=tk.DISABLED)
+        result_box.delete("1.0", tk.END)
+        status_label.config(text=f"실행 중: 명령 {len(cmds)}개")
+
+        def work():
+            try:
+                with tracer.request("exec", steps=len(cmds)) as req:
+                    res = plan_executor.run(cmds, on_step=lambda step: events.put(("step", step)))
+                    for step in res["steps"]:
+                        req.add_time(f"{step.idx + 1}.{step.cmd['tool']}", step.elapsed)
+                    req.set(failed=sum(1 for step in res["steps"] if step.status == "실패"))
+                events.put(("done", format_report(res)))
+            except Exception as e:
+                events.put(("done", f"실행 실패: {e}"))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def poll_events():
+        # Tk 는 메인 스레드에서만 만진다. 실행 중이 아니어도 비워야 백그라운드 색인 알림이
+        # 쌓였다가 다음 실행 결과에 한꺼번에 섞이지 않는다
+        while True:
+            try:
+                kind, item = events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                status_label.config(text=item)
+            elif kind == "found":
+                # 검색이 끝나기 전에 찾은 경로부터 보여줌
+                result_box.insert(tk.END, f"찾음: {item}\n")
+                result_box.see(tk.END)
+            elif kind == "step":
+                status_label.config(text=f"{item.idx + 1}번 {item.cmd['tool']} {item.status} ({item.elapsed:.2f}초)")
+            else:
+                state["running"] = False
+                exec_btn.config(state=tk.NORMAL)
+                status_label.config(text=trace_text().lstrip(" |"))
+                messagebox.showinfo("결과", item)
+        root.after(50 if state["running"] else 200, poll_events)
+
+    def poll_model():
+        # 로딩 진행률 표시, 끝나면 대기 중이던 요청 처리
+        if not model.ready.is_set():
+            status_label.config(text=model.status_text())
+            root.after(200, poll_model)
+            return
+        status_label.config(text=model.status_text())
+        users = model.take_pending()
+        state["deferred"] = 0
+        if not users:
+            return
+        if model.error is not None:
+            messagebox.showerror("모델 로드 실패", f"대기 중이던 요청 {len(users)}건을 처리하지 못했습니다: {model.error}")
+        elif len(users) == 1:
+            handle_parse(users[0])
+        else:
+            handle_deferred(users)
+
+    btn_frame = tk.Frame(root)
+    btn_frame.pack(pady=5)
+
+    tk.Button(btn_frame, text="LLM으로 해석", command=on_parse).pack(side=tk.LEFT, padx=5)
+    exec_btn = tk.Button(btn_frame, text="명령 실행", command=on_exec)
+    exec_btn.pack(side=tk.LEFT, padx=5)
+
+    status_label = tk.Label(root, text="", fg="gray")
+    status_label.pack(padx=10, pady=(0, 5))
+
+    # 창을 먼저 띄우고 모델/본문 색인은 뒤에서
+    model.start(import_sec=IMPORT_SEC)
+    if content_index is not None:
+        content_index.start_background(CONTENT_REFRESH_SEC, on_status=notify_progress)
+    if semantic_index is not None:
+        # 모델 로드 전에는 아무것도 안 함
+        semantic_index.start_background(SEMANTIC_REFRESH_SEC, on_status=notify_progress)
+    if fuzzy_names is not None:
+        fuzzy_names.start_background()
+    poll_model()
+    poll_events()
+
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
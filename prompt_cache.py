@@ -0,0 +1,126 @@
+"""고정 프롬프트(prefix)의 KV 상태를 한 번만 계산해서 디스크에 저장/복원
+
+캐시 파일은 모델 파일 해시 + 프롬프트 해시로 구분한다.
+모델이나 SYSTEM_PROMPT 가 바뀌면 자동으로 새로 만든다.
+
+신뢰 경계: .state 파일은 llama_cpp.LlamaState 를 pickle 로 저장한 것이라 읽을 때 임의 코드가 실행될 수 있다.
+이 앱이 cache_dir 에 직접 쓴 파일만 읽는다는 전제 (cache_dir 는 사용자 전용 폴더여야 하고,
+다른 사람이 쓸 수 있는 공유 폴더나 받은 파일을 가리키면 안 된다).
+"""
+import hashlib
+import json
+import os
+import pickle
+
+HASH_CHUNK = 8 * 1024 * 1024
+
+
+def file_sha256(path: str, memo_path: str = None) -> str:
+    """모델 파일 sha256 (path+size+mtime 이 같으면 memo 파일의 값을 재사용)"""
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    memo = {}
+    if memo_path and os.path.exists(memo_path):
+        try:
+            with open(memo_path, "r", encoding="utf-8") as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+        if key in memo:
+            return memo[key]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_CHUNK)
+            if not block:
+                break
+            h.update(block)
+    digest = h.hexdigest()
+
+    if memo_path:
+        memo[key] = digest
+        tmp = memo_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(memo, f)
+        os.replace(tmp, memo_path)
+    return digest
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PrefixState:
+    """prefix 를 평가한 llama 상태를 들고 있다가 필요할 때 KV 에 복원한다."""
+
+    def __init__(self, llm, model_path: str, prefix: str, cache_dir: str):
+        self.llm = llm
+        self.prefix = prefix
+        self.prefix_tokens = llm.tokenize(prefix.encode("utf-8"))
+        self.state = None
+        self.restore_error = None  # 디스크 캐시를 못 읽어서 다시 만들었으면 그 이유
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.model_hash = file_sha256(model_path, os.path.join(cache_dir, "model_hashes.json"))
+        prompt_hash = text_sha256(prefix)
+        self.path = os.path.join(cache_dir, f"prefix_{self.model_hash[:16]}_{prompt_hash[:16]}.state")
+
+    def load_or_build(self) -> str:
+        """디스크 캐시가 있으면 복원("disk"), 없으면 평가 후 저장("built")"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as f:
+                    state = pickle.load(f)  # 우리가 _save 로 쓴 파일만 (모듈 설명의 신뢰 경계 참고)
+                self._restore_scores(state)
+                self.llm.load_state(state)
+                if self._prefix_in_kv():
+                    self.state = state
+                    return "disk"
+            except Exception as e:
+                self.restore_error = str(e)
+
+        self.llm.reset()
+        self.llm.eval(self.prefix_tokens)
+        self.state = self.llm.save_state()
+        self._save(self.state)
+        return "built"
+
+    def ensure(self) -> bool:
+        """KV 캐시 앞부분이 prefix 가 아니면 저장해 둔 상태로 되돌린다."""
+        if self.state is None or self._prefix_in_kv():
+            return False
+        self.llm.load_state(self.state)
+        return True
+
+    def prompt_tokens(self, suffix: str) -> list:
+        """prefix 토큰 + suffix 토큰 (경계에서 토큰이 합쳐져 캐시가 깨지지 않도록 따로 토큰화)"""
+        return self.prefix_tokens + self.llm.tokenize(suffix.encode("utf-8"), add_bos=False)
+
+    def _prefix_in_kv(self) -> bool:
+        n = len(self.prefix_tokens)
+        if self.llm.n_tokens < n:
+            return False
+        return list(self.llm.input_ids[:n]) == self.prefix_tokens
+
+    def _save(self, state):
+        # scores 는 (n_tokens, n_vocab) 라 매우 크다. 다음 토큰 샘플링에 쓰이는 마지막 행만 저장
+        full = state.scores
+        state.scores = full[-1:].copy()
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        finally:
+            state.scores = full
+
+    def _restore_scores(self, state):
+        import numpy as np
+
+        last = state.scores
+        if len(last) == state.n_tokens:
+            return
+        scores = np.zeros((state.n_tokens, last.shape[-1]), dtype=last.dtype)
+        scores[-1] = last[-1]
+        state.scores = scores
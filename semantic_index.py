@@ -0,0 +1,265 @@
+"""의미 기반 파일 검색 (임베딩 벡터 색인)
+
+파일 이름 + 앞부분 본문을 로컬 GGUF 모델(임베딩 모드, mean pooling)로 벡터화해서
+index_dir 에 저장한다.
+    vectors.npy  (N, dim) float16, 길이 1로 정규화
+    meta.json    경로/크기/mtime (행 순서 = vectors 행 순서), 모델 식별자
+조회는 질의 벡터와의 내적(코사인)을 행렬곱 한 번으로 계산하고 argpartition 으로 top_k 만 정렬한다.
+update() 는 FileIndex 의 files 테이블과 비교해서 바뀐 파일만 다시 임베딩한다.
+처음 만들 때처럼 오래 걸리면 SAVE_INTERVAL 마다 중간 결과를 저장한다 (앱을 닫아도 이어서).
+조회는 MIN_SCORE 보다 유사도가 낮은 건 버린다 (아무 파일이나 "뜻 검색 결과" 로 나오지 않게).
+"""
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from file_index import FileIndex, normalize_ext
+
+HEAD_BYTES = 4096  # 본문은 앞부분만
+HEAD_CHARS = 600
+EMBED_BATCH = 16
+SCORE_BLOCK = 65536  # 조회 시 한 번에 float32 로 올리는 행 수
+SAVE_INTERVAL = 60.0  # 임베딩 도중 중간 저장 간격 (초)
+MIN_SCORE = 0.35  # 이보다 유사도가 낮으면 관련 없는 파일로 보고 버림 (임베딩 모델에 따라 조정)
+TEXT_EXTS = {
+    ".txt", ".md", ".log", ".csv", ".json", ".xml", ".html", ".htm", ".py", ".yaml", ".yml", ".srt",
+}
+
+_SPLIT_RE = re.compile(r"[_\-.\s]+")
+
+
+def _head_text(path: str) -> str:
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(HEAD_BYTES)
+    except OSError:
+        return ""
+    if b"\x00" in raw:
+        return ""
+    for enc in ("utf-8", "cp949"):
+        try:
+            return raw.decode(enc)[:HEAD_CHARS]
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("utf-8", errors="ignore")[:HEAD_CHARS]
+
+
+def doc_text(path: str) -> str:
+    """임베딩할 문자열: 이름을 단어로 풀어 쓴 것 + (텍스트 파일이면) 앞부분 본문"""
+    name = os.path.basename(path)
+    stem, ext = os.path.splitext(name)
+    text = "파일 이름: " + " ".join(w for w in _SPLIT_RE.split(stem) if w)
+    if ext:
+        text += f" ({ext.lstrip('.')})"
+    if ext.lower() in TEXT_EXTS:
+        head = _head_text(path).strip()
+        if head:
+            text += "\n내용: " + head
+    return text
+
+
+def _pool(vec) -> np.ndarray:
+    """llama embed 결과 → 벡터 하나 (토큰별로 나오면 평균)"""
+    arr = np.asarray(vec, dtype=np.float32)
+    if arr.ndim == 2:
+        arr = arr.mean(axis=0)
+    n = np.linalg.norm(arr)
+    return arr / n if n > 0 else arr
+
+
+def make_embedder(llm, model_path: str, **llama_kwargs):
+    """texts → (n, dim) float32. 원격이면 서버의 /v1/embeddings, 로컬이면 임베딩 모드 Llama 를 하나 더 띄운다
+
+    (가중치는 mmap 이라 생성용 인스턴스와 메모리를 공유한다)
+    """
+    from llm_backend import is_remote
+
+    if is_remote(llm):
+        embed = llm.embed
+    else:
+        import llama_cpp
+
+        kwargs = dict(n_ctx=512, n_batch=512, verbose=False, use_mmap=True)
+        if hasattr(llama_cpp, "LLAMA_POOLING_TYPE_MEAN"):
+            kwargs["pooling_type"] = llama_cpp.LLAMA_POOLING_TYPE_MEAN
+        kwargs.update(llama_kwargs)
+        from autotune import tuned_kwargs
+
+        kwargs = tuned_kwargs(model_path, **kwargs)
+        emb_llm = llama_cpp.Llama(model_path=model_path, embedding=True, **kwargs)
+        lock = threading.Lock()
+
+        def embed(texts):
+            with lock:
+                return emb_llm.embed(texts, truncate=True)
+
+    def embed_texts(texts: list) -> np.ndarray:
+        return np.stack([_pool(v) for v in embed(list(texts))])
+
+    return embed_texts
+
+
+class SemanticIndex:
+    def __init__(self, file_index: FileIndex, index_dir: str):
+        self.files = file_index
+        self.index_dir = index_dir
+        self.lock = threading.Lock()  # vectors/meta 교체용
+        self.update_lock = threading.Lock()
+        self.embed = None
+        self.model_id = None
+        self.vectors = None  # (N, dim) float16
+        self.meta = []  # [[path, size, mtime], ...]
+        self.error = None  # 마지막 복원/갱신 실패 (성공하면 None)
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def ready(self) -> bool:
+        return self.embed is not None and self.vectors is not None and len(self.meta) > 0
+
+    def set_embedder(self, embed_fn, model_id: str):
+        """모델 로드 후 호출. 모델이 바뀌었으면 전체를 다시 만든다"""
+        with self.lock:
+            if model_id != self.model_id:
+                self.vectors, self.meta = None, []
+            self.embed = embed_fn
+            self.model_id = model_id
+
+    # -------------------------
+    # 저장/복원
+    # -------------------------
+    def _paths(self):
+        return os.path.join(self.index_dir, "vectors.npy"), os.path.join(self.index_dir, "meta.json")
+
+    def _load(self):
+        vec_path, meta_path = self._paths()
+        if not (os.path.exists(vec_path) and os.path.exists(meta_path)):
+            return
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(vec_path)
+        except (OSError, ValueError) as e:
+            self.error = f"색인 복원 실패, 다시 만듦: {e}"
+            return
+        if len(vectors) != len(meta["files"]):
+            return
+        self.vectors, self.meta, self.model_id = vectors, meta["files"], meta["model_id"]
+
+    def _save(self):
+        vec_path, meta_path = self._paths()
+        if self.vectors is None:
+            # 색인한 파일이 전부 사라졌으면 저장된 행도 지운다 (다시 켰을 때 되살아나지 않게)
+            for p in (vec_path, meta_path):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+            return
+        with open(vec_path + ".tmp", "wb") as f:
+            np.save(f, self.vectors)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"model_id": self.model_id, "files": self.meta}, f, ensure_ascii=False)
+        os.replace(vec_path + ".tmp", vec_path)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    # -------------------------
+    # 갱신
+    # -------------------------
+    def update(self) -> dict:
+        """files 테이블과 비교해서 새로 생기거나 바뀐 파일만 임베딩, 사라진 파일은 행 삭제"""
+        stats = {"embedded": 0, "removed": 0, "kept": 0}
+        if self.embed is None:
+            return stats
+        with self.update_lock:
+            self.files.ensure_fresh()
+            with self.files.lock:
+                current = {p: (size, mtime) for p, size, mtime in
+                           self.files.conn.execute("SELECT path, size, mtime FROM files")}
+            with self.lock:
+                old_meta, old_vecs = list(self.meta), self.vectors
+
+            keep_rows, keep_meta = [], []
+            for i, (path, size, mtime) in enumerate(old_meta):
+                if current.get(path) == (size, mtime):
+                    keep_rows.append(i)
+                    keep_meta.append([path, size, mtime])
+            known = {m[0] for m in keep_meta}
+            stale = sorted(p for p in current if p not in known)
+            stats["kept"] = len(keep_meta)
+            stats["removed"] = sum(1 for m in old_meta if m[0] not in current)
+            if not stale and len(keep_meta) == len(old_meta):
+                return stats
+
+            new_vecs, new_meta = [], []
+            kept = old_vecs[keep_rows] if old_vecs is not None and keep_rows else None
+
+            def publish():
+                parts = ([kept] if kept is not None else []) + new_vecs
+                with self.lock:
+                    self.vectors = np.concatenate(parts) if parts else None
+                    self.meta = keep_meta + new_meta
+                    self._save()
+
+            last_save = time.monotonic()
+            for i in range(0, len(stale), EMBED_BATCH):
+                batch = stale[i:i + EMBED_BATCH]
+                vecs = self.embed([doc_text(p) for p in batch])
+                new_vecs.append(vecs.astype(np.float16))
+                new_meta.extend([p, *current[p]] for p in batch)
+                stats["embedded"] += len(batch)
+                if time.monotonic() - last_save >= SAVE_INTERVAL:
+                    # 다음 update 는 저장된 행을 그대로 두고 나머지만 임베딩한다
+                    new_vecs[:] = [np.concatenate(new_vecs)]
+                    publish()
+                    last_save = time.monotonic()
+            publish()
+        return stats
+
+    def start_background(self, interval: float = 60.0, on_status=None) -> threading.Thread:
+        """임베더가 설정되면 interval 초마다 update(). 실패하면 self.error 에 남기고 on_status(문자열) 로 알린다"""
+        def loop():
+            while True:
+                try:
+                    self.update()
+                    if self.embed is not None:
+                        self.error = None
+                except Exception as e:
+                    self.error = f"갱신 실패: {e}"
+                    if on_status is not None:
+                        on_status(f"의미 색인 {self.error}")
+                time.sleep(interval)
+
+        t = threading.Thread(target=loop, daemon=True)
+        t.start()
+        return t
+
+    # -------------------------
+    # 조회
+    # -------------------------
+    def search(self, query: str, exts=None, top_k: int = 20, min_score: float = MIN_SCORE) -> list:
+        """질의와 코사인 유사도가 min_score 이상인 것을 높은 순으로 [(path, score), ...]"""
+        if not self.ready or not query.strip():
+            return []
+        q = self.embed([query])[0].astype(np.float32)
+        with self.lock:
+            vectors, meta = self.vectors, self.meta
+
+        scores = np.empty(len(meta), dtype=np.float32)
+        for i in range(0, len(meta), SCORE_BLOCK):
+            scores[i:i + SCORE_BLOCK] = vectors[i:i + SCORE_BLOCK].astype(np.float32) @ q
+
+        wanted = tuple(normalize_ext(e) for e in exts or [] if e.strip())
+        if wanted:
+            mask = np.fromiter((m[0].lower().endswith(wanted) for m in meta), dtype=bool, count=len(meta))
+            scores[~mask] = -np.inf
+        k = min(max(0, int(top_k)), len(meta))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(meta[i][0], float(scores[i])) for i in top if np.isfinite(scores[i]) and scores[i] >= min_score]
@@ -0,0 +1,131 @@
+"""추측 디코딩 (speculative decoding) 초안 모델
+
+Llama(draft_model=...) 로 넣으면 매 단계 초안이 다음 토큰 몇 개를 미리 제안하고, 본 모델은
+그걸 한 번의 eval 로 검증한다. 맞은 토큰만큼은 토큰당 decode 를 건너뛴다 (출력은 초안 없을 때와 같음).
+- "lookup": 프롬프트/지금까지 출력에서 마지막 n-gram 을 찾아 그 뒤 토큰을 제안 (LlamaPromptLookupDecoding).
+  명령 JSON 은 발화 속 파일/폴더 이름과 정해진 키를 그대로 베끼는 부분이 많아서 잘 맞는다.
+- GGUF 경로: tokenizer 가 같은 작은 모델 (1.5B 에 0.5B) 이 greedy 로 제안
+DraftStats 가 제안/채택 토큰 수를 센다. llama 는 초안을 검증한 뒤 맞은 만큼 + 1 토큰을 붙이고
+다음 초안을 부르므로, 다음 호출 때 input_ids 가 늘어난 길이 - 1 이 직전 초안의 채택 수다.
+
+메모리: draft_model 을 붙이면 llama_cpp 가 logits_all=True 로 바꿔서 scores 배열
+(n_ctx × n_vocab float32) 을 통째로 잡는다. 4096 × 110k 어휘면 약 1.8GB 이고, 서버에서는
+시퀀스 (--parallel) 마다 하나씩이다. logits_bytes() 로 미리 계산할 수 있다.
+
+llama_cpp 는 초안을 만들 때만 import 한다 (앱 시작을 늦추지 않도록).
+"""
+import threading
+
+import numpy as np
+
+from llm_backend import last_logits
+
+LOOKUP_NGRAM = 3
+DRAFT_TOKENS = 8  # 한 번에 제안하는 최대 토큰 수
+
+
+class GGUFDraftModel:
+    """작은 GGUF 모델로 greedy 초안. 본 모델이 넘긴 input_ids 와 겹치는 KV 앞부분은 재사용
+
+    초안 모델은 logits_all 없이 올리므로 scores 가 채워지지 않는다. 다음 토큰은 컨텍스트의 logits 로 고른다.
+    """
+
+    def __init__(self, model_path: str, num_pred_tokens: int = DRAFT_TOKENS, **llama_kwargs):
+        from llama_cpp import Llama
+        from autotune import tuned_kwargs
+
+        kwargs = dict(n_ctx=4096, verbose=False, use_mmap=True)
+        kwargs.update(llama_kwargs)
+        kwargs = tuned_kwargs(model_path, **kwargs)
+        self.llm = Llama(model_path=model_path, **kwargs)
+        self.num_pred_tokens = num_pred_tokens
+        self.eos = self.llm.token_eos()
+
+    def __call__(self, input_ids, **kwargs) -> np.ndarray:
+        llm = self.llm
+        ids = [int(t) for t in input_ids]
+        if not ids or len(ids) + self.num_pred_tokens >= llm.n_ctx():
+            return np.array([], dtype=np.intc)
+        n = 0
+        for a, b in zip(llm.input_ids[:llm.n_tokens], ids[:-1]):
+            if a != b:
+                break
+            n += 1
+        llm.n_tokens = n
+        llm.eval(ids[n:])
+
+        out = []
+        for _ in range(self.num_pred_tokens):
+            tok = int(np.argmax(last_logits(llm)))
+            if tok == self.eos:
+                break
+            out.append(tok)
+            llm.eval([tok])
+        return np.array(out, dtype=np.intc)
+
+
+def logits_bytes(n_ctx: int, n_vocab: int) -> int:
+    """초안을 붙인 Llama 하나가 추가로 잡는 scores 배열 크기 (logits_all=True)"""
+    return n_ctx * n_vocab * 4
+
+
+class DraftStats:
+    """초안 모델을 감싸서 제안/채택 토큰 수 집계"""
+
+    def __init__(self, inner, name: str):
+        self.inner = inner
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.proposed = 0
+        self.accepted = 0
+        self._last = None  # (직전 호출의 input_ids, 제안한 토큰)
+
+    def __call__(self, input_ids, **kwargs) -> np.ndarray:
+        ids = np.asarray(input_ids)
+        with self.lock:
+            if self._last is not None:
+                prev_ids, prev_draft = self._last
+                step = len(ids) - len(prev_ids) - 1
+                # 같은 생성의 다음 단계일 때만 센다: 직전 input_ids 를 그대로 잇고, 붙은 토큰이 초안 앞부분과 같아야 한다
+                # (새 생성이 시작됐거나 프롬프트가 비슷한 길이로 바뀐 경우는 건너뜀)
+                if (len(prev_draft) and 0 <= step <= len(prev_draft)
+                        and np.array_equal(ids[:len(prev_ids)], prev_ids)
+                        and np.array_equal(ids[len(prev_ids):len(prev_ids) + step], prev_draft[:step])):
+                    self.proposed += len(prev_draft)
+                    self.accepted += step
+        draft = self.inner(input_ids, **kwargs)
+        with self.lock:
+            self.calls += 1
+            self._last = (ids.copy(), np.asarray(draft).copy())
+        return draft
+
+    def snapshot(self) -> tuple:
+        with self.lock:
+            return self.proposed, self.accepted
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "draft": self.name,
+                "calls": self.calls,
+                "proposed": self.proposed,
+                "accepted": self.accepted,
+                "acceptance": self.accepted / self.proposed if self.proposed else 0.0,
+            }
+
+
+def make_draft(spec: str, n_ctx: int = 4096, **llama_kwargs) -> DraftStats:
+    """spec: "lookup" 또는 초안용 GGUF 경로"""
+    if spec == "lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+        inner = LlamaPromptLookupDecoding(max_ngram_size=LOOKUP_NGRAM, num_pred_tokens=DRAFT_TOKENS)
+        return DraftStats(inner, "lookup")
+    return DraftStats(GGUFDraftModel(spec, n_ctx=n_ctx, **llama_kwargs), spec)
+
+
+def draft_stats(llm):
+    """llm 에 붙은 DraftStats (없거나 원격이면 None)"""
+    d = getattr(llm, "draft_model", None)
+    return d if isinstance(d, DraftStats) else None
@@ -0,0 +1,207 @@
+"""파일 요약 (map-reduce)
+
+파일을 한 줄씩 읽으면서 토큰 예산 단위 청크로 자르고(map) 청크 요약을 합쳐서 다시 요약한다(reduce).
+청크 경계는 예산 외에 "앵커 줄"(줄 해시 기준)에서도 끊어서, 파일 앞부분이 바뀌어도
+뒤쪽 청크 경계가 그대로 유지된다. 청크 요약은 내용 해시로 캐시하므로
+수정된 큰 파일을 다시 요약하면 바뀐 청크만 LLM 을 탄다.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_backend import is_remote
+
+CHUNK_TOKENS = 1200  # 청크 하나의 최대 토큰
+MIN_CHUNK_TOKENS = 300  # 이보다 작으면 앵커 줄이 와도 안 끊음
+ANCHOR_MOD = 16  # 줄 해시 % ANCHOR_MOD == 0 이면 앵커
+CHUNK_SUMMARY_TOKENS = 160
+PROMPT_VERSION = "v1"
+
+MAP_PROMPT = """다음 텍스트를 한국어로 3문장 이내로 요약하라. 설명 없이 요약만 써라.
+
+텍스트:
+{text}
+
+요약:"""
+
+REDUCE_PROMPT = """다음은 한 파일의 부분별 요약이다. 전체 내용을 한국어로 간결하게 요약하라. 설명 없이 요약만 써라.
+
+부분 요약:
+{text}
+
+전체 요약:"""
+
+
+class SummaryCache:
+    """sha256(모델 + 프롬프트 + 텍스트) → 요약"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL)")
+
+    @staticmethod
+    def key(model_id: str, kind: str, text: str, max_tokens: int) -> str:
+        h = hashlib.sha256()
+        for part in (model_id or "", PROMPT_VERSION, kind, str(max_tokens), text):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, summary: str):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?)", (key, summary))
+            self.conn.commit()
+
+
+def token_counter(llm):
+    """원격이면 토큰화 왕복을 피하려고 글자 수로 근사"""
+    if is_remote(llm):
+        return lambda s: len(s) // 2 + 1
+    return lambda s: len(llm.tokenize(s.encode("utf-8"), add_bos=False))
+
+
+def iter_chunks(path: str, count_tokens, budget: int = CHUNK_TOKENS, min_tokens: int = MIN_CHUNK_TOKENS,
+                encoding: str = "utf-8"):
+    """파일 전체를 메모리에 올리지 않고 청크 문자열을 하나씩 돌려준다"""
+    cur, cur_tokens = [], 0
+    with open(path, "r", encoding=encoding, errors="replace") as f:
+        for line in f:
+            t = count_tokens(line)
+            if t > budget:
+                # 아주 긴 한 줄은 글자 단위로 쪼갠다
+                if cur:
+                    yield "".join(cur)
+                    cur, cur_tokens = [], 0
+                step = max(1, len(line) * budget // t)
+                for i in range(0, len(line), step):
+                    yield line[i:i + step]
+                continue
+            if cur and cur_tokens + t > budget:
+                yield "".join(cur)
+                cur, cur_tokens = [], 0
+            cur.append(line)
+            cur_tokens += t
+            if cur_tokens >= min_tokens and zlib.crc32(line.strip().encode("utf-8")) % ANCHOR_MOD == 0:
+                yield "".join(cur)
+                cur, cur_tokens = [], 0
+    if cur:
+        yield "".join(cur)
+
+
+class Summarizer:
+    def __init__(self, llm, cache: SummaryCache, model_id: str, lock: threading.Lock = None):
+        self.llm = llm
+        self.cache = cache
+        self.model_id = model_id
+        self.lock = lock or threading.Lock()
+        self.count_tokens = token_counter(llm)
+        # 모델 서버가 시퀀스를 여러 개 띄웠으면 그만큼 동시에 보낸다
+        self.parallel = getattr(llm, "n_parallel", 1)
+
+    def _generate(self, prompt: str, max_tokens: int) -> str:
+        kwargs = dict(max_tokens=max_tokens, temperature=0.2, repeat_penalty=1.1, stop=["\n\n\n"])
+        if self.parallel > 1:
+            out = self.llm(prompt, **kwargs)
+        else:
+            with self.lock:
+                out = self.llm(prompt, **kwargs)
+        return out["choices"][0]["text"].strip()
+
+    def _summarize(self, kind: str, text: str, max_tokens: int) -> tuple:
+        """(요약, 캐시 적중 여부)"""
+        key = self.cache.key(self.model_id, kind, text, max_tokens)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit, True
+        template = MAP_PROMPT if kind == "map" else REDUCE_PROMPT
+        summary = self._generate(template.format(text=text), max_tokens)
+        self.cache.put(key, summary)
+        return summary, False
+
+    def _summarize_counted(self, kind: str, text: str, max_tokens: int, stats: dict) -> str:
+        # stats 는 summarize_file 호출마다 따로 두고, 호출한 스레드에서만 센다
+        summary, cached = self._summarize(kind, text, max_tokens)
+        stats["cached" if cached else "calls"] += 1
+        return summary
+
+    def _map_all(self, texts, kind: str, max_tokens: int, stats: dict) -> list:
+        if self.parallel <= 1:
+            return [self._summarize_counted(kind, t, max_tokens, stats) for t in texts]
+        # 읽기와 요약을 겹치되 동시에 떠 있는 청크 수는 제한
+        results, pending = [], deque()
+
+        def collect():
+            summary, cached = pending.popleft().result()
+            stats["cached" if cached else "calls"] += 1
+            results.append(summary)
+
+        with ThreadPoolExecutor(self.parallel) as pool:
+            for t in texts:
+                pending.append(pool.submit(self._summarize, kind, t, max_tokens))
+                if len(pending) >= self.parallel * 2:
+                    collect()
+            while pending:
+                collect()
+        return results
+
+    def _group(self, parts: list) -> list:
+        groups, cur, cur_tokens = [], [], 0
+        for p in parts:
+            t = self.count_tokens(p)
+            if cur and cur_tokens + t > CHUNK_TOKENS:
+                groups.append("\n".join(cur))
+                cur, cur_tokens = [], 0
+            cur.append(p)
+            cur_tokens += t
+        if cur:
+            groups.append("\n".join(cur))
+        return groups
+
+    def summarize_file(self, path: str, max_tokens: int = 200, encoding: str = "utf-8") -> dict:
+        """encoding 은 호출 쪽에서 content_index.text_encoding 으로 텍스트인지 확인한 값"""
+        t0 = time.perf_counter()
+        stats = {"calls": 0, "cached": 0}  # 요약 단계가 동시에 돌 수 있어서 인스턴스에 두지 않는다
+        chunks = 0
+
+        def counted():
+            nonlocal chunks
+            for c in iter_chunks(path, self.count_tokens, encoding=encoding):
+                chunks += 1
+                yield c
+
+        parts = [p for p in self._map_all(counted(), "map", CHUNK_SUMMARY_TOKENS, stats) if p]
+        if not parts:
+            summary = ""
+        elif chunks == 1:
+            summary = parts[0]
+        else:
+            # 부분 요약이 한 청크에 들어갈 때까지 묶어서 다시 요약
+            while True:
+                groups = self._group(parts)
+                if len(groups) >= len(parts) > 1:
+                    # 부분 요약이 길어서 안 줄어들면 두 개씩 강제로 묶는다
+                    groups = ["\n".join(parts[i:i + 2]) for i in range(0, len(parts), 2)]
+                if len(groups) == 1:
+                    summary = self._summarize_counted("reduce", groups[0], max_tokens, stats)
+                    break
+                parts = self._map_all(groups, "reduce", CHUNK_SUMMARY_TOKENS, stats)
+
+        return {
+            "summary": summary,
+            "chunks": chunks,
+            "llm_calls": stats["calls"],
+            "cached": stats["cached"],
+            "elapsed": time.perf_counter() - t0,
+        }
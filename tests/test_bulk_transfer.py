@@ -0,0 +1,125 @@
+import os
+
+from bulk_transfer import BulkTransfer, Journal, TransferItem, journal_path_for, plan_items
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+# -------------------------
+# plan_items
+# -------------------------
+def test_plan_items_glob_goes_into_folder(tmp_path):
+    for name in ("a.log", "b.log", "c.txt"):
+        write(str(tmp_path / "src" / name), name)
+    dst = str(tmp_path / "dst")
+    items = plan_items([str(tmp_path / "src" / "*.log")], dst)
+    assert [(os.path.basename(i.src), i.dst) for i in items] == [
+        ("a.log", os.path.join(dst, "a.log")),
+        ("b.log", os.path.join(dst, "b.log")),
+    ]
+    assert all(i.size == 5 for i in items)
+
+
+def test_plan_items_single_file_to_file_and_missing_source(tmp_path):
+    src = str(tmp_path / "a.txt")
+    write(src, "x")
+    dst = str(tmp_path / "renamed.txt")
+    items = plan_items([src], dst, dst_is_dir=False)
+    assert [(i.src, i.dst) for i in items] == [(src, dst)]
+    assert plan_items([str(tmp_path / "none.txt")], dst) == []
+
+
+def test_plan_items_skips_same_path_and_keeps_folder_whole(tmp_path):
+    folder = str(tmp_path / "docs")
+    write(os.path.join(folder, "a.txt"), "x")
+    assert plan_items([folder], str(tmp_path)) == []
+    items = plan_items([folder], str(tmp_path / "archive"))
+    assert len(items) == 1 and items[0].is_dir
+
+
+# -------------------------
+# Journal
+# -------------------------
+def test_journal_reload_skips_torn_line_and_clear(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    item = TransferItem("/s/a", "/d/a")
+    j = Journal(path)
+    j.record(item, "copying")
+    j.record(item, "done", os.stat(path), 3)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "/s/b|/d/b", "sta')
+    e = Journal(path).get(item)
+    assert e["status"] == "done" and e["dst_size"] == 3 and "mtime" in e
+    j.clear()
+    assert not os.path.exists(path) and j.get(item) is None
+
+
+def test_journal_path_differs_per_command(tmp_path):
+    d = str(tmp_path)
+    assert journal_path_for(d, ["a/*.log"], "x") == journal_path_for(d, ["a/*.log"], "x")
+    assert journal_path_for(d, ["a/*.log"], "x") != journal_path_for(d, ["a/b.log"], "x")
+
+
+# -------------------------
+# BulkTransfer
+# -------------------------
+def test_move_never_overwrites_existing_destination(tmp_path):
+    src, dst = str(tmp_path / "src" / "a.txt"), str(tmp_path / "dst" / "a.txt")
+    write(src, "new")
+    write(dst, "existing-dst")
+    st = BulkTransfer([TransferItem(src, dst, 3)], "move").run()
+    assert len(st["failed"]) == 1
+    assert read(dst) == "existing-dst" and read(src) == "new"
+
+
+def test_stale_done_entry_does_not_delete_new_source(tmp_path):
+    journal = str(tmp_path / "j.jsonl")
+    dst = str(tmp_path / "dst")
+    write(os.path.join(dst, "b.txt", "keep"), "")  # b 는 폴더라서 실패 → journal 이 남는다
+    a, b = str(tmp_path / "src" / "a.txt"), str(tmp_path / "src" / "b.txt")
+    write(a, "old")
+    write(b, "b")
+    st = BulkTransfer(plan_items([a, b], dst), "move", journal_path=journal).run()
+    assert len(st["failed"]) == 1 and os.path.exists(journal)
+
+    write(a, "NEW CONTENT")
+    st = BulkTransfer(plan_items([a], dst), "move", journal_path=journal).run()
+    assert st["resumed"] == 0 and len(st["failed"]) == 1
+    assert read(a) == "NEW CONTENT"
+    assert read(os.path.join(dst, "a.txt")) == "old"
+
+
+def test_done_entry_resumes_when_files_match(tmp_path):
+    # 대상까지 다 쓰고 원본을 지우기 전에 멈춘 상황
+    journal = str(tmp_path / "j.jsonl")
+    src, dst = str(tmp_path / "src" / "a.txt"), str(tmp_path / "dst" / "a.txt")
+    write(src, "data")
+    write(dst, "data")
+    item = TransferItem(src, dst, 4)
+    Journal(journal).record(item, "done", os.stat(src), 4)
+    st = BulkTransfer([item], "move", journal_path=journal).run()
+    assert st["resumed"] == 1 and not st["failed"]
+    assert not os.path.exists(src) and read(dst) == "data"
+    assert not os.path.exists(journal)
+
+
+def test_copy_resumes_part_file_when_source_unchanged(tmp_path):
+    journal = str(tmp_path / "j.jsonl")
+    src, dst = str(tmp_path / "a.bin"), str(tmp_path / "out" / "a.bin")
+    write(src, "0123456789")
+    write(dst + ".part", "01234")
+    item = TransferItem(src, dst, 10)
+    Journal(journal).record(item, "copying", os.stat(src))
+    st = BulkTransfer([item], "copy", journal_path=journal).run()
+    assert st["resumed"] == 1 and st["done_bytes"] == 10
+    assert read(dst) == "0123456789" and read(src) == "0123456789"
+    assert not os.path.exists(dst + ".part")
@@ -0,0 +1,22 @@
+from chat_history import ChatLog
+
+
+def test_read_after_continues_from_offset(tmp_path):
+    log = ChatLog(str(tmp_path / "chat.jsonl"))
+    offsets = [log.append("user", f"메시지 {i}") for i in range(10)]
+
+    items = log.read_after(offsets[3], 4)
+    assert [o for o, _ in items] == offsets[3:7]
+    assert [m["content"] for _, m in items] == [f"메시지 {i}" for i in range(3, 7)]
+
+    # 줄 중간을 가리키면 다음 메시지부터
+    assert log.read_after(offsets[6] + 1, 2)[0][0] == offsets[7]
+    assert log.read_after(log.size, 5) == []
+
+
+def test_read_before_and_after_meet(tmp_path):
+    log = ChatLog(str(tmp_path / "chat.jsonl"))
+    offsets = [log.append("assistant", "답" * i) for i in range(1, 30)]
+    before = log.read_before(offsets[15], 50)
+    after = log.read_after(offsets[15], 50)
+    assert [o for o, _ in before + after] == offsets
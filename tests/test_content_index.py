@@ -0,0 +1,46 @@
+import os
+
+from content_index import ContentIndex, tokenize
+from file_index import FileIndex
+
+
+def make_index(tmp_path, docs):
+    root = tmp_path / "root"
+    root.mkdir()
+    for name, text in docs.items():
+        (root / name).write_text(text, encoding="utf-8")
+    files = FileIndex(str(root), str(tmp_path / "index.sqlite3"), min_refresh_interval=0)
+    index = ContentIndex(files)
+    index.update()
+    return str(root), index
+
+
+def test_query_tokens_have_no_trailing_unigram():
+    assert tokenize("보고서") == ["보고", "고서", "서"]
+    assert tokenize("보고서", query=True) == ["보고", "고서"]
+    assert tokenize("쌀", query=True) == ["쌀"]
+
+
+def test_single_syllable_query_matches_any_position(tmp_path):
+    root, index = make_index(tmp_path, {
+        "a.txt": "쌀값이 올랐다",
+        "b.txt": "오늘 백미쌀 주문",
+        "c.txt": "보리 주문",
+    })
+    hits = {os.path.basename(p) for p, _ in index.search("쌀")}
+    assert hits == {"a.txt", "b.txt"}
+    assert {os.path.basename(p) for p, _ in index.search("쌀 주문")} == {"b.txt"}
+
+
+def test_bigram_query_unchanged(tmp_path):
+    root, index = make_index(tmp_path, {"a.txt": "분기별 매출 보고서", "b.txt": "회의록"})
+    assert [os.path.basename(p) for p, _ in index.search("보고서")] == ["a.txt"]
+
+
+def test_old_tokenizer_index_is_rebuilt(tmp_path):
+    root, index = make_index(tmp_path, {"a.txt": "백미쌀"})
+    index.conn.execute("UPDATE content_meta SET value = '1'")
+    index.conn.commit()
+    again = ContentIndex(index.files)
+    assert again.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0] == 0
+    assert again.update()["indexed"] == 1
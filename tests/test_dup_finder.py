@@ -0,0 +1,35 @@
+import os
+
+from dup_finder import DuplicateFinder, HashCache
+from file_index import FileIndex
+
+
+def find(tmp_path):
+    files = FileIndex(str(tmp_path / "root"), str(tmp_path / "index.sqlite3"), min_refresh_interval=0)
+    finder = DuplicateFinder(files, HashCache(str(tmp_path / "hashes.sqlite3")), workers=1)
+    return finder.find(), finder.stats
+
+
+def test_hard_links_are_not_duplicates(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "a.bin").write_bytes(b"x" * 1000)
+    os.link(root / "a.bin", root / "a_link.bin")
+
+    groups, stats = find(tmp_path)
+    assert groups == []
+    assert stats["hardlinks"] == 1
+
+
+def test_hard_link_counts_once_among_real_copies(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "a.bin").write_bytes(b"y" * 1000)
+    os.link(root / "a.bin", root / "b_link.bin")
+    (root / "c_copy.bin").write_bytes(b"y" * 1000)
+
+    groups, _ = find(tmp_path)
+    assert len(groups) == 1
+    size, paths = groups[0]
+    assert size == 1000
+    assert sorted(os.path.basename(p) for p in paths) == ["a.bin", "c_copy.bin"]
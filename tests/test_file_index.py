@@ -0,0 +1,63 @@
+import os
+
+from file_index import FileIndex
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def make_index(tmp_path):
+    root = str(tmp_path / "root")
+    os.makedirs(root)
+    return root, FileIndex(root, str(tmp_path / "index.sqlite3"), min_refresh_interval=0)
+
+
+def sizes(files):
+    with files.lock:
+        return dict(files.conn.execute("SELECT name, size FROM files"))
+
+
+def test_refresh_tracks_added_and_removed_files(tmp_path):
+    root, files = make_index(tmp_path)
+    write(os.path.join(root, "a.txt"), "a")
+    write(os.path.join(root, "sub", "b.log"), "bb")
+    st = files.refresh()
+    assert st["files_added"] == 2 and files.built
+    assert files.search(exts=["log"]) == [os.path.join(root, "sub", "b.log")]
+
+    os.remove(os.path.join(root, "sub", "b.log"))
+    files.refresh()
+    assert sizes(files) == {"a.txt": 1}
+
+
+def test_in_place_edit_is_picked_up_without_dir_mtime_change(tmp_path):
+    root, files = make_index(tmp_path)
+    path = os.path.join(root, "reporter.txt")
+    write(path, "ab")
+    files.refresh()
+    d_mtime = os.stat(root).st_mtime_ns
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("x" * 900)
+    assert os.stat(root).st_mtime_ns == d_mtime
+
+    st = files.refresh()
+    assert st["dirs_rescanned"] == 0 and st["dirs_restat_changed"] == 1
+    assert sizes(files) == {"reporter.txt": 902}
+
+
+def test_restat_budget_rotates_through_directories(tmp_path):
+    root, files = make_index(tmp_path)
+    for i in range(5):
+        write(os.path.join(root, f"d{i}", "f.txt"), "a")
+    files.refresh()
+    for i in range(5):
+        write(os.path.join(root, f"d{i}", "f.txt"), "abc")
+    # 한 번에 디렉토리 하나 (파일 1 + 디렉토리 1) 씩만 보게 해서 여러 번에 걸쳐 다 잡히는지
+    seen = 0
+    for _ in range(10):
+        seen += files.refresh(restat_files=2)["dirs_restat_changed"]
+    assert seen == 5
+    assert set(sizes(files).values()) == {3}
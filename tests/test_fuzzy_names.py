@@ -0,0 +1,58 @@
+import os
+
+from file_index import FileIndex
+from fuzzy_names import FuzzyNames, grams
+
+
+def make_tree(root, names):
+    for name in names:
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("x")
+
+
+def make_index(tmp_path, names):
+    root = str(tmp_path / "root")
+    make_tree(root, names)
+    files = FileIndex(root, str(tmp_path / "index.sqlite3"), min_refresh_interval=0)
+    files.refresh()
+    return root, files, FuzzyNames(files)
+
+
+def test_grams_treat_separators_alike():
+    assert grams("분기별 매출") == grams("분기별_매출") == grams("분기별-매출")
+
+
+def test_resolves_dropped_suffix(tmp_path):
+    root, _, names = make_index(tmp_path, ["보고서_final.txt", "memo.txt", "archive/회의록_0312.txt"])
+    best, cands = names.resolve(os.path.join(root, "보고서.txt"))
+    assert best == os.path.join(root, "보고서_final.txt")
+    assert cands[0][0] == best
+    best, _ = names.resolve(os.path.join(root, "회의록 0312.txt"))
+    assert best == os.path.join(root, "archive", "회의록_0312.txt")
+
+
+def test_extension_must_match_and_unrelated_names_fail(tmp_path):
+    root, _, names = make_index(tmp_path, ["보고서_final.txt", "memo.txt"])
+    assert names.resolve(os.path.join(root, "보고서.pdf")) == (None, [])
+    assert names.resolve(os.path.join(root, "없는파일.txt")) == (None, [])
+
+
+def test_close_candidates_are_ambiguous(tmp_path):
+    root, _, names = make_index(tmp_path, ["memo.txt", "memo2.txt"])
+    best, cands = names.resolve(os.path.join(root, "memo3.txt"))
+    assert best is None
+    assert {os.path.basename(p) for p, _ in cands} == {"memo.txt", "memo2.txt"}
+
+
+def test_refresh_updates_index_incrementally(tmp_path):
+    root, files, names = make_index(tmp_path, ["a/old_name.txt"])
+    names.ensure_loaded()
+    assert len(names) == 1
+    os.remove(os.path.join(root, "a", "old_name.txt"))
+    make_tree(root, ["a/예산안_v2.txt", "b/plan.txt"])
+    files.refresh()
+    assert len(names) == 2
+    assert names.resolve(os.path.join(root, "a", "old_name.txt")) == (None, [])
+    assert names.resolve(os.path.join(root, "a", "예산안.txt"))[0] == os.path.join(root, "a", "예산안_v2.txt")
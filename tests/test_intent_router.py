@@ -0,0 +1,48 @@
+import pytest
+
+import intent_router
+
+ROUTER_MIN_CONFIDENCE = 0.9  # poc_test2 와 같은 기준
+
+
+@pytest.mark.parametrize("text, tool, args", [
+    ("down 폴더 만들어줘", "create_folder", {"name": "down"}),
+    ("보고서라는 폴더 하나 만들어줘", "create_folder", {"name": "보고서"}),
+    ("memo.txt 파일 만들어줘", "create_file", {"path": "memo.txt", "content": ""}),
+    ("a.txt를 archive로 옮겨줘", "move_file", {"file": "a.txt", "folder": "archive"}),
+    ("a.txt를 b.txt로 옮겨줘", "move_file", {"src": "a.txt", "dst": "b.txt"}),
+    ("a.txt를 b.txt 폴더로 옮겨줘", "move_file", {"file": "a.txt", "folder": "b.txt"}),
+    ("log 파일 전부 archive로 옮겨줘", "move_file", {"src": "*.log", "dst": "archive"}),
+    ("report.txt 요약해줘", "summarize_file", {"path": "report.txt"}),
+    ("중복 파일 찾아줘", "find_duplicates", {"ext": []}),
+    ("pdf 중복 파일 찾아줘", "find_duplicates", {"ext": ["pdf"]}),
+    ("내용에 예산이 들어간 파일 찾아줘", "search_files", {"keywords": ["예산"], "content": True}),
+    ("pdf 파일 찾아줘", "search_files", {"ext": ["pdf"]}),
+])
+def test_confident_rules(text, tool, args):
+    cmd, conf, _ = intent_router.route(text)
+    assert cmd == {"tool": tool, "arguments": args}
+    assert conf >= ROUTER_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("text", [
+    "새 폴더 만들어줘",
+    "빈 폴더 하나 만들어줘",
+    "파일 찾아줘",
+    "문서 어디 있어",
+    "a.txt를 새 폴더로 옮겨줘",
+    "pdf 파일 전부 폴더로 옮겨줘",
+])
+def test_generic_words_decline(text):
+    cmd, conf, _ = intent_router.route(text)
+    assert cmd is None and conf < ROUTER_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("text", [
+    "보고서 찾아줘",  # 이름 검색은 본문/뜻 검색인지 LLM 이 정한다
+    "a.txt 옮기고 요약해줘",  # 여러 tool 이 섞임
+    "오늘 날씨 어때",
+])
+def test_ambiguous_requests_go_to_llm(text):
+    _, conf, _ = intent_router.route(text)
+    assert conf < ROUTER_MIN_CONFIDENCE
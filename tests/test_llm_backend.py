@@ -0,0 +1,84 @@
+import ctypes
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from llm_backend import eval_next_logprobs, last_logits
+
+N_VOCAB = 16
+N_BATCH = 8
+LABEL_IDS = {"1": 5, "2": 6, "3": 7}
+
+
+class StubContext:
+    def __init__(self):
+        self.buf = (ctypes.c_float * N_VOCAB)()
+
+    def get_logits(self):
+        return ctypes.cast(self.buf, ctypes.POINTER(ctypes.c_float))
+
+
+class StubLlama:
+    """llama_cpp 0.3 처럼 logits_all 일 때만 scores 를 채우고, 아니면 scores 는 n_batch 행짜리 빈 배열"""
+
+    def __init__(self, logits_all: bool = False, n_ctx: int = 64):
+        self._logits_all = logits_all
+        self.input_ids = np.zeros(n_ctx, dtype=np.intc)
+        self.n_tokens = 0
+        self.scores = np.zeros((n_ctx if logits_all else N_BATCH, N_VOCAB), dtype=np.float32)
+        self._ctx = StubContext()
+        self.evaluated = 0
+
+    def n_vocab(self) -> int:
+        return N_VOCAB
+
+    def eval(self, tokens):
+        for t in tokens:
+            self.input_ids[self.n_tokens] = t
+            self.n_tokens += 1
+        self.evaluated += len(tokens)
+        # 마지막 토큰 값 다음 번호가 가장 그럴듯하다고 가정
+        logits = np.zeros(N_VOCAB, dtype=np.float32)
+        logits[(int(tokens[-1]) + 1) % N_VOCAB] = 5.0
+        self._ctx.buf[:] = logits.tolist()
+        if self._logits_all:
+            self.scores[self.n_tokens - 1] = logits
+
+
+def pick(llm, tokens):
+    ids = list(LABEL_IDS.values())
+    lp = eval_next_logprobs(llm, tokens, ids)
+    return list(LABEL_IDS)[int(np.argmax(lp))], lp
+
+
+@pytest.mark.parametrize("logits_all", [False, True])
+def test_picks_label_from_last_token_logits(logits_all):
+    llm = StubLlama(logits_all)
+    label, lp = pick(llm, [1, 2, 3, 5])
+    assert label == "2"  # 5 다음은 6 = "2"
+    assert lp[1] > np.log(0.5)
+
+
+def test_prompt_longer_than_n_batch():
+    llm = StubLlama()
+    label, _ = pick(llm, list(range(N_BATCH * 3)) + [6])
+    assert label == "3"
+
+
+def test_reuses_cached_prefix():
+    llm = StubLlama()
+    pick(llm, [1, 2, 3, 4])
+    llm.evaluated = 0
+    label, _ = pick(llm, [1, 2, 3, 4, 9, 4])
+    assert llm.evaluated == 2
+    assert label == "1"  # 4 다음은 5 = "1"
+
+
+def test_last_logits_is_a_copy():
+    llm = StubLlama()
+    llm.eval([2])
+    first = last_logits(llm)
+    llm.eval([3])
+    assert int(np.argmax(first)) == 3
+    assert int(np.argmax(last_logits(llm))) == 4
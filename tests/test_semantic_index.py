@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from file_index import FileIndex
+from semantic_index import SemanticIndex
+
+
+def fake_embed(texts):
+    out = np.zeros((len(texts), 8), dtype=np.float32)
+    for i, t in enumerate(texts):
+        out[i, len(t) % 8] = 1.0
+    return out
+
+
+def test_deleting_every_file_clears_the_saved_index(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "a.txt").write_text("회의록", encoding="utf-8")
+    files = FileIndex(str(root), str(tmp_path / "index.sqlite3"), min_refresh_interval=0)
+    index = SemanticIndex(files, str(tmp_path / "semantic"))
+    index.set_embedder(fake_embed, "m")
+    assert index.update()["embedded"] == 1
+    assert os.path.exists(tmp_path / "semantic" / "vectors.npy")
+
+    (root / "a.txt").unlink()
+    files.mark_stale()
+    assert index.update()["removed"] == 1
+    assert not index.ready
+
+    again = SemanticIndex(files, str(tmp_path / "semantic"))
+    again.set_embedder(fake_embed, "m")
+    assert again.meta == []
+    assert not again.ready
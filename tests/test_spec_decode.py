@@ -0,0 +1,71 @@
+import ctypes
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from spec_decode import DraftStats, GGUFDraftModel, logits_bytes
+
+
+class ScriptedDraft:
+    def __init__(self, drafts):
+        self.drafts = iter(drafts)
+
+    def __call__(self, input_ids, **kwargs):
+        return np.array(next(self.drafts), dtype=np.intc)
+
+
+def test_counts_accepted_prefix_of_previous_draft():
+    d = DraftStats(ScriptedDraft([[5, 6, 7], [9]]), "t")
+    d(np.array([1, 2, 3]))
+    d(np.array([1, 2, 3, 5, 6, 8]))  # 5, 6 채택 + 본 모델 토큰 8
+    assert d.snapshot() == (3, 2)
+
+
+def test_new_completion_of_similar_length_is_not_counted():
+    d = DraftStats(ScriptedDraft([[5, 6, 7], [1], [2]]), "t")
+    d(np.array([1, 2, 3]))
+    d(np.array([4, 4, 4, 4, 4]))  # 다른 프롬프트로 새 생성 (길이만 보면 2개 채택처럼 보임)
+    assert d.snapshot() == (0, 0)
+    d(np.array([4, 4, 4, 4, 4, 9]))  # 초안 [1] 이 틀림
+    assert d.snapshot() == (1, 0)
+
+
+def test_logits_bytes():
+    assert logits_bytes(4096, 110_000) == 4096 * 110_000 * 4
+
+
+class CountingDraftLlama:
+    """logits 는 컨텍스트에만 남고 scores 는 비어 있는 (logits_all 없는) 초안 Llama. 다음 토큰 = 마지막 + 1"""
+
+    n_vocab_ = 16
+
+    def __init__(self):
+        self.input_ids = np.zeros(64, dtype=np.intc)
+        self.n_tokens = 0
+        self.scores = np.zeros((4, self.n_vocab_), dtype=np.float32)
+        self.context_params = type("P", (), {"logits_all": False})()
+        self.buf = (ctypes.c_float * self.n_vocab_)()
+        self._ctx = type("C", (), {"get_logits": lambda c: ctypes.cast(self.buf, ctypes.POINTER(ctypes.c_float))})()
+
+    def n_ctx(self):
+        return 64
+
+    def n_vocab(self):
+        return self.n_vocab_
+
+    def eval(self, tokens):
+        for t in tokens:
+            self.input_ids[self.n_tokens] = t
+            self.n_tokens += 1
+        self.buf[:] = [0.0] * self.n_vocab_
+        self.buf[(int(tokens[-1]) + 1) % self.n_vocab_] = 1.0
+
+
+def test_gguf_draft_reads_logits_from_context():
+    draft = GGUFDraftModel.__new__(GGUFDraftModel)
+    draft.llm = CountingDraftLlama()
+    draft.num_pred_tokens = 3
+    draft.eos = 2
+    assert draft(np.array([3, 4, 5, 6, 7, 8])).tolist() == [9, 10, 11]  # n_batch(4) 보다 긴 입력
+    assert draft(np.array([15])).tolist() == [0, 1]  # 2 는 eos
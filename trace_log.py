@@ -0,0 +1,226 @@
+"""요청 단위 단계별 시간/토큰 기록 (JSONL, 크기 넘으면 회전)
+
+    with tracer.request("parse", text=user) as req:
+        with tracer.span("router"):
+            ...
+        req.add(tokens_out=12)
+
+요청은 스레드별로 하나 잡혀 있어서, 안쪽 함수는 인자로 넘기지 않아도 tracer.span() 으로 붙일 수 있다.
+끄면 request()/span() 이 공유된 빈 객체를 돌려줘서 시간 측정도 할당도 하지 않는다.
+앱 기본값은 꺼짐. 환경변수 FILETALK_TRACE=1 이면 켜고 (경로를 주면 그 파일에 씀), 0 이면 끈다.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+TRACE_ENV = "FILETALK_TRACE"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullRequest:
+    active = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def span(self, name: str):
+        return _NULL_SPAN
+
+    def add_time(self, name: str, seconds: float):
+        pass
+
+    def add(self, **fields):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def finish(self):
+        pass
+
+    def summary(self) -> str:
+        return ""
+
+
+NULL_REQUEST = NullRequest()
+
+
+class _Span:
+    __slots__ = ("req", "name", "t0")
+
+    def __init__(self, req, name: str):
+        self.req = req
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.req.add_time(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Request:
+    active = True
+
+    def __init__(self, tracer, kind: str, fields: dict):
+        self.tracer = tracer
+        self.kind = kind
+        self.fields = dict(fields)
+        self.stages = {}  # 이름 → 초 (같은 이름은 누적, 기록 순서 유지)
+        self.lock = threading.Lock()
+        self.ts = time.time()
+        self.t0 = time.perf_counter()
+        self.total = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.set(error=f"{exc_type.__name__}: {exc}")
+        self.finish()
+        return False
+
+    def span(self, name: str):
+        return _Span(self, name)
+
+    def add_time(self, name: str, seconds: float):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add(self, **fields):
+        """숫자 필드 누적 (토큰 수 등)"""
+        with self.lock:
+            for k, v in fields.items():
+                self.fields[k] = self.fields.get(k, 0) + v
+
+    def set(self, **fields):
+        with self.lock:
+            self.fields.update(fields)
+
+    def tok_per_sec(self):
+        # 스트리밍이면 생성 구간만, 아니면 호출 전체 (프롬프트 평가 포함) 기준
+        gen = self.stages.get("generate") or self.stages.get("llm")
+        n = self.fields.get("tokens_out")
+        if gen and n:
+            return n / gen
+        return None
+
+    def finish(self):
+        if self.total is not None:
+            return
+        self.total = time.perf_counter() - self.t0
+        self.tracer._finish(self)
+
+    def record(self) -> dict:
+        rec = {
+            "ts": round(self.ts, 3),
+            "kind": self.kind,
+            "total_ms": round(self.total * 1000, 3),
+            "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+        }
+        tps = self.tok_per_sec()
+        if tps is not None:
+            rec["tok_per_sec"] = round(tps, 2)
+        rec.update(self.fields)
+        return rec
+
+    def summary(self) -> str:
+        """상태바용: "parse 0.84초 = router 0.00 · llm 0.80 · normalize 0.01 | 42.0 tok/s" """
+        total = self.total if self.total is not None else time.perf_counter() - self.t0
+        parts = " · ".join(f"{k} {v:.2f}" for k, v in self.stages.items())
+        text = f"{self.kind} {total:.2f}초" + (f" = {parts}" if parts else "")
+        tps = self.tok_per_sec()
+        if tps is not None:
+            text += f" | {tps:.1f} tok/s"
+        if self.fields.get("draft_proposed"):
+            text += f" | 초안 채택 {self.fields.get('draft_accepted', 0) / self.fields['draft_proposed']:.0%}"
+        return text
+
+
+class Tracer:
+    def __init__(self, path: str = None, enabled: bool = True, max_bytes: int = MAX_BYTES, backups: int = BACKUPS):
+        env = os.environ.get(TRACE_ENV)
+        if env == "0":
+            enabled = False
+        elif env:
+            enabled = True
+            if env != "1":
+                path = env
+        self.enabled = enabled
+        self.path = path
+        self.last = None  # 마지막으로 끝난 요청 (상태바 표시용)
+        self._local = threading.local()
+        self._log = None
+        if enabled and path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._log = logging.getLogger(f"filetalk.trace.{os.path.abspath(path)}")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            if not self._log.handlers:
+                handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self._log.addHandler(handler)
+
+    def request(self, kind: str, **fields):
+        """이 스레드의 현재 요청으로 등록 (끝나면 기록하고 해제)"""
+        if not self.enabled:
+            return NULL_REQUEST
+        req = Request(self, kind, fields)
+        self._local.req = req
+        return req
+
+    def current(self):
+        return getattr(self._local, "req", None) or NULL_REQUEST
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self.current().span(name)
+
+    def _finish(self, req: Request):
+        if getattr(self._local, "req", None) is req:
+            self._local.req = None
+        self.last = req
+        if self._log is not None:
+            self._log.info(json.dumps(req.record(), ensure_ascii=False))
+
+
+def traced_completion(llm, prompt, req, **kwargs) -> dict:
+    """llm(prompt, **kwargs) 를 그대로 부르고, 추적 중이면 호출 시간 ("llm") 과 토큰 수를 req 에 남긴다
+
+    측정 때문에 스트리밍으로 바꾸지는 않는다 (추적을 켜고 끌 때 디코딩 경로가 달라지지 않게).
+    프롬프트 평가 / 생성을 나눈 시간은 원래 스트리밍하는 대화 (naver_gui) 에서만 남는다.
+    """
+    if not req.active:
+        return llm(prompt, **kwargs)
+    t0 = time.perf_counter()
+    out = llm(prompt, **kwargs)
+    req.add_time("llm", time.perf_counter() - t0)
+    usage = out.get("usage") or {}
+    if "prompt_tokens" in usage:
+        req.add(tokens_in=usage["prompt_tokens"])
+    elif isinstance(prompt, list):
+        req.add(tokens_in=len(prompt))
+    req.add(tokens_out=usage.get("completion_tokens", 0))
+    return out